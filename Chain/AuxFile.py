@@ -30,10 +30,12 @@ class EarthExplorer(object):
 
     # TODO Add platform detection
 
-    def __new__(cls, dbl, regex=None):
+    def __new__(cls, dbl, regex=None, hdr=None):
         """
         Instantiate a new EarthExplorer file
         :param dbl: A folder name
+        :param regex: Optional regex to use instead of the class one
+        :param hdr: The associated HDR file. If None, it is searched next to the folder.
         :return:
         """
 
@@ -44,15 +46,55 @@ class EarthExplorer(object):
             return None
         return object.__new__(cls)
 
-    def __init__(self, dbl, regex=None):
+    def __init__(self, dbl, regex=None, hdr=None):
         from Common import FileSystem
         self.regex = self.regex if regex is None else regex
         self.dbl = dbl
         self.base = os.path.basename(dbl).split(".")[0]
         # Find associated HDR
-        self.hdr = FileSystem.find_single(path=os.path.join(dbl, "../"), pattern=self.base + ".HDR")
+        if hdr is None:
+            hdr = FileSystem.find_single(path=os.path.join(dbl, "../"), pattern=self.base + ".HDR")
+        self.hdr = hdr
         assert os.path.isfile(self.hdr)
 
+    @classmethod
+    def from_directory(cls, path, regex=None, depth=None):
+        """
+        Find all auxiliary files of this type in a directory-tree.
+        Each directory is listed once and the DBL(.DIR) folders are paired with the HDR files of the same
+        directory by name, instead of searching for the HDR of each folder separately.
+        Folders without HDR are discarded.
+        :param path: The path to the root directory
+        :param regex: Optional regex to use instead of the class one
+        :param depth: Search only up to a specified depth. See :func:`Common.FileSystem.walk`.
+        :return: The auxiliary files found, in the same order as :func:`Common.FileSystem.find`.
+        :rtype: list
+        """
+        from Common import FileSystem
+        reg = re.compile(cls.regex if regex is None else regex)
+        aux_files = []
+        for root, files, dirs, walk_dirs in FileSystem.walk(path, depth=depth):
+            hdrs = {}
+            for name in files:
+                if name.lower().endswith(".hdr"):
+                    hdrs.setdefault(name[:-len(".hdr")].lower(), os.path.join(root, name))
+            matched = []
+            for name in dirs:
+                if not reg.search(name):
+                    continue
+                matched.append(name)
+                hdr = hdrs.get(name.split(".")[0].lower())
+                try:
+                    # Fall back to searching the HDR if it is not in the same directory:
+                    aux = cls(os.path.join(root, name), regex, hdr=hdr)
+                except ValueError:
+                    continue
+                if aux is not None:
+                    aux_files.append(aux)
+            # Do not descend into the auxiliary files themselves:
+            walk_dirs[:] = [d for d in walk_dirs if d not in matched]
+        return aux_files
+
     def __str__(self):
         return "\n".join(["DBL: " + self.dbl,
                           "HDR: " + self.hdr])
@@ -33,6 +33,11 @@ class Landsat8Natif(MajaProduct):
 
     base_resolution = (30, -30)
     coarse_resolution = (240, -240)
+    # The image holds the bands B1 to B7 and B9:
+    synthetic_band_files = {"green": ([r"*IMG*DBL.TIF"], 3),
+                            "red": ([r"*IMG*DBL.TIF"], 4),
+                            "nir": ([r"*IMG*DBL.TIF"], 5),
+                            "swir": ([r"*IMG*DBL.TIF"], 6)}
 
     @property
     def platform(self):
@@ -92,18 +97,15 @@ class Landsat8Natif(MajaProduct):
             raise e
         return Site.from_raster(self.tile, band_bx)
 
-    @property
-    def mnt_resolutions_dict(self):
+    @staticmethod
+    def get_mnt_resolutions(resolution):
         return [{"name": "XS",
-                "val": str(self.mnt_resolution[0]) + " " + str(self.mnt_resolution[1])}]
+                 "val": str(resolution[0]) + " " + str(resolution[1])}]
 
     @property
     def max_l2_diff(self):
         return timedelta(days=30)
 
-    def get_synthetic_band(self, synthetic_band, **kwargs):
-        raise NotImplementedError
-
     def rgb_values(self):
         raise NotImplementedError
 
@@ -115,6 +117,10 @@ class Landsat8Muscate(MajaProduct):
 
     base_resolution = (30, -30)
     coarse_resolution = (240, -240)
+    synthetic_band_files = {"green": ([r"*_FRE_B3.tif$", r"*_B3.tif$"], None),
+                            "red": ([r"*_FRE_B4.tif$", r"*_B4.tif$"], None),
+                            "nir": ([r"*_FRE_B5.tif$", r"*_B5.tif$"], None),
+                            "swir": ([r"*_FRE_B6.tif$", r"*_B6.tif$"], None)}
 
     @property
     def platform(self):
@@ -169,8 +175,7 @@ class Landsat8Muscate(MajaProduct):
             except ValueError:
                 return False
             validity_xpath = "./Processing_Flags_And_Modes_List/Processing_Flags_And_Modes/Value"
-            processing_flags = XMLTools.get_xpath(jpi, validity_xpath)
-            validity_flags = [flg.text for flg in processing_flags]
+            validity_flags = XMLTools.get_xpath_text(jpi, validity_xpath)
             if "L2VALD" in validity_flags:
                 return True
         return False
@@ -186,18 +191,15 @@ class Landsat8Muscate(MajaProduct):
             raise e
         return Site.from_raster(self.tile, band_bx)
 
-    @property
-    def mnt_resolutions_dict(self):
+    @staticmethod
+    def get_mnt_resolutions(resolution):
         return [{"name": "XS",
-                "val": str(self.mnt_resolution[0]) + " " + str(self.mnt_resolution[1])}]
+                 "val": str(resolution[0]) + " " + str(resolution[1])}]
 
     @property
     def max_l2_diff(self):
         return timedelta(days=30)
 
-    def get_synthetic_band(self, synthetic_band, **kwargs):
-        raise NotImplementedError
-
     def rgb_values(self):
         raise NotImplementedError
 
@@ -209,6 +211,10 @@ class Landsat8LC1(MajaProduct):
 
     base_resolution = (30, -30)
     coarse_resolution = (240, -240)
+    synthetic_band_files = {"green": ([r"*_B3.tif$"], None),
+                            "red": ([r"*_B4.tif$"], None),
+                            "nir": ([r"*_B5.tif$"], None),
+                            "swir": ([r"*_B6.tif$"], None)}
 
     @property
     def platform(self):
@@ -261,18 +267,15 @@ class Landsat8LC1(MajaProduct):
             raise e
         return Site.from_raster(self.tile, band_bx)
 
-    @property
-    def mnt_resolutions_dict(self):
+    @staticmethod
+    def get_mnt_resolutions(resolution):
         return [{"name": "XS",
-                "val": str(self.mnt_resolution[0]) + " " + str(self.mnt_resolution[1])}]
+                 "val": str(resolution[0]) + " " + str(resolution[1])}]
 
     @property
     def max_l2_diff(self):
         return timedelta(days=30)
 
-    def get_synthetic_band(self, synthetic_band, **kwargs):
-        raise NotImplementedError
-
     def rgb_values(self):
         raise NotImplementedError
 
@@ -284,6 +287,10 @@ class Landsat8LC2(MajaProduct):
 
     base_resolution = (30, -30)
     coarse_resolution = (240, -240)
+    synthetic_band_files = {"green": ([r"*_B3.tif$"], None),
+                            "red": ([r"*_B4.tif$"], None),
+                            "nir": ([r"*_B5.tif$"], None),
+                            "swir": ([r"*_B6.tif$"], None)}
 
     @property
     def platform(self):
@@ -336,17 +343,14 @@ class Landsat8LC2(MajaProduct):
             raise e
         return Site.from_raster(self.tile, band_bx)
 
-    @property
-    def mnt_resolutions_dict(self):
+    @staticmethod
+    def get_mnt_resolutions(resolution):
         return [{"name": "XS",
-                "val": str(self.mnt_resolution[0]) + " " + str(self.mnt_resolution[1])}]
+                 "val": str(resolution[0]) + " " + str(resolution[1])}]
 
     @property
     def max_l2_diff(self):
         return timedelta(days=30)
 
-    def get_synthetic_band(self, synthetic_band, **kwargs):
-        raise NotImplementedError
-
     def rgb_values(self):
         raise NotImplementedError
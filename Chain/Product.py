@@ -22,7 +22,8 @@ import re
 import shutil
 import tempfile
 import logging
-from Common import ImageTools
+import numpy as np
+from Common import ImageTools, ImageApps
 from Common.FileSystem import find
 from prepare_mnt.mnt.MNTFactory import MNTFactory
 from Common import FileSystem
@@ -38,6 +39,29 @@ class MajaProduct(object):
     base_resolution = (None, None)
     coarse_resolution = (None, None)
 
+    # The <Mission>-field of the maja xml-files for each platform and product type:
+    xml_maja_types = {"sentinel2": {"natif": "SENTINEL-2_", "muscate": "SENTINEL2_", "ssc": "SENTINEL-2_"},
+                      "landsat8": {"natif": "LANDSAT_8", "muscate": "LANDSAT8"},
+                      "venus": {"natif": "VENuS", "muscate": "VENUS"},
+                      "spot5": {"muscate": "SPOT5"},
+                      "spot4": {"muscate": "SPOT4"},
+                      "pleiades": {"muscate": "PLEIADES"},
+                      "sentinel1": {"s1tiling": "SENTINEL-2_"}
+                      }
+
+    # The platform ID used in the maja filenames:
+    platform_strings = {"sentinel2": "S2_",
+                        "landsat8": "L8",
+                        "venus": "VE",
+                        "spot5": "SPOT5",
+                        "spot4": "SPOT4",
+                        "pleiades": "PLEIADES",
+                        "sentinel1": "S2_"}
+
+    # The file pattern(s) of each band used by the synthetic bands, tried in the given order,
+    # and the index of the band inside the file (None for single band files):
+    synthetic_band_files = {}
+
     def __init__(self, filepath, **kwargs):
         """
         Set the path to the root product folder
@@ -125,17 +149,7 @@ class MajaProduct(object):
 
     @property
     def type_xml_maja(self):
-        platform = self.platform
-        ptype = self.type
-        types = {"sentinel2": {"natif": "SENTINEL-2_", "muscate": "SENTINEL2_", "ssc": "SENTINEL-2_"},
-                 "landsat8": {"natif": "LANDSAT_8", "muscate": "LANDSAT8"},
-                 "venus": {"natif": "VENuS", "muscate": "VENUS"},
-                 "spot5": {"muscate": "SPOT5"},
-                 "spot4": {"muscate": "SPOT4"},
-                 "pleiades": {"muscate": "PLEIADES"},
-                 "sentinel1": {"s1tiling": "SENTINEL-2_"}
-                 }
-        return types[platform][ptype]
+        return self.xml_maja_types[self.platform][self.type]
 
     def find_file(self, pattern, **kwargs):
         """
@@ -171,21 +185,24 @@ class MajaProduct(object):
     def mnt_site(self):
         raise NotImplementedError
 
+    @staticmethod
+    def get_mnt_resolutions(resolution):
+        """
+        Get the resolutions of the DTM rasters written for the platform.
+
+        :param resolution: The full resolution in x and y
+        :return: The list of resolutions, each given by its name and its value in x and y.
+        :rtype: list of dict
+        """
+        raise NotImplementedError
+
     @property
     def mnt_resolutions_dict(self):
-        raise NotImplementedError
+        return self.get_mnt_resolutions(self.mnt_resolution)
 
     @property
     def platform_str(self):
-        platform_choices = {"sentinel2": "S2_",
-                            "landsat8": "L8",
-                            "venus": "VE",
-                            "spot5": "SPOT5",
-                            "spot4": "SPOT4",
-                            "pleiades": "PLEIADES",
-                            "sentinel1": "S2_"}
-
-        return platform_choices[self.platform]
+        return self.platform_strings[self.platform]
 
     @property
     def max_l2_diff(self):
@@ -200,8 +217,93 @@ class MajaProduct(object):
                           mission_field=self.type_xml_maja, mnt_resolutions=self.mnt_resolutions_dict,
                           coarse_res=coarse_res, **kwargs).factory()
 
+    def get_band_file(self, band):
+        """
+        Find the file of a band used by the synthetic bands.
+
+        :param band: The band name, e.g. 'red'
+        :return: The path to the file and the index of the band inside it (None for single band files)
+        :rtype: tuple
+        """
+        if band not in self.synthetic_band_files:
+            raise ValueError("The %s band is not available for %s products" % (band, self.platform))
+        patterns, index = self.synthetic_band_files[band]
+        for pattern in patterns:
+            try:
+                return self.find_file(pattern=pattern, depth=None)[0], index
+            except ValueError:
+                continue
+        raise ValueError("Cannot find the %s band in %s" % (band, self.fpath))
+
+    def get_band(self, band):
+        """
+        Get a band used by the synthetic bands. The band is only read on first access.
+
+        :param band: The band name, e.g. 'red'
+        :return: A :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper` object
+        """
+        path, index = self.get_band_file(band)
+        if index is None:
+            return GDalDatasetWrapper.from_file(path, lazy=True)
+        return ImageTools.gdal_translate(path, b=index, lazy=True)
+
+    def get_synthetic_bands(self, synthetic_bands, **kwargs):
+        """
+        Calculate several synthetic bands in a single pass, reading each of the required bands once.
+        Existing outputs are skipped if they are up to date, i.e. newer than their input bands.
+
+        :param synthetic_bands: The synthetic bands, e.g. ["ndvi", "ndsi", "mca_sim"]
+        :keyword wdir: The directory in which the output folder is created. Default is the product directory.
+        :keyword output_filenames: Override the output filename of the given synthetic bands.
+        :keyword max_value: The maximum value of the normalized differences. Default is 10000.
+        :keyword n_threads: The number of threads used. Default is 4.
+        :return: The output filename of each synthetic band, in the same order.
+        :rtype: list of str
+        """
+        wdir = kwargs.get("wdir", self.fpath)
+        output_folder = os.path.join(wdir, self.base)
+        max_value = kwargs.get("max_value", 10000.)
+        output_filenames = {}
+        for synthetic_band in synthetic_bands:
+            if synthetic_band.lower() not in ImageApps.synthetic_band_inputs:
+                raise ValueError("Unknown synthetic band %s" % synthetic_band)
+            output_bname = "_".join([self.base.split(".")[0], synthetic_band.upper() + ".tif"])
+            output_filenames[synthetic_band.lower()] = kwargs.get("output_filenames", {}).get(
+                synthetic_band, os.path.join(output_folder, output_bname))
+        # Skip the outputs that are up to date:
+        band_files = {}
+        todo = []
+        for name, path in output_filenames.items():
+            if os.path.exists(path):
+                for b in ImageApps.synthetic_band_inputs[name]:
+                    band_files.setdefault(b, self.get_band_file(b)[0])
+                if os.path.getmtime(path) >= max(os.path.getmtime(band_files[b])
+                                                 for b in ImageApps.synthetic_band_inputs[name]):
+                    continue
+            todo.append(name)
+        if todo:
+            band_names = set(b for name in todo for b in ImageApps.synthetic_band_inputs[name])
+            bands = {b: self.get_band(b) for b in band_names}
+            for name in todo:
+                FileSystem.create_directory(os.path.dirname(os.path.abspath(output_filenames[name])))
+            ImageApps.get_synthetic_bands(bands, todo, vrange=(0, max_value), dtype=np.int16,
+                                          dst=output_filenames,
+                                          n_threads=kwargs.get("n_threads", 4))
+        return [output_filenames[b.lower()] for b in synthetic_bands]
+
     def get_synthetic_band(self, synthetic_band, **kwargs):
-        raise NotImplementedError
+        """
+        Calculate a single synthetic band, see :func:`get_synthetic_bands`.
+
+        :param synthetic_band: The synthetic band, e.g. "ndvi"
+        :keyword output_filename: Override the output filename.
+        :return: The output filename
+        :rtype: str
+        """
+        output_filename = kwargs.pop("output_filename", None)
+        if output_filename:
+            kwargs["output_filenames"] = {synthetic_band: output_filename}
+        return self.get_synthetic_bands([synthetic_band], **kwargs)[0]
 
     def _reproject_to_epsg(self, img, outpath, epsg):
         tmpfile = tempfile.mktemp(prefix="reproject_", suffix=".tif")
@@ -19,13 +19,11 @@ limitations under the License.
 
 import os
 import re
-import numpy as np
 from datetime import datetime, timedelta
 from Chain.Product import MajaProduct
-from Common import ImageIO, FileSystem, ImageTools, XMLTools, ImageApps
+from Common import FileSystem, XMLTools
 from Common.FileSystem import symlink
 from prepare_mnt.mnt.SiteInfo import Site
-from Common.GDalDatasetWrapper import GDalDatasetWrapper
 
 
 class Sentinel2Natif(MajaProduct):
@@ -35,6 +33,10 @@ class Sentinel2Natif(MajaProduct):
 
     base_resolution = (10, -10)
     coarse_resolution = (120, -120)
+    synthetic_band_files = {"green": ([r"*B0?3(_10m)?.jp2$"], None),
+                            "red": ([r"*B0?4(_10m)?.jp2$"], None),
+                            "nir": ([r"*B0?8(_10m)?.jp2$"], None),
+                            "swir": ([r"*B11(_20m)?.jp2$"], None)}
 
     @property
     def platform(self):
@@ -89,12 +91,12 @@ class Sentinel2Natif(MajaProduct):
             raise e
         return Site.from_raster(self.tile, band_b2)
 
-    @property
-    def mnt_resolutions_dict(self):
+    @staticmethod
+    def get_mnt_resolutions(resolution):
         return [{"name": "R1",
-                "val": str(self.mnt_resolution[0]) + " " + str(self.mnt_resolution[1])},
+                 "val": str(resolution[0]) + " " + str(resolution[1])},
                 {"name": "R2",
-                 "val": str(self.mnt_resolution[0] * 2) + " " + str(self.mnt_resolution[1] * 2)}]
+                 "val": str(resolution[0] * 2) + " " + str(resolution[1] * 2)}]
 
     @property
     def max_l2_diff(self):
@@ -103,43 +105,6 @@ class Sentinel2Natif(MajaProduct):
         else:
             return timedelta(days=15)
 
-    def get_synthetic_band(self, synthetic_band, **kwargs):
-        wdir = kwargs.get("wdir", self.fpath)
-        output_folder = os.path.join(wdir, self.base)
-        output_bname = "_".join([self.base.split(".")[0], synthetic_band.upper() + ".tif"])
-        output_filename = kwargs.get("output_filename", os.path.join(output_folder, output_bname))
-        max_value = kwargs.get("max_value", 10000.)
-        # Skip existing:
-        if os.path.exists(output_filename):
-            return output_filename
-        if synthetic_band.lower() == "ndvi":
-            FileSystem.create_directory(output_folder)
-            b4 = self.find_file(pattern=r"*B0?4(_10m)?.jp2$")[0]
-            b8 = self.find_file(pattern=r"*B0?8(_10m)?.jp2$")[0]
-            ds_red = GDalDatasetWrapper.from_file(b4)
-            ds_nir = GDalDatasetWrapper.from_file(b8)
-            ds_ndvi = ImageApps.get_ndvi(ds_red, ds_nir, vrange=(0, max_value), dtype=np.int16)
-            ds_ndvi.write(output_filename, options=["COMPRESS=DEFLATE"])
-        elif synthetic_band.lower() == "ndsi":
-            FileSystem.create_directory(output_folder)
-            b3 = self.find_file(pattern=r"*B0?3(_10m)?.jp2$")[0]
-            b11 = self.find_file(pattern=r"*B11(_20m)?.jp2$")[0]
-            ds_green = ImageTools.gdal_translate(b3, tr="20 20", r="cubic")
-            ds_swir = GDalDatasetWrapper.from_file(b11)
-            ds_ndsi = ImageApps.get_ndsi(ds_green, ds_swir, vrange=(0, max_value), dtype=np.int16)
-            ds_ndsi.write(output_filename, options=["COMPRESS=DEFLATE"])
-        elif synthetic_band.lower() == "mca_sim":
-            FileSystem.create_directory(output_folder)
-            b4 = self.find_file(pattern=r"*B0?4(_10m)?.jp2$")[0]
-            b3 = self.find_file(pattern=r"*B0?3(_10m)?.jp2$")[0]
-            img_red, drv = ImageIO.tiff_to_array(b4, array_only=False)
-            img_green = ImageIO.tiff_to_array(b3)
-            img_mcasim = (img_red + img_green) / 2
-            ImageIO.write_geotiff_existing(img_mcasim, output_filename, drv, options=["COMPRESS=DEFLATE"])
-        else:
-            raise ValueError("Unknown synthetic band %s" % synthetic_band)
-        return output_filename
-
     def rgb_values(self):
         raise NotImplementedError
 
@@ -151,6 +116,10 @@ class Sentinel2Muscate(MajaProduct):
 
     base_resolution = (10, -10)
     coarse_resolution = (120, -120)
+    synthetic_band_files = {"green": ([r"*_FRE_B0?3.tif$", r"*_B0?3.tif$"], None),
+                            "red": ([r"*_FRE_B0?4.tif$", r"*_B0?4.tif$"], None),
+                            "nir": ([r"*_FRE_B0?8.tif$", r"*_B0?8.tif$"], None),
+                            "swir": ([r"*_FRE_B11.tif$", r"*_B11.tif$"], None)}
 
     @property
     def platform(self):
@@ -206,8 +175,7 @@ class Sentinel2Muscate(MajaProduct):
             except ValueError:
                 return False
             validity_xpath = "./Processing_Flags_And_Modes_List/Processing_Flags_And_Modes/Value"
-            processing_flags = XMLTools.get_xpath(jpi, validity_xpath)
-            validity_flags = [flg.text for flg in processing_flags]
+            validity_flags = XMLTools.get_xpath_text(jpi, validity_xpath)
             if "L2VALD" in validity_flags:
                 return True
         return False
@@ -223,12 +191,12 @@ class Sentinel2Muscate(MajaProduct):
             raise e
         return Site.from_raster(self.tile, band_b2)
 
-    @property
-    def mnt_resolutions_dict(self):
+    @staticmethod
+    def get_mnt_resolutions(resolution):
         return [{"name": "R1",
-                "val": str(self.mnt_resolution[0]) + " " + str(self.mnt_resolution[1])},
+                 "val": str(resolution[0]) + " " + str(resolution[1])},
                 {"name": "R2",
-                 "val": str(self.mnt_resolution[0] * 2) + " " + str(self.mnt_resolution[1] * 2)}]
+                 "val": str(resolution[0] * 2) + " " + str(resolution[1] * 2)}]
 
 
     @property
@@ -238,9 +206,6 @@ class Sentinel2Muscate(MajaProduct):
         else:
             return timedelta(days=15)
 
-    def get_synthetic_band(self, synthetic_band, **kwargs):
-        raise NotImplementedError
-
     def rgb_values(self):
         raise NotImplementedError
 
@@ -252,6 +217,11 @@ class Sentinel2SSC(MajaProduct):
 
     base_resolution = (10, -10)
     coarse_resolution = (120, -120)
+    # The R1 image holds the bands B2, B3, B4, B8 and the R2 image B5, B6, B7, B8A, B11, B12:
+    synthetic_band_files = {"green": ([r"*IMG*R1*DBL.TIF"], 2),
+                            "red": ([r"*IMG*R1*DBL.TIF"], 3),
+                            "nir": ([r"*IMG*R1*DBL.TIF"], 4),
+                            "swir": ([r"*IMG*R2*DBL.TIF"], 5)}
 
     @property
     def platform(self):
@@ -312,14 +282,14 @@ class Sentinel2SSC(MajaProduct):
             band_bx = self.find_file(pattern=r"*IMG*DBL.TIF")[0]
         except IOError as e:
             raise e
-        return Site.from_raster(self.tile, band_bx, shape_index_y=1, shape_index_x=2)
+        return Site.from_raster(self.tile, band_bx)
 
-    @property
-    def mnt_resolutions_dict(self):
+    @staticmethod
+    def get_mnt_resolutions(resolution):
         return [{"name": "R1",
-                "val": str(self.mnt_resolution[0]) + " " + str(self.mnt_resolution[1])},
+                 "val": str(resolution[0]) + " " + str(resolution[1])},
                 {"name": "R2",
-                 "val": str(self.mnt_resolution[0] * 2) + " " + str(self.mnt_resolution[1] * 2)}]
+                 "val": str(resolution[0] * 2) + " " + str(resolution[1] * 2)}]
 
     @property
     def max_l2_diff(self):
@@ -328,8 +298,5 @@ class Sentinel2SSC(MajaProduct):
         else:
             return timedelta(days=15)
 
-    def get_synthetic_band(self, synthetic_band, **kwargs):
-        raise NotImplementedError
-
     def rgb_values(self):
         raise NotImplementedError
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2016-2020 Centre National d'Etudes Spatiales (CNES), CSSI, CESBIO  All Rights Reserved
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import sys
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))  # Import relative modules
+
+
+def create_synthetic_bands(product_path, synthetic_bands, **kwargs):
+    """
+    Calculate the synthetic bands of a single product. Used as worker of :func:`create_synthetic_bands_batch`.
+
+    :param product_path: The path to the product folder
+    :param synthetic_bands: The synthetic bands, e.g. ["ndvi", "ndsi"]
+    :param kwargs: Forwarded parameters to :func:`Chain.Product.MajaProduct.get_synthetic_bands`
+    :return: The output filenames and the processing time in seconds
+    :rtype: tuple
+    """
+    from Chain.Product import MajaProduct
+    start = time.time()
+    product = MajaProduct.factory(product_path)
+    if product is None:
+        raise ValueError("Unknown product type: %s" % product_path)
+    outputs = product.get_synthetic_bands(synthetic_bands, **kwargs)
+    return outputs, time.time() - start
+
+
+def create_synthetic_bands_batch(products, synthetic_bands, nprocs=1, **kwargs):
+    """
+    Calculate the synthetic bands of a list of products, e.g. the time series of a tile,
+    several products being processed concurrently. Outputs which are up to date are skipped.
+
+    :param products: The list of products, e.g. :attr:`StartMaja.avail_input_l1`
+    :type products: list of :class:`Chain.Product.MajaProduct`
+    :param synthetic_bands: The synthetic bands, e.g. ["ndvi", "ndsi"]
+    :param nprocs: The number of products processed concurrently. Default is 1.
+    :param kwargs: Forwarded parameters to :func:`Chain.Product.MajaProduct.get_synthetic_bands`, e.g. wdir.
+    :return: The output filenames and the processing time in seconds of each product, indexed by its path,
+             and the list of products for which the calculation failed.
+    :rtype: tuple
+    """
+    results, failed = {}, []
+    with ProcessPoolExecutor(max_workers=nprocs) as executor:
+        futures = {executor.submit(create_synthetic_bands, product.fpath, synthetic_bands, **kwargs): product
+                   for product in products}
+        for future in as_completed(futures):
+            product = futures[future]
+            try:
+                results[product.fpath] = future.result()
+                logger.info("Synthetic bands of %s done in %.1fs" % (product.base, results[product.fpath][1]))
+            except Exception as e:
+                logger.error("Synthetic band calculation failed for %s: %s" % (product.base, e))
+                failed.append(product)
+    return results, failed
+
+
+if __name__ == "__main__":
+    import argparse
+    from Chain.Product import MajaProduct
+    from Common.ImageApps import synthetic_band_inputs
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", help="The folder containing the products.", required=True, type=str)
+    parser.add_argument("-b", "--bands", help="The synthetic bands to calculate. Default is ndvi.", nargs="+",
+                        default=["ndvi"], required=False, type=str, choices=sorted(synthetic_band_inputs.keys()))
+    parser.add_argument("-t", "--tile", help="Only use the products of the given tile/site.", required=False, type=str)
+    parser.add_argument("-l", "--level", help="Only use the products of the given level. Default is l1c.",
+                        default="l1c", required=False, type=str)
+    parser.add_argument("-o", "--out_dir", help="Output directory. Default is the product directory.",
+                        required=False, type=str)
+    parser.add_argument("--nprocs", help="Number of products processed concurrently. Default is 1",
+                        default=1, required=False, type=int)
+    parser.add_argument("-n", "--nthreads", help="Number of threads used for each product. Default is 4",
+                        default=4, required=False, type=int)
+    parser.add_argument("--max_value", help="Maximum value of the normalized differences. Default is 10000",
+                        default=10000, required=False, type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("root")
+    folders = [os.path.join(args.input, f) for f in sorted(os.listdir(args.input))]
+    prods = [MajaProduct.factory(f) for f in folders if os.path.isdir(f)]
+    prods = [prod for prod in prods if prod is not None and prod.level == args.level.lower()
+             and (not args.tile or prod.tile == args.tile)]
+    options = {"n_threads": args.nthreads, "max_value": args.max_value}
+    if args.out_dir:
+        options["wdir"] = args.out_dir
+    _, prods_failed = create_synthetic_bands_batch(prods, args.bands, args.nprocs, **options)
+    sys.exit(1 if prods_failed else 0)
+else:
+    logger = logging.getLogger("root")
@@ -33,6 +33,10 @@ class VenusNatif(MajaProduct):
 
     base_resolution = (5, -5)
     coarse_resolution = (100, -100)
+    # The image holds the bands B1 to B12. Venus has no SWIR band:
+    synthetic_band_files = {"green": ([r"*IMG*DBL.TIF"], 4),
+                            "red": ([r"*IMG*DBL.TIF"], 7),
+                            "nir": ([r"*IMG*DBL.TIF"], 11)}
 
     @property
     def platform(self):
@@ -100,19 +104,16 @@ class VenusNatif(MajaProduct):
             band_bx = self.find_file(pattern=r"*IMG*DBL.TIF")[0]
         except IOError as e:
             raise e
-        return Site.from_raster(self.tile, band_bx, shape_index_y=1, shape_index_x=2)
+        return Site.from_raster(self.tile, band_bx)
 
-    @property
-    def mnt_resolutions_dict(self):
+    @staticmethod
+    def get_mnt_resolutions(resolution):
         return [{"name": "XS",
-                "val": str(self.mnt_resolution[0]) + " " + str(self.mnt_resolution[1])}]
+                 "val": str(resolution[0]) + " " + str(resolution[1])}]
     @property
     def max_l2_diff(self):
         return timedelta(days=15)
 
-    def get_synthetic_band(self, synthetic_band, **kwargs):
-        raise NotImplementedError
-
     def rgb_values(self):
         raise NotImplementedError
 
@@ -124,6 +125,10 @@ class VenusMuscate(MajaProduct):
 
     base_resolution = (5, -5)
     coarse_resolution = (100, -100)
+    # Venus has no SWIR band:
+    synthetic_band_files = {"green": ([r"*_FRE_B0?4.tif$", r"*_B0?4.tif$"], None),
+                            "red": ([r"*_FRE_B0?7.tif$", r"*_B0?7.tif$"], None),
+                            "nir": ([r"*_FRE_B11.tif$", r"*_B11.tif$"], None)}
 
     @property
     def platform(self):
@@ -183,8 +188,7 @@ class VenusMuscate(MajaProduct):
             except ValueError:
                 return False
             validity_xpath = "./Processing_Flags_And_Modes_List/Processing_Flags_And_Modes/Value"
-            processing_flags = XMLTools.get_xpath(jpi, validity_xpath)
-            validity_flags = [flg.text for flg in processing_flags]
+            validity_flags = XMLTools.get_xpath_text(jpi, validity_xpath)
             if "L2VALD" in validity_flags:
                 return True
         return False
@@ -200,17 +204,14 @@ class VenusMuscate(MajaProduct):
             raise e
         return Site.from_raster(self.tile, band_bx)
 
-    @property
-    def mnt_resolutions_dict(self):
+    @staticmethod
+    def get_mnt_resolutions(resolution):
         return [{"name": "XS",
-                "val": str(self.mnt_resolution[0]) + " " + str(self.mnt_resolution[1])}]
+                 "val": str(resolution[0]) + " " + str(resolution[1])}]
 
     @property
     def max_l2_diff(self):
         return timedelta(days=15)
 
-    def get_synthetic_band(self, synthetic_band, **kwargs):
-        raise NotImplementedError
-
     def rgb_values(self):
         raise NotImplementedError
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2016-2020 Centre National d'Etudes Spatiales (CNES), CSSI, CESBIO  All Rights Reserved
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from osgeo import gdal, gdal_array
+from Common import FileSystem, ImageIO
+from Common.GDalDatasetWrapper import GDalDatasetWrapper
+
+
+def get_tile_size(options=None):
+    """
+    Get the tile size of the outputs written with the given creation options.
+
+    :param options: The GDAL creation options. Default is :func:`Common.ImageIO.get_creation_options`.
+    :return: The tile width and height in pixels
+    :rtype: tuple of int
+    """
+    tile_x = tile_y = ImageIO.default_block_size
+    for option in options or []:
+        name, _, value = option.partition("=")
+        if name.upper() == "BLOCKXSIZE":
+            tile_x = int(value)
+        elif name.upper() == "BLOCKYSIZE":
+            tile_y = int(value)
+    return tile_x, tile_y
+
+
+def get_block_size(wrapper, tile_size=(ImageIO.default_block_size, ImageIO.default_block_size)):
+    """
+    Get a processing block size aligned to the natural GDAL block size of a dataset as well as to the output tiles.
+    The natural blocks are grouped to multiples of the output tile size, so that each output tile
+    is written at once, instead of being rewritten by several blocks. Strips are grouped over the full width.
+
+    :param wrapper: The dataset
+    :type wrapper: :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper`
+    :param tile_size: The tile width and height of the outputs in pixels (See :func:`get_tile_size`).
+    :return: The block width and height in pixels
+    :rtype: tuple of int
+    """
+    width, height = wrapper.size
+    if wrapper.is_loaded:
+        # The array is in memory, every block size is aligned:
+        block_x, block_y = width, 1
+    else:
+        block_x, block_y = wrapper.get_ds().GetRasterBand(1).GetBlockSize()
+    tile_x, tile_y = tile_size
+    block_x = width if block_x >= width else min(width, int(np.ceil(block_x / tile_x)) * tile_x)
+    return block_x, min(height, int(np.ceil(block_y / tile_y)) * tile_y)
+
+
+def get_block_windows(width, height, block_x, block_y):
+    """
+    Split a raster into blocks, row by row.
+
+    :param width: The raster width in pixels
+    :param height: The raster height in pixels
+    :param block_x: The block width in pixels
+    :param block_y: The block height in pixels
+    :return: The window (x_off, y_off, x_size, y_size) of each block
+    :rtype: list of tuple
+    """
+    return [(x, y, min(block_x, width - x), min(block_y, height - y))
+            for y in range(0, height, block_y)
+            for x in range(0, width, block_x)]
+
+
+class _Output(object):
+    """
+    A raster written block by block, either in memory or to a GeoTIFF on disk.
+    """
+
+    def __init__(self, reference, dtype, n_bands, dst=None, nodata=None, options=None):
+        width, height = reference.size
+        self.reference = reference
+        self.dst = dst
+        self.nodata = nodata
+        self.lock = threading.Lock()
+        if dst:
+            FileSystem.remove_file(dst)
+            driver = gdal.GetDriverByName("GTiff")
+            self.ds = driver.Create(dst, width, height, n_bands,
+                                    gdal_array.NumericTypeCodeToGDALTypeCode(np.dtype(dtype).type),
+                                    options=ImageIO.get_creation_options(dtype) if options is None else options)
+            self.ds.SetGeoTransform(reference.geotransform)
+            self.ds.SetProjection(reference.projection)
+            if nodata is not None:
+                for i in range(n_bands):
+                    self.ds.GetRasterBand(i + 1).SetNoDataValue(nodata)
+            self.array = None
+        else:
+            self.ds = None
+            shape = (height, width) if n_bands == 1 else (height, width, n_bands)
+            self.array = np.empty(shape, dtype=dtype)
+
+    def write(self, block, x, y):
+        if self.ds is None:
+            # Blocks never overlap, so no lock is needed to fill the array:
+            self.array[y:y + block.shape[0], x:x + block.shape[1]] = block
+            return
+        block = block.reshape(block.shape[0], block.shape[1], -1)
+        # GDAL datasets must not be written from several threads at once:
+        with self.lock:
+            for i in range(block.shape[2]):
+                self.ds.GetRasterBand(i + 1).WriteArray(block[:, :, i], x, y)
+
+    def close(self):
+        if self.ds is None:
+            return GDalDatasetWrapper(array=self.array,
+                                      projection=self.reference.projection,
+                                      geotransform=self.reference.geotransform,
+                                      nodata_value=self.nodata)
+        self.ds.FlushCache()
+        self.ds = None
+        return GDalDatasetWrapper.from_file(self.dst, lazy=True, bands_last=True)
+
+
+def process_blocks(func, *inputs, **kwargs):
+    """
+    Apply a function to a set of aligned rasters block by block, in a thread pool.
+    The function receives one block of each input, as returned by
+    :func:`Common.GDalDatasetWrapper.GDalDatasetWrapper.read_window`, and returns one numpy array
+    of shape (y, x) or (y, x, bands) per output.
+    The results are written into the outputs as soon as they are available.
+    As each block is written to its own window, the result does not depend on the scheduling.
+
+    :param func: The function to apply, e.g. lambda red, nir: red + nir
+    :param inputs: The input datasets, all of the same size.
+    :type inputs: :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper`
+    :keyword dtypes: The dtype of each output. Default is a single float32 output.
+    :keyword n_bands: The number of bands of each output. Default is 1.
+    :keyword dst: The path of each output to write it to disk as GeoTIFF. By default, the outputs are kept in memory.
+    :keyword nodata: The nodata value of the outputs. Default is the one of the first input.
+    :keyword options: GDAL creation options of the outputs written to disk.
+                      Default is :func:`Common.ImageIO.get_creation_options` for the dtype of each output.
+    :keyword block_size: The (x, y) block size. By default, the GDAL block size of the first input is used,
+                         grouped to multiples of the output tile size (See :func:`get_block_size`).
+    :keyword n_threads: The number of threads. Default is 4.
+    :keyword max_pending: The maximum number of blocks read but not yet written. Default is 2 * n_threads.
+    :keyword progress: Callback called with the number of blocks done and the total number of blocks.
+    :return: The output datasets
+    :rtype: list of :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper`
+    """
+    if not inputs:
+        raise ValueError("Need at least one input to process.")
+    reference = inputs[0]
+    for inp in inputs[1:]:
+        if inp.size != reference.size:
+            raise ValueError("Cannot process inputs of different sizes: %s vs. %s" % (inp.size, reference.size))
+    dtypes = kwargs.get("dtypes", [np.float32])
+    n_bands = kwargs.get("n_bands", [1] * len(dtypes))
+    dst = kwargs.get("dst", [None] * len(dtypes))
+    nodata = kwargs.get("nodata", reference.nodata_value)
+    n_threads = kwargs.get("n_threads", 4)
+    max_pending = kwargs.get("max_pending", 2 * n_threads)
+    progress = kwargs.get("progress", None)
+    options = kwargs.get("options")
+    block_x, block_y = kwargs.get("block_size", None) or get_block_size(reference, get_tile_size(options))
+
+    outputs = [_Output(reference, dtype, bands, dst=path, nodata=nodata, options=options)
+               for dtype, bands, path in zip(dtypes, n_bands, dst)]
+    # GDAL datasets must not be read from several threads at once:
+    read_locks = [threading.Lock() for _ in inputs]
+
+    def process(window):
+        blocks = []
+        for inp, lock in zip(inputs, read_locks):
+            with lock:
+                blocks.append(inp.read_window(*window))
+        results = func(*blocks)
+        if type(results) not in [tuple, list]:
+            results = [results]
+        for output, result in zip(outputs, results):
+            output.write(np.asarray(result), window[0], window[1])
+
+    windows = get_block_windows(*reference.size, block_x, block_y)
+    n_done = 0
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        for i, window in enumerate(windows):
+            pending.append(executor.submit(process, window))
+            # Bound the memory used by waiting for the oldest blocks, and for all of them at the end:
+            while len(pending) >= max_pending or (pending and i == len(windows) - 1):
+                pending.popleft().result()
+                n_done += 1
+                if progress:
+                    progress(n_done, len(windows))
+    logger.debug("Processed %s blocks of %sx%s pixels" % (len(windows), block_x, block_y))
+    return [output.close() for output in outputs]
+
+
+if __name__ == "__main__":
+    pass
+else:
+    logger = logging.getLogger("root")
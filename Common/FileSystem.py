@@ -19,8 +19,13 @@ limitations under the License.
 
 from __future__ import print_function
 import os
+import re
+import time
 import shutil
 import logging
+import functools
+import threading
+from collections import OrderedDict
 
 
 def create_directory(path):
@@ -65,7 +70,114 @@ def remove_directory(directory):
         logger.debug("Cannot remove directory {0}".format(directory))
 
 
-def find(pattern, path, case_sensitive=False, depth=None, ftype="all"):
+# Directory listings cached by :func:`find`, indexed by the directory path, the oldest first:
+_listing_cache = OrderedDict()
+_listing_cache_lock = threading.Lock()
+# Maximum number of directory listings cached:
+listing_cache_size = 4096
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_pattern(pattern, case_sensitive):
+    reg_to_find = pattern.replace("*", ".*")
+    if not case_sensitive:
+        reg_to_find = reg_to_find.lower()
+    return re.compile(reg_to_find)
+
+
+def _list_directory(path, cache_ttl=None):
+    """
+    List the files and folders of a directory in a single :func:`os.scandir` pass.
+
+    :param path: The directory
+    :param cache_ttl: Reuse a listing of the directory if it is younger than the given number of seconds.
+    :return: The file names, the folder names and the names of the folders to descend into (i.e. not symlinks).
+    :rtype: tuple of list
+    """
+    if cache_ttl:
+        with _listing_cache_lock:
+            cached = _listing_cache.get(path)
+            if cached and time.time() - cached[0] < cache_ttl:
+                return cached[1]
+    files, dirs, walk_dirs = [], [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    dirs.append(entry.name)
+                    if not entry.is_symlink():
+                        walk_dirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+    except OSError:
+        # Same as os.walk, unreadable directories are skipped:
+        pass
+    listing = files, dirs, walk_dirs
+    if cache_ttl:
+        _cache_listing(path, listing, cache_ttl)
+    return listing
+
+
+def _cache_listing(path, listing, cache_ttl):
+    """
+    Add a directory listing to the cache.
+    The listings older than the given time to live are evicted, as well as the oldest ones
+    if the cache holds more than `listing_cache_size` listings.
+
+    :param path: The directory
+    :param listing: The listing as returned by :func:`_list_directory`
+    :param cache_ttl: The time to live of the listings in seconds
+    """
+    now = time.time()
+    with _listing_cache_lock:
+        # Keep the listings ordered by age:
+        _listing_cache.pop(path, None)
+        _listing_cache[path] = (now, listing)
+        while len(_listing_cache) > listing_cache_size:
+            _listing_cache.popitem(last=False)
+        # The listing just added is never expired:
+        while now - next(iter(_listing_cache.values()))[0] >= cache_ttl:
+            _listing_cache.popitem(last=False)
+
+
+def clear_find_cache():
+    """
+    Clear the directory listings cached by :func:`find`.
+    """
+    with _listing_cache_lock:
+        _listing_cache.clear()
+
+
+def walk(path, depth=None, cache_ttl=None):
+    """
+    Walk a directory-tree top-down in the same order as :func:`os.walk`, listing each directory only once.
+    Symlinked folders are listed, but not descended into.
+    As for :func:`os.walk`, the folders to descend into can be pruned by removing them from the yielded list.
+
+    :param path: The path to the root directory
+    :param depth: Descend only up to a specified depth. Default is None, signifying a maximum limit of 20.
+    :param cache_ttl: Reuse the directory listings younger than the given number of seconds. See :func:`find`.
+    :return: Generator of the directory path, its file names, its folder names and the folders to descend into.
+    """
+    path = os.path.abspath(path)
+    if not depth:
+        depth = 20  # Limit depth in case it is not specified.
+    stack = [(path, 0)]
+    while stack:
+        root, level = stack.pop()
+        files, dirs, walk_dirs = _list_directory(root, cache_ttl)
+        # The cached listings must not be pruned:
+        walk_dirs = list(walk_dirs)
+        yield root, files, dirs, walk_dirs
+        if level + 1 < depth:
+            stack += [(os.path.join(root, d), level + 1) for d in reversed(walk_dirs)]
+
+
+def find(pattern, path, case_sensitive=False, depth=None, ftype="all", cache_ttl=None):
     """
     Find a file or dir in a directory-tree of given depth.
 
@@ -74,38 +186,31 @@ def find(pattern, path, case_sensitive=False, depth=None, ftype="all"):
     :param case_sensitive: Do a case sensitive comparison. Default is False.
     :param depth: Search only up to a specified depth. Default is None, signifying a maximum limit of 20.
     :param ftype: Can be "file", "folder" or "all".
+    :param cache_ttl: Reuse the directory listings of previous calls which are younger than the given
+                      number of seconds. Default is None, i.e. the directories are always listed.
     :return: The file/directory if found. AssertionError if not.
     """
-    import re
+    if ftype not in ["all", "file", "folder"]:
+        raise ValueError("Unknown type %s" % ftype)
     result = []
-
-    reg_to_find = pattern.replace("*", ".*")
-
-    if not case_sensitive:
-        reg_to_find = reg_to_find.lower()
-
+    reg_to_find = _compile_pattern(pattern, case_sensitive)
     path = os.path.abspath(path)
-    if not depth:
-        depth = 20  # Limit depth in case it is not specified.
-    for root, dirs, files in os.walk(path):
-        if root[len(path):].count(os.sep) < depth:
-            if ftype == "all":
-                names = files + dirs
-            elif ftype == "file":
-                names = files
-            elif ftype == "folder":
-                names = dirs
-            else:
-                raise ValueError("Unknown type %s" % ftype)
-            for name in names:
-                if re.search(reg_to_find, name if case_sensitive else name.lower()):
-                    result.append(os.path.join(root, name))
+    for root, files, dirs, _ in walk(path, depth=depth, cache_ttl=cache_ttl):
+        if ftype == "all":
+            names = files + dirs
+        elif ftype == "file":
+            names = files
+        else:
+            names = dirs
+        for name in names:
+            if reg_to_find.search(name if case_sensitive else name.lower()):
+                result.append(os.path.join(root, name))
     if not result:
         raise ValueError("Cannot find %s in %s" % (pattern, path))
     return result
 
 
-def find_single(pattern, path, case_sensitive=False, depth=None, ftype="all"):
+def find_single(pattern, path, case_sensitive=False, depth=None, ftype="all", cache_ttl=None):
     """
     Find a single file or dir in a directory-tree.
 
@@ -114,9 +219,10 @@ def find_single(pattern, path, case_sensitive=False, depth=None, ftype="all"):
     :param case_sensitive: Do a case sensitive comparison.
     :param depth: Search only up to a specified depth. Default is None, signifying a maximum limit of 20.
     :param ftype: Can be "file", "folder" or "all".
+    :param cache_ttl: Reuse the directory listings younger than the given number of seconds. See :func:`find`.
     :return: The file/directory if found. ValueError if not.
     """
-    return find(pattern, path, case_sensitive=case_sensitive, depth=depth, ftype=ftype)[0]
+    return find(pattern, path, case_sensitive=case_sensitive, depth=depth, ftype=ftype, cache_ttl=cache_ttl)[0]
 
 
 def symlink(src, dst):
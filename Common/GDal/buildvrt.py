@@ -18,9 +18,9 @@ limitations under the License.
 """
 
 from osgeo import gdal
-import uuid
 from Common import FileSystem
 from Common.GDalDatasetWrapper import GDalDatasetWrapper
+from Common.GDal import vsimem
 
 
 def gdal_buildvrt(*inputs, dst=None, **options):
@@ -39,6 +39,10 @@ def gdal_buildvrt(*inputs, dst=None, **options):
     for k, v in options.items():
         if k in gdal_common_params:
             options_list += ["--%s" % k, "%s" % v]
+        elif type(v) in [list, tuple]:
+            # Repeatable options, e.g. co=["TILED=YES", "COMPRESS=DEFLATE"]:
+            for item in v:
+                options_list += ["-%s" % k, "%s" % item]
         elif type(v) is not bool:
             options_list += ["-%s" % k, "%s" % v]
         elif type(v) is bool and v is True:
@@ -58,6 +62,7 @@ def gdal_buildvrt(*inputs, dst=None, **options):
         ds_out = gdal.Open(dst)
     else:
         # Write directly into memory if no path specified (faster):
-        dst = "/vsimem/" + uuid.uuid4().hex
-        ds_out = gdal.BuildVRT(dst, [i for i in inputs], options=options_list)
-    return GDalDatasetWrapper(ds=ds_out)
+        dst = vsimem.get_path()
+        ds_out = vsimem.track(gdal.BuildVRT(dst, [i for i in inputs], options=options_list), dst,
+                               keep_alive=inputs)
+    return GDalDatasetWrapper(ds=ds_out, lazy=True)
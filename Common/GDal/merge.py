@@ -17,43 +17,97 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import os
-import tempfile
 import logging
 from osgeo import gdal
-from Common.FileSystem import run_external_app
-from Common.FileSystem import remove_directory
+from Common import FileSystem
+from Common.GDalDatasetWrapper import GDalDatasetWrapper
+from Common.GDal import vsimem
 
-def run_merge(*src, argv=None):
+
+def _parse_floats(value):
+    return [float(v) for v in str(value).split()]
+
+
+def gdal_merge(*src, dst=None, **options):
     """
-    Run gdal_merge using an external process.
+    Mosaic a list of datasets in-process, following the behaviour of gdal_merge.py:
+    The inputs are stacked into a VRT, which is then streamed block by block into the output using gdal.Translate.
+    Where the inputs overlap, the last one has priority, except for its pixels equal to the
+    nodata value given by ``n``, which let the previous inputs show through.
+
+    The supported gdal_merge options are ``n``, ``a_nodata``, ``init``, ``separate``, ``ps``, ``ul_lr``,
+    ``tap``, ``ot``, ``of``, ``co`` and ``optfile``. ``q`` and ``v`` are accepted and ignored.
 
-    :param src: The input filenames or GDalDatasetWrapper-objects
-    :param argv: The arguments as list, e.g. ["-o", "/path/to/dst"]
-    :return: A gdal.Dataset object
-    :rtype: ``osgeo.gdal.Dataset``
+    :param src: The list of input filenames or datasets.
+    :param dst: If specified, the output will be writen to
+    the given path on a physical disk.
+    Note: This overwrites a previous file at the same location.
+    :param options: Optional keyword arguments
+    :return: A :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper` object
+    :rtype: `osgeo.gdal.dataset` or file on disk (see parameter ``dst``).
     """
-    tmpdir = tempfile.mkdtemp()
-    inputs = []
-    for i, drv in enumerate(src):
-        if type(drv) != str:
-            tmppath = os.path.join(tmpdir, "input_%s.tif" % i)
-            drv.write(tmppath)
-            inputs.append(tmppath)
-        else:
-            inputs.append(src)
-
-    if "-o" in argv:
-        outpath = argv[argv.index("-o") + 1]
+    inputs = [i.get_ds() if type(i) == GDalDatasetWrapper else i for i in src]
+    optfile = options.pop("optfile", None)
+    if optfile:
+        # Strip the program name from the expanded argument list:
+        inputs += gdal.GeneralCmdLineProcessor(["", "--optfile", str(optfile)])[1:]
+    if not inputs:
+        raise ValueError("No input given to gdal_merge")
+
+    first = gdal.Open(inputs[0]) if type(inputs[0]) == str else inputs[0]
+    if not first:
+        raise OSError("Cannot open %s" % inputs[0])
+    # As in gdal_merge.py, the pixel size and data type of the first input are used by default:
+    if "ps" in options:
+        x_res, y_res = _parse_floats(options["ps"])
+    else:
+        geotransform = first.GetGeoTransform()
+        x_res, y_res = geotransform[1], geotransform[5]
+    output_type = gdal.GetDataTypeByName(options["ot"]) if "ot" in options else first.GetRasterBand(1).DataType
+    first = None
+
+    vrt_options = {"resolution": "user",
+                   "xRes": abs(x_res),
+                   "yRes": abs(y_res),
+                   "separate": bool(options.get("separate", False)),
+                   "targetAlignedPixels": bool(options.get("tap", False)),
+                   # Contrary to gdalbuildvrt, gdal_merge.py does not set any output nodata by itself:
+                   "VRTNodata": options.get("a_nodata", "None")}
+    if options.get("n") is not None:
+        vrt_options["srcNodata"] = options["n"]
+    if "ul_lr" in options:
+        ulx, uly, lrx, lry = _parse_floats(options["ul_lr"])
+        vrt_options["outputBounds"] = (ulx, lry, lrx, uly)
+    init = options.get("init")
+    if init is not None and _parse_floats(init) != _parse_floats(options.get("a_nodata", 0)):
+        logger.warning("gdal_merge: 'init' differs from 'a_nodata'. Pixels not covered by any input are set to %s."
+                       % options.get("a_nodata", 0))
+    # The VRT only references its inputs, nothing is read until the translation below:
+    vrt = gdal.BuildVRT("", inputs, **vrt_options)
+    if not vrt:
+        raise OSError("Cannot build the mosaic of %s" % inputs)
+
+    creation_options = options.get("co", [])
+    if type(creation_options) == str:
+        creation_options = [creation_options]
+    translate_options = gdal.TranslateOptions(format=options.get("of", "GTiff"),
+                                              outputType=output_type,
+                                              creationOptions=creation_options)
+    # Remove previous existing file if writing to disk is enabled:
+    if dst:
+        FileSystem.remove_file(dst)
+        # Note: De-allocation before file is actually written to disk
+        # cf. https://gdal.org/api/python_gotchas.html
+        _ = gdal.Translate(dst, vrt, options=translate_options)
+        _ = None
+        ds_out = gdal.Open(dst)
     else:
-        outpath = os.path.join(tempfile.gettempdir(), "%s.tif" % next(tempfile._get_candidate_names()))
-        logger.debug("Writing to file %s" % outpath)
-        argv += ["-o", outpath]
-    argv = gdal.GeneralCmdLineProcessor(argv)
-    options = argv + inputs
-    assert run_external_app("gdal_merge.py", options) == 0, "Error running gdal_merge"
-    remove_directory(tmpdir)
-    return gdal.Open(outpath)
+        # Write directly into memory if no path specified (faster):
+        dst = vsimem.get_path()
+        ds_out = vsimem.track(gdal.Translate(dst, vrt, options=translate_options), dst)
+    vrt = None
+    # The array is only read on first access:
+    return GDalDatasetWrapper(ds=ds_out, lazy=True, bands_last=True)
 
 
 if __name__ == "__main__":
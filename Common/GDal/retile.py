@@ -18,58 +18,182 @@ limitations under the License.
 """
 
 import os
+import math
 import logging
 import tempfile
-from osgeo import gdal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from osgeo import gdal, ogr, osr
 from Common import FileSystem
+from Common.GDalDatasetWrapper import GDalDatasetWrapper
+from Common.GDal import vsimem
 
 
-def run_tiling(ds_or_path, **kwargs):
+def get_tile_windows(width, height, tile_width, tile_height, overlap=0):
     """
-    Run the tiling process
+    Compute the tile grid of a raster in the same way as gdal_retile.py.
+    The tiles at the right and bottom borders are cropped to the raster extent.
 
-    :param ds_or_path: The :class:`gdal.Dataset` or a path to a file on disk to be tiled
-    :type ds_or_path: :class:`gdal.Dataset` or str
-    :param kwargs: Optional arguments.
-    :return: Creates the tiles in the given location.
+    :param width: The raster width in pixels
+    :param height: The raster height in pixels
+    :param tile_width: The tile width in pixels
+    :param tile_height: The tile height in pixels
+    :param overlap: The overlap between two neighbouring tiles in pixels
+    :return: The 1-based (row, column) index and the window (x_off, y_off, x_size, y_size) of each tile, row by row.
+    :rtype: list of tuple
     """
-    cmd_dict = {"Verbose": "-v", "Quiet": "-q", "CreationOptions": "-co", "TileSize": "-ps",
-                "Overlap": "-overlap", "Format": "-of", "BandType": "-ot", "TileIndexFieldName": "-tileIndexField",
-                "TileIndexName": "-tileIndex", "CsvDelimiter": "-csvDelim", "Source_SRS": "-s_srs",
-                "TargetDir": "-targetDir", "-ResamplingMethod": "-r", "Levels": "-levels",
-                "PyramidOnly": "-pyramidOnly", "UseDirForEachRow": "-useDirForEachRow"}
-
-    gdal.AllRegister()
-    gdal.UseExceptions()
-
-    options = []
-
-    if type(ds_or_path) != str:
-        tmppath = os.path.join(tempfile.gettempdir(), next(tempfile._get_candidate_names()))
-        ds_or_path.write(tmppath)
-        del_tmp = True
-    else:
-        tmppath = ds_or_path
-        del_tmp = False
-    tx, ty = None, None
-    for key in kwargs.keys():
-        if key == "TileWidth":
-            ty = kwargs[key]
-        elif key == "TileHeight":
-            tx = kwargs[key]
-        else:
-            options += [cmd_dict[key], kwargs[key]]
-    if not tx or not ty:
-        raise ValueError("Must provide tile width and height: (%s, %s)" % (ty, tx))
-    options += [cmd_dict["TileSize"], "%s %s" % (ty, tx)]
-    options += [tmppath]
-    assert FileSystem.run_external_app("gdal_retile.py", options) == 0, "Error running gdal_retile"
-    bname = os.path.basename(tmppath)
-    outpath = kwargs["TargetDir"]
-    # TODO Discard previously written files from `find`:
-    files_written = sorted(FileSystem.find(r"%s_\d+_\d+.tif" % bname, path=outpath))
-    if del_tmp:
-        FileSystem.remove_file(tmppath)
+    if tile_width <= overlap or tile_height <= overlap:
+        raise ValueError("The tile size (%s, %s) has to be larger than the overlap %s"
+                         % (tile_width, tile_height, overlap))
+    n_tiles_x, n_tiles_y = 1, 1
+    if width > tile_width:
+        n_tiles_x += int(math.ceil((width - tile_width) / (tile_width - overlap)))
+    if height > tile_height:
+        n_tiles_y += int(math.ceil((height - tile_height) / (tile_height - overlap)))
+    windows = []
+    for row in range(n_tiles_y):
+        y_off = row * (tile_height - overlap)
+        for col in range(n_tiles_x):
+            x_off = col * (tile_width - overlap)
+            windows.append(((row + 1, col + 1),
+                            (x_off, y_off, min(tile_width, width - x_off), min(tile_height, height - y_off))))
+    return windows
+
+
+def _get_source_path(src):
+    """
+    Get a path the source can be re-opened from, so that each thread uses its own dataset handle.
+    In-memory datasets are first copied into a temporary /vsimem file.
+
+    :return: The path, the base name of the tiles and whether the path is temporary.
+    """
+    if type(src) == str:
+        return src, os.path.splitext(os.path.basename(src))[0], False
+    ds = src.get_ds() if type(src) == GDalDatasetWrapper else src
+    bname = next(tempfile._get_candidate_names())
+    path = ds.GetDescription()
+    if ds.GetDriver().ShortName not in ["MEM", "NUMPY", "VRT"] and path and gdal.VSIStatL(path) is not None:
+        return path, bname, False
+    path = vsimem.get_path(".tif")
+    gdal.Translate(path, ds, format="GTiff")
+    return path, bname, True
+
+
+def write_tile_index(index_path, tiles, geotransform, projection, field_name="location"):
+    """
+    Write the footprint of each tile to an ESRI Shapefile, as done by the -tileIndex option of gdal_retile.py.
+
+    :param index_path: The path of the shapefile
+    :param tiles: The filename and the window (x_off, y_off, x_size, y_size) of each tile
+    :param geotransform: The geotransform of the tiled raster
+    :param projection: The projection of the tiled raster, e.g. as WKT or EPSG:XXXX
+    :param field_name: The field containing the tile filenames. Default is location.
+    :return: Writes the shapefile to the given index_path.
+    """
+    driver = ogr.GetDriverByName("ESRI Shapefile")
+    if os.path.exists(index_path):
+        driver.DeleteDataSource(index_path)
+    srs = None
+    if projection:
+        srs = osr.SpatialReference()
+        srs.SetFromUserInput(projection)
+    ds = driver.CreateDataSource(index_path)
+    layer = ds.CreateLayer(os.path.splitext(os.path.basename(index_path))[0], srs, ogr.wkbPolygon)
+    layer.CreateField(ogr.FieldDefn(field_name, ogr.OFTString))
+    for filename, (x_off, y_off, x_size, y_size) in tiles:
+        x_min = geotransform[0] + x_off * geotransform[1]
+        y_max = geotransform[3] + y_off * geotransform[5]
+        x_max = x_min + x_size * geotransform[1]
+        y_min = y_max + y_size * geotransform[5]
+        ring = ogr.Geometry(ogr.wkbLinearRing)
+        for x, y in [(x_min, y_max), (x_max, y_max), (x_max, y_min), (x_min, y_min), (x_min, y_max)]:
+            ring.AddPoint_2D(x, y)
+        polygon = ogr.Geometry(ogr.wkbPolygon)
+        polygon.AddGeometry(ring)
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetField(field_name, filename)
+        feature.SetGeometry(polygon)
+        layer.CreateFeature(feature)
+    layer, ds = None, None
+
+
+def gdal_retile(src, dst, **options):
+    """
+    Tile a raster, following the tile grid and naming of gdal_retile.py: <name>_<row>_<col>.<ext>
+    The tiles are written concurrently using gdal.Translate.
+    The pyramid options of gdal_retile.py (Levels, PyramidOnly, ResamplingMethod) and the csv tile index
+    (CsvFileName, CsvDelimiter) are not supported anymore.
+
+    :param src: The source filename or dataset
+    :param dst: The destination directory
+    :keyword TileWidth: The tile width in pixels
+    :keyword TileHeight: The tile height in pixels
+    :keyword Overlap: The overlap between two tiles in pixels. Default is 0.
+    :keyword Format: The GDAL driver of the tiles. Default is GTiff.
+    :keyword BandType: The data type of the tiles, e.g. Int16
+    :keyword CreationOptions: The creation option or list of creation options of the tiles
+    :keyword Source_SRS: The projection assigned to the tiles, e.g. EPSG:32631
+    :keyword UseDirForEachRow: Write the tiles of each row to a sub-directory named after the row number.
+    :keyword TileIndexName: The name of a shapefile in the destination directory
+                            the footprint of each tile is written to (See :func:`write_tile_index`).
+    :keyword TileIndexFieldName: The field of the tile index containing the tile filenames. Default is location.
+    :keyword n_threads: The number of tiles written in parallel. Default is 4.
+    :return: The list of files written, row by row.
+    :rtype: list of str
+    """
+    unsupported = set(options.keys()) - {"TileWidth", "TileHeight", "Overlap", "Format", "BandType",
+                                         "CreationOptions", "Source_SRS", "UseDirForEachRow", "TileIndexName",
+                                         "TileIndexFieldName", "Verbose", "Quiet", "n_threads"}
+    if unsupported:
+        raise ValueError("Unsupported gdal_retile options: %s" % sorted(unsupported))
+    tile_width, tile_height = options.get("TileWidth"), options.get("TileHeight")
+    if not tile_width or not tile_height:
+        raise ValueError("Must provide tile width and height: (%s, %s)" % (tile_width, tile_height))
+    fmt = options.get("Format", "GTiff")
+    creation_options = options.get("CreationOptions", [])
+    if type(creation_options) == str:
+        creation_options = [creation_options]
+    translate_options = {"format": fmt,
+                         "outputType": gdal.GetDataTypeByName(options.get("BandType", "Unknown")),
+                         "creationOptions": creation_options}
+    if options.get("Source_SRS"):
+        translate_options["outputSRS"] = options["Source_SRS"]
+    extension = gdal.GetDriverByName(fmt).GetMetadataItem(gdal.DMD_EXTENSION) or "tif"
+
+    path, bname, temporary = _get_source_path(src)
+    handles = threading.local()
+
+    def write_tile(filename, window):
+        # GDAL datasets must not be shared between threads:
+        if getattr(handles, "ds", None) is None:
+            handles.ds = gdal.Open(path)
+        gdal.Translate(filename, handles.ds, srcWin=list(window), **translate_options)
+        return filename
+
+    try:
+        ds = gdal.Open(path)
+        windows = get_tile_windows(ds.RasterXSize, ds.RasterYSize, int(tile_width), int(tile_height),
+                                   int(options.get("Overlap", 0)))
+        geotransform, projection = ds.GetGeoTransform(), options.get("Source_SRS") or ds.GetProjection()
+        ds = None
+        n_digits = len(str(max(windows[-1][0])))
+        name_format = "%s_%%0%si_%%0%si.%s" % (bname, n_digits, n_digits, extension)
+        filenames = [os.path.join(dst, str(index[0]) if options.get("UseDirForEachRow") else "", name_format % index)
+                     for index, _ in windows]
+        for directory in sorted(set(os.path.dirname(filename) for filename in filenames)):
+            FileSystem.create_directory(directory)
+        with ThreadPoolExecutor(max_workers=options.get("n_threads", 4)) as executor:
+            futures = [executor.submit(write_tile, filename, window)
+                       for filename, (_, window) in zip(filenames, windows)]
+            files_written = [f.result() for f in futures]
+        if options.get("TileIndexName"):
+            write_tile_index(os.path.join(dst, options["TileIndexName"]),
+                             [(filename, window) for filename, (_, window) in zip(filenames, windows)],
+                             geotransform, projection, options.get("TileIndexFieldName", "location"))
+    finally:
+        if temporary:
+            vsimem.unlink(path)
+    logger.debug("Wrote %s tiles to %s" % (len(files_written), dst))
     return files_written
 
 
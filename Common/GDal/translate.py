@@ -18,10 +18,9 @@ limitations under the License.
 """
 
 from osgeo import gdal
-import uuid
-import numpy as np
 from Common import FileSystem
 from Common.GDalDatasetWrapper import GDalDatasetWrapper
+from Common.GDal import vsimem
 
 
 def gdal_translate(src, dst=None, **options):
@@ -32,14 +31,26 @@ def gdal_translate(src, dst=None, **options):
     :param dst: If specified, the output will be writen to
     the given path on a physical disk.
     Note: This overwrites a previous file at the same location.
+    :keyword lazy: If True and no dst is given, the operation is deferred: The result is an in-memory
+    VRT, only computed when its array is read or when it is the input of the next operation.
+    This allows to chain several operations in a single streaming pass.
+    :keyword co: The creation options, as str or as list of str, e.g. :func:`Common.ImageIO.get_creation_options`
     :return: A :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper` object
     :rtype: `osgeo.gdal.dataset` or file on disk (see parameter ``dst``).
     """
+    if options.pop("lazy", False) and not dst:
+        options["of"] = "VRT"
+        # Creation options of the final format do not apply to a VRT:
+        options.pop("co", None)
     gdal_common_params = ["optfile", "config", "debug"]
     options_list = []
     for k, v in options.items():
         if k in gdal_common_params:
             options_list += ["--%s" % k, "%s" % v]
+        elif type(v) in [list, tuple]:
+            # Repeatable options, e.g. co=["TILED=YES", "COMPRESS=DEFLATE"]:
+            for item in v:
+                options_list += ["-%s" % k, "%s" % item]
         elif type(v) is not bool:
             options_list += ["-%s" % k, "%s" % v]
         elif type(v) is bool and v is True:
@@ -60,9 +71,10 @@ def gdal_translate(src, dst=None, **options):
         ds_out = gdal.Open(dst)
     else:
         # Write directly into memory if no path specified (faster):
-        dst = "/vsimem/" + uuid.uuid4().hex
-        ds_out = gdal.Translate(dst, src, options=options_list)
-    arr_bands_last = np.array(ds_out.ReadAsArray())
-    if arr_bands_last.ndim == 3:
-        arr_bands_last = np.moveaxis(arr_bands_last, 0, -1)
-    return GDalDatasetWrapper(ds=ds_out, array=arr_bands_last)
+        dst = vsimem.get_path()
+        # A VRT only references its source, which thus needs to stay alive:
+        keep_alive = [src] if str(options.get("of", "")).upper() == "VRT" else []
+        ds_out = vsimem.track(gdal.Translate(dst, src, options=options_list), dst,
+                               keep_alive=keep_alive)
+    # The array is only read on first access:
+    return GDalDatasetWrapper(ds=ds_out, lazy=True, bands_last=True)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2016-2020 Centre National d'Etudes Spatiales (CNES), CSSI, CESBIO  All Rights Reserved
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import uuid
+import weakref
+import logging
+from contextlib import contextmanager
+from osgeo import gdal
+
+vsimem_root = "/vsimem"
+
+
+def get_path(suffix=""):
+    """
+    Get a new unique path inside GDAL's in-memory filesystem.
+
+    :param suffix: Optional suffix, e.g. '.vrt'
+    :return: The path, e.g. /vsimem/<uuid>
+    :rtype: str
+    """
+    return "%s/%s%s" % (vsimem_root, uuid.uuid4().hex, suffix)
+
+
+def unlink(path):
+    """
+    Remove a file from GDAL's in-memory filesystem. Datasets still open on it stay valid until closed.
+
+    :param path: The /vsimem path
+    """
+    if gdal.VSIStatL(path) is not None:
+        gdal.Unlink(path)
+
+
+def _release(path, keep_alive):
+    unlink(path)
+
+
+def track(ds, path, keep_alive=()):
+    """
+    Tie the lifetime of an in-memory file to the dataset created on it:
+    The file is unlinked as soon as the dataset is garbage collected.
+
+    :param ds: The :class:`gdal.Dataset` written to the given path
+    :param path: The /vsimem path
+    :param keep_alive: Objects kept alive as long as the dataset, e.g. the (in-memory) sources of a VRT.
+    :return: The dataset
+    """
+    if ds is not None:
+        weakref.finalize(ds, _release, path, list(keep_alive))
+    return ds
+
+
+@contextmanager
+def temporary_path(suffix=""):
+    """
+    Context manager providing a new /vsimem path which is unlinked on exit::
+
+        with vsimem.temporary_path(".tif") as path:
+            gdal.Translate(path, src)
+
+    :param suffix: Optional suffix, e.g. '.vrt'
+    """
+    path = get_path(suffix)
+    try:
+        yield path
+    finally:
+        unlink(path)
+
+
+def get_usage():
+    """
+    Get the files currently living in GDAL's in-memory filesystem.
+
+    :return: The size in bytes of each file, indexed by its path.
+    :rtype: dict
+    """
+    usage = {}
+    for name in gdal.ReadDir(vsimem_root) or []:
+        path = "%s/%s" % (vsimem_root, name)
+        stat = gdal.VSIStatL(path)
+        usage[path] = stat.size if stat is not None else 0
+    return usage
+
+
+def log_usage(level=logging.DEBUG):
+    """
+    Log the number of files and total size of GDAL's in-memory filesystem.
+
+    :param level: The log level
+    :return: The number of files and their total size in bytes
+    :rtype: tuple of int
+    """
+    usage = get_usage()
+    total = sum(usage.values())
+    logger.log(level, "/vsimem usage: %s file(s), %.1f MB" % (len(usage), total / 1024. / 1024.))
+    return len(usage), total
+
+
+if __name__ == "__main__":
+    raise NotImplementedError
+else:
+    logger = logging.getLogger("root")
@@ -26,7 +26,7 @@ file 'LICENSE.md', which is part of this source code package.
 Author:         Peter KETTIG <peter.kettig@cnes.fr>
 """
 
-from osgeo import gdal
+from osgeo import gdal, gdal_array
 import re
 import uuid
 import numpy as np
@@ -48,6 +48,9 @@ class GDalDatasetWrapper(object):
         :keyword geotransform: A gdal geotransform
         :keyword nodata_value: Override nodata value
         :keyword nodata_mask: Override nodata mask
+        :keyword lazy: If True, the array of the ds is only read on first access. Default is False.
+        :keyword bands_last: If True, the array read from the ds is of shape (y, x, bands)
+                             instead of (bands, y, x). Default is False.
         """
         # The following options overwrites the existing array in the ds:
         array = kwargs.get("array", None)
@@ -61,46 +64,144 @@ class GDalDatasetWrapper(object):
             raise KeyError("Need to provide GDAL dataset or array")
         if not ds and (not projection or not geotransform):
             raise KeyError("Need to provide projection+geotransform or GDAL dataset")
-
+        self.bands_last = kwargs.get("bands_last", False)
+        self._ds = ds
+        self._array = array
+        # Given arrays are bands-last, the ones read from the ds follow self.bands_last:
+        self._array_bands_last = array is not None or self.bands_last
         if array is not None:
-            self.array = array
+            # Given arrays are either of shape (y, x) or (y, x, bands):
+            self._size = array.shape[1], array.shape[0]
         else:
-            self.array = np.array(ds.ReadAsArray())
+            self._size = ds.RasterXSize, ds.RasterYSize
+            if not kwargs.get("lazy", False):
+                self._array = self._read()
 
         if ds is not None:
-            self._info = gdal.Info(ds, format='json')
             self.projection = ds.GetProjection()
             self.geotransform = ds.GetGeoTransform()
         else:
             self.projection = projection
             self.geotransform = geotransform
-            self._info = gdal.Info(self.get_ds(), format='json')
-        self.resolution = self._resolution
-        self.epsg = self._epsg
-        self.utm_description = self._utm_description
-        self.ul_lr = self._ul_lr
+        self.__info = None
         if type(nodata_sentinel) != str:
             self.nodata_value = nodata_sentinel
         else:
             self.nodata_value = self._nodata_value
+        self._nodata_mask_override = None
         if nodata_mask is not None:
             assert nodata_mask.shape == self.array.shape
-            self.nodata_mask = np.array(nodata_mask, dtype=np.bool)
-        else:
-            self.nodata_mask = self._nodata_mask
-        ds = None  # Force closing of dataset if existing.
+            self._nodata_mask_override = np.array(nodata_mask, dtype=np.bool)
+        self.resolution = self._resolution
+        self.epsg = self._epsg
+        self.utm_description = self._utm_description
+        self.ul_lr = self._ul_lr
+
+    def _read(self, x=0, y=0, w=None, h=None):
+        """
+        Read the array of the underlying dataset.
+
+        :param x: The pixel offset in x
+        :param y: The pixel offset in y
+        :param w: The window width. Default is the full width
+        :param h: The window height. Default is the full height
+        :return: The numpy array, of shape (y, x, bands) if self.bands_last is set.
+        """
+        w = w if w is not None else self._ds.RasterXSize - x
+        h = h if h is not None else self._ds.RasterYSize - y
+        arr = np.array(self._ds.ReadAsArray(x, y, w, h))
+        if self.bands_last and arr.ndim == 3:
+            arr = np.moveaxis(arr, 0, -1)
+        return arr
+
+    @property
+    def array(self):
+        """
+        Get the array. Read from the dataset on first access if the wrapper is lazy.
+
+        :return: The numpy array
+        """
+        if self._array is None:
+            self._array = self._read()
+        return self._array
+
+    @array.setter
+    def array(self, array):
+        # As the arrays given to __init__, the array is of shape (y, x) or (y, x, bands):
+        self._array = array
+        self._array_bands_last = True
+        self._size = array.shape[1], array.shape[0]
+        self.ul_lr = self._ul_lr
+
+    @property
+    def is_loaded(self):
+        """
+        Check whether the array is held in memory.
+
+        :return: True if the array has been read or was given.
+        """
+        return self._array is not None
+
+    def read_window(self, x, y, w, h):
+        """
+        Read a window of the array without loading the full array
+
+        :param x: The pixel offset in x
+        :param y: The pixel offset in y
+        :param w: The window width
+        :param h: The window height
+        :return: The numpy array of the window
+        """
+        if self._array is None:
+            return self._read(x, y, w, h)
+        if self._array.ndim == 3 and not self._array_bands_last:
+            return self._array[:, y:y + h, x:x + w]
+        return self._array[y:y + h, x:x + w]
+
+    @property
+    def size(self):
+        """
+        Get the raster size in pixels
+
+        :return: The (x, y) size
+        :rtype: tuple of int
+        """
+        return self._size
+
+    @property
+    def _info(self):
+        """
+        Get the gdal.Info of the dataset. Computed on first access only.
+
+        :return: The info as dict
+        """
+        if self.__info is None:
+            self.__info = gdal.Info(self._ds if self._ds is not None else self.get_ds(), format='json')
+        return self.__info
+
+    @property
+    def nodata_mask(self):
+        """
+        Get a pixelwise nodata mask. Computed on each access if not given.
+
+        :return: A boolean numpy array where True==data in self.array and False==Nodata
+        """
+        if self._nodata_mask_override is not None:
+            return self._nodata_mask_override
+        return self._nodata_mask
 
     @classmethod
-    def from_file(cls, p_in):
+    def from_file(cls, p_in, **kwargs):
         """
         Create a :class:`GDalDatasetWrapper` from a file
 
         :param p_in: The path to the geo-referenced file
+        :keyword lazy: If True, the array is only read on first access.
         :return: A GDalDatasetWrapper object
         """
         ds = ImageIO.open_tiff(p_in)
-        return cls(ds=ds, p_in=p_in)
-    
+        return cls(ds=ds, p_in=p_in, **kwargs)
+
     def write(self, p_out, **kwargs):
         """
         Write the array to a given location
@@ -116,16 +217,37 @@ class GDalDatasetWrapper(object):
 
     def get_ds(self):
         """
-        Return a new copy of a :class:`gdal.Dataset`.
+        Return a :class:`gdal.Dataset` of the wrapper.
+        If the array is loaded, the dataset points to its buffer directly instead of copying it.
+        Note: Changes to the array are thus visible in the dataset and vice versa.
 
         :return: A gdal dataset object
         """
-        p_out = "/vsimem/" + uuid.uuid4().hex
+        if self._array is None:
+            # Nothing was read or modified yet:
+            return self._ds
         try:
             nodata = self.nodata_value
         except AttributeError:
             nodata = None
-        return ImageIO.write_to_memory(self.array, p_out, self.projection, self.geotransform, nodata=nodata)
+        arr = self._array
+        if arr.ndim == 3 and self._array_bands_last:
+            arr = np.moveaxis(arr, -1, 0)
+        try:
+            ds = gdal_array.OpenArray(arr)
+        except (TypeError, ValueError, RuntimeError):
+            # E.g. for dtypes not supported by gdal:
+            ds = None
+        if ds is None:
+            p_out = "/vsimem/" + uuid.uuid4().hex
+            arr_bands_last = np.moveaxis(arr, 0, -1) if arr.ndim == 3 else arr
+            return ImageIO.write_to_memory(arr_bands_last, p_out, self.projection, self.geotransform, nodata=nodata)
+        ds.SetGeoTransform(self.geotransform)
+        ds.SetProjection(self.projection)
+        if nodata:
+            for i in range(ds.RasterCount):
+                ds.GetRasterBand(i + 1).SetNoDataValue(nodata)
+        return ds
 
     @property
     def _resolution(self):
@@ -141,11 +263,11 @@ class GDalDatasetWrapper(object):
     @property
     def _epsg(self):
         """
-        Get the EPSG code from the given driver using gdal
+        Get the EPSG code from the projection
 
         :return: The EPSG code if existing.
         """
-        info = self._info['coordinateSystem']['wkt'].rsplit('"EPSG",', 1)[-1]
+        info = self.projection.rsplit('"EPSG",', 1)[-1]
         return int(re.findall(r"\d+", info)[0])
 
     @property
@@ -155,25 +277,21 @@ class GDalDatasetWrapper(object):
 
         :return: The NoDataValue if existing. None if not.
         """
-        try:
-            nodata = float(self._info["bands"][0]["noDataValue"])
-        except KeyError:
-            nodata = None
-        return nodata
+        if self._ds is None:
+            return None
+        return self._ds.GetRasterBand(1).GetNoDataValue()
 
     @property
     def _utm_description(self):
         """
-        Get the UTM Description of the given driver using gdal
+        Get the UTM Description of the projection
 
         :return: The UTM Description as string.
         """
         # 'PROJCS' vs. 'PROJCRS' in rsplit
-        if int(gdal.VersionInfo()) >= 3000000:
-            ifo = self._info['coordinateSystem']['wkt'].rsplit('PROJCRS["', 1)[-1].split('"')[0]
-        else:
-            ifo = self._info['coordinateSystem']['wkt'].rsplit('PROJCS["', 1)[-1].split('"')[0]
-        return ifo
+        if 'PROJCRS["' in self.projection:
+            return self.projection.rsplit('PROJCRS["', 1)[-1].split('"')[0]
+        return self.projection.rsplit('PROJCS["', 1)[-1].split('"')[0]
 
     @property
     def _ul_lr(self):
@@ -184,9 +302,8 @@ class GDalDatasetWrapper(object):
         :rtype: tuple of float
         """
         ulx, xres, xskew, uly, yskew, yres = self.geotransform
-        # Index from the end - GDal usually orders bands-first:
-        lrx = ulx + (self.array.shape[-2] * xres)
-        lry = uly + (self.array.shape[-1] * yres)
+        lrx = ulx + (self._size[0] * xres)
+        lry = uly + (self._size[1] * yres)
         return ulx, uly, lrx, lry
 
     @property
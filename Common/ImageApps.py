@@ -18,11 +18,43 @@ limitations under the License.
 """
 
 import numpy as np
-from Common import ImageTools
-from Common.GDalDatasetWrapper import GDalDatasetWrapper
+from Common import ImageTools, BlockProcessing
 
 
-def get_ndsi(red, swir, vrange=(-1, 1), dtype=np.float32):
+def get_normalized_difference(img_a, img_b, vrange=(-1, 1), dtype=np.float32):
+    """
+    Calculate the normalized difference (a - b) / (a + b) of two blocks, scaled to the given range.
+    Pixels where a + b == 0 are set to -1 before scaling.
+
+    :param img_a: The first block
+    :param img_b: The second block
+    :param vrange: The range of output values as tuple. By default: (-1, 1).
+    :param dtype: The output dtype.
+    :return: The scaled normalized difference as numpy array.
+    """
+    img_a = np.asarray(img_a, dtype=np.float32)
+    img_b = np.asarray(img_b, dtype=np.float32)
+    img_sum = img_a + img_b
+    # Compensate for nan:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        img_nd = np.where(img_sum != 0, (img_a - img_b) / img_sum, -1)
+    # Scale to vrange
+    return ImageTools.normalize_to_dtype(img_nd, value_range_out=vrange, value_range_in=(-1, 1), dtype=dtype,
+                                         clip=True, out=img_nd if dtype == np.float32 else None)
+
+
+def _resample_to(src, reference):
+    """
+    Resample a dataset to the resolution of a reference if needed.
+    Nothing is read here: Integer factors, e.g. between the S2 10/20/60m grids, are applied to each block read
+    by :func:`Common.BlockProcessing.process_blocks`, other factors use a lazy gdal_translate.
+    """
+    if src.extent != reference.extent or src.epsg != reference.epsg:
+        raise ValueError("Cannot calculate a normalized difference on two different extents.")
+    return ImageTools.resample(src, reference.resolution, method="mean", lazy=True)
+
+
+def get_ndsi(red, swir, vrange=(-1, 1), dtype=np.float32, **kwargs):
     """
     Calculate the NDSI (Normalized-Difference Snow Index)
 
@@ -34,36 +66,18 @@ def get_ndsi(red, swir, vrange=(-1, 1), dtype=np.float32):
     :type vrange: tuple of int
     :param dtype: The output dtype.
     :type dtype: :class`np.dtype`
+    :param kwargs: Optional arguments of :func:`Common.BlockProcessing.process_blocks`, e.g. n_threads.
     :return: The NDSI as numpy array.
     :rtype: :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper`
     """
+    # Resize to swir resolution if needed:
+    ds_red = _resample_to(red, swir)
+    return BlockProcessing.process_blocks(lambda img_swir, img_red:
+                                          get_normalized_difference(img_red, img_swir, vrange, dtype),
+                                          swir, ds_red, dtypes=[dtype], **kwargs)[0]
 
-    if swir.extent != red.extent or swir.epsg != red.epsg:
-        raise ValueError("Cannot calculate NDSI on two different extents.")
-
-    if swir.resolution != red.resolution:
-        # Resize to swir resolution in this case.
-        tr = " ".join([str(i) for i in swir.resolution])
-        ds_red = ImageTools.gdal_translate(red, tr=tr, r="cubic")
-    else:
-        ds_red = red
 
-    # TODO Add new test
-    img_red = np.array(ds_red.array, dtype=np.float32)
-    img_swir = np.array(swir.array, dtype=np.float32)
-
-    # Compensate for nan:
-    np.seterr(divide='ignore', invalid='ignore')
-    img_ndsi = np.where((img_red + img_swir) != 0, (img_red - img_swir) / (img_red + img_swir), -1)
-
-    # Scale to vrange
-    img_ndsi_scaled = ImageTools.normalize(img_ndsi, value_range_out=vrange, value_range_in=(-1, 1),
-                                           dtype=dtype, clip=True)
-
-    return GDalDatasetWrapper(ds=swir.get_ds(), array=img_ndsi_scaled)
-
-
-def get_ndvi(red, nir, vrange=(-1, 1), dtype=np.float32):
+def get_ndvi(red, nir, vrange=(-1, 1), dtype=np.float32, **kwargs):
     """
     Calculate the NDVI (Normalized-Difference Vegetation Index)
 
@@ -75,31 +89,83 @@ def get_ndvi(red, nir, vrange=(-1, 1), dtype=np.float32):
     :type vrange: tuple of int
     :param dtype: The output dtype.
     :type dtype: :class`np.dtype`
+    :param kwargs: Optional arguments of :func:`Common.BlockProcessing.process_blocks`, e.g. n_threads.
     :return: The NDVI as numpy array.
     :rtype: :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper`
     """
+    # Resize to nir resolution if needed:
+    ds_red = _resample_to(red, nir)
+    return BlockProcessing.process_blocks(lambda img_nir, img_red:
+                                          get_normalized_difference(img_red, img_nir, vrange, dtype),
+                                          nir, ds_red, dtypes=[dtype], **kwargs)[0]
 
-    if nir.extent != red.extent or nir.epsg != red.epsg:
-        raise ValueError("Cannot calculate NDSI on two different extents.")
 
-    if nir.resolution != red.resolution:
-        # Resize to nir resolution in this case.
-        tr = " ".join([str(i) for i in nir.resolution])
-        ds_red = ImageTools.gdal_translate(red, tr=tr, r="cubic")
-    else:
-        ds_red = red
+def get_mca_sim(img_red, img_green):
+    """
+    Calculate the simulated MCA band, i.e. the mean of the red and green bands, of two blocks.
 
-    # TODO Add new test
+    :param img_red: The red block
+    :param img_green: The green block
+    :return: The simulated MCA as float32 numpy array.
+    """
+    img_mca = np.add(img_red, img_green, dtype=np.float32)
+    img_mca /= 2
+    return img_mca
 
-    img_red = np.array(ds_red.array, dtype=np.float32)
-    img_nir = np.array(nir.array, dtype=np.float32)
 
-    # Compensate for nan:
-    np.seterr(divide='ignore', invalid='ignore')
-    img_ndvi = np.where((img_red + img_nir) != 0, (img_red - img_nir) / (img_red + img_nir), -1)
+# The bands needed by each synthetic band, the first one defining the output resolution:
+synthetic_band_inputs = {"ndvi": ("nir", "red"),
+                         "ndsi": ("swir", "green"),
+                         "mca_sim": ("red", "green")}
 
-    # Scale to vrange
-    img_ndvi_scaled = ImageTools.normalize(img_ndvi, value_range_out=vrange, value_range_in=(-1, 1),
-                                           dtype=dtype, clip=True)
 
-    return GDalDatasetWrapper(ds=nir.get_ds(), array=img_ndvi_scaled)
+def get_synthetic_bands(bands, synthetic_bands, vrange=(-1, 1), dtype=np.float32, **kwargs):
+    """
+    Calculate several synthetic bands in a single pass over their input bands.
+    Each synthetic band is calculated at the resolution of its first input band (see `synthetic_band_inputs`),
+    all the synthetic bands sharing a resolution being calculated together.
+
+    :param bands: The input band datasets, indexed by their name, e.g. {"red": ds_red, "nir": ds_nir}
+    :type bands: dict of :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper`
+    :param synthetic_bands: The synthetic bands to calculate, e.g. ["ndvi", "ndsi"]
+    :type synthetic_bands: list of str
+    :param vrange: The range of output values of the normalized differences. By default: (-1, 1).
+    :param dtype: The output dtype of the normalized differences. The simulated MCA band is always float32.
+    :keyword dst: The output path of each synthetic band, indexed by its name. By default, they are kept in memory.
+    :param kwargs: Other optional arguments of :func:`Common.BlockProcessing.process_blocks`.
+    :return: The synthetic band datasets, indexed by their name.
+    :rtype: dict of :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper`
+    """
+    functions = {"ndvi": lambda img_nir, img_red: get_normalized_difference(img_red, img_nir, vrange, dtype),
+                 "ndsi": lambda img_swir, img_green: get_normalized_difference(img_green, img_swir, vrange, dtype),
+                 "mca_sim": get_mca_sim}
+    dtypes = {"ndvi": dtype, "ndsi": dtype, "mca_sim": np.float32}
+    dst = kwargs.pop("dst", {})
+    groups = {}
+    for name in synthetic_bands:
+        name = name.lower()
+        if name not in synthetic_band_inputs:
+            raise ValueError("Unknown synthetic band %s" % name)
+        missing = [b for b in synthetic_band_inputs[name] if b not in bands]
+        if missing:
+            raise ValueError("Cannot calculate %s without the band(s) %s" % (name, missing))
+        reference = synthetic_band_inputs[name][0]
+        groups.setdefault(bands[reference].resolution, (reference, []))[1].append(name)
+
+    results = {}
+    for reference, names in groups.values():
+        # The reference comes first, in order to give its geotransform and nodata to the outputs:
+        band_names = sorted(set(b for name in names for b in synthetic_band_inputs[name]) - {reference})
+        band_names.insert(0, reference)
+        # Resize to the reference resolution if needed. Each band is read only once per resolution:
+        inputs = [_resample_to(bands[b], bands[reference]) for b in band_names]
+
+        def calculate(*blocks, names=names, band_names=band_names):
+            imgs = dict(zip(band_names, blocks))
+            return [functions[name](*[imgs[b] for b in synthetic_band_inputs[name]]) for name in names]
+
+        outputs = BlockProcessing.process_blocks(calculate, *inputs,
+                                                 dtypes=[dtypes[name] for name in names],
+                                                 dst=[dst.get(name) for name in names], **kwargs)
+        results.update(zip(names, outputs))
+    return results
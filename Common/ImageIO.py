@@ -27,7 +27,10 @@ Author:         Peter KETTIG <peter.kettig@cnes.fr>
 """
 
 import os
+import functools
+import threading
 import osgeo
+from collections import namedtuple
 from osgeo import gdal, gdal_array, osr
 import numpy as np
 
@@ -46,7 +49,88 @@ def open_tiff(raster_file):
     raise NameError("GDAL could not open file {0}".format(raster_file))
 
 
-def tiff_to_array(raster_file, lon_offset_px=0, lat_offset_px=0, array_only=True, bands_last=True):
+raster_info = namedtuple("raster_info", ("nx", "ny", "n_bands", "geotransform", "projection", "epsg", "nodata"))
+
+
+def get_raster_info(raster_file):
+    """
+    Get the metadata of a raster by only reading its header. No pixels are read.
+
+    :param raster_file: Path to the given geo-referenced file
+    :return: The size in x and y, number of bands, geotransform, projection, EPSG code
+             (None if not existing) and nodata value of the first band (None if not set).
+    :rtype: :class:`raster_info`
+    """
+    ds = open_tiff(raster_file)
+    projection = ds.GetProjection()
+    srs = osr.SpatialReference(wkt=projection)
+    epsg = srs.GetAuthorityCode(None)
+    if epsg is None and srs.AutoIdentifyEPSG() == 0:
+        epsg = srs.GetAuthorityCode(None)
+    nodata = ds.GetRasterBand(1).GetNoDataValue() if ds.RasterCount else None
+    info = raster_info(nx=ds.RasterXSize, ny=ds.RasterYSize, n_bands=ds.RasterCount,
+                       geotransform=ds.GetGeoTransform(), projection=projection,
+                       epsg=int(epsg) if epsg is not None else None, nodata=nodata)
+    ds = None
+    return info
+
+
+def get_memmap(ds):
+    """
+    Get a read-only memory map of the pixels of a GeoTIFF, without reading them.
+    This is only possible for uncompressed GeoTIFFs organised in strips, which are stored contiguously
+    in the file - as the intermediate files written by GDAL without creation options.
+
+    :param ds: The :class:`gdal.Dataset` of the GeoTIFF
+    :return: The :class:`numpy.memmap` of shape (y, x) or (y, x, bands), or None if the file cannot be memory mapped.
+    """
+    driver = ds.GetDriver()
+    if driver is None or driver.ShortName != "GTiff" or ds.RasterCount == 0:
+        return None
+    structure = ds.GetMetadata("IMAGE_STRUCTURE") or {}
+    if structure.get("COMPRESSION", "NONE") != "NONE" or "NBITS" in structure:
+        return None
+    width, height, n_bands = ds.RasterXSize, ds.RasterYSize, ds.RasterCount
+    bands = [ds.GetRasterBand(i + 1) for i in range(n_bands)]
+    if len(set(band.DataType for band in bands)) != 1:
+        return None
+    block_x, block_y = bands[0].GetBlockSize()
+    dtype = gdal_array.GDALTypeCodeToNumericTypeCode(bands[0].DataType)
+    if block_x != width or dtype is None:
+        # Tiled:
+        return None
+    pixel_interleaved = n_bands > 1 and structure.get("INTERLEAVE", "PIXEL") == "PIXEL"
+    strip_size = width * block_y * np.dtype(dtype).itemsize * (n_bands if pixel_interleaved else 1)
+    n_strips = int(np.ceil(height / block_y))
+    offsets = []
+    for band in bands[:1] if pixel_interleaved else bands:
+        for i in range(n_strips):
+            offset = band.GetMetadataItem("BLOCK_OFFSET_0_%d" % i, "TIFF")
+            if not offset:
+                # Strip not written, i.e. sparse file:
+                return None
+            offsets.append(int(offset))
+    if offsets != [offsets[0] + i * strip_size for i in range(len(offsets))]:
+        return None
+    path = ds.GetDescription()
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        byte_order = "<" if f.read(2) == b"II" else ">"
+    if pixel_interleaved:
+        shape = (height, width, n_bands)
+    elif n_bands > 1:
+        shape = (n_bands, height, width)
+    else:
+        shape = (height, width)
+    mmap = np.memmap(path, dtype=np.dtype(dtype).newbyteorder(byte_order), mode="r",
+                     offset=offsets[0], shape=shape)
+    if n_bands > 1 and not pixel_interleaved:
+        return np.moveaxis(mmap, 0, -1)
+    return mmap
+
+
+def tiff_to_array(raster_file, lon_offset_px=0, lat_offset_px=0, array_only=True, bands_last=True, mmap=False):
     """
     Opens a (tiff-)dataset and extracts the array.
     Note: Bands index starts at 1, not at 0
@@ -56,9 +140,19 @@ def tiff_to_array(raster_file, lon_offset_px=0, lat_offset_px=0, array_only=True
     :param lat_offset_px: Offset for image in y-Direction
     :param array_only: If `False`, then also return the :class:`gdal.Dataset` object.
     :param bands_last: f `True`, eturn array of shape (y, x, bands) instead of (bands, y, x)
+    :param mmap: If `True`, return a read-only memory map of the file instead of reading it,
+                 if possible (See :func:`get_memmap`). Otherwise, the array is read as usual.
     :return: The numpy array as well as the driver if `array_only=False`.
     """
     gdo = open_tiff(raster_file)
+    tiff_array = get_memmap(gdo) if mmap else None
+    if tiff_array is not None:
+        tiff_array = tiff_array[lat_offset_px:, lon_offset_px:]
+        if tiff_array.ndim == 3 and not bands_last:
+            tiff_array = np.moveaxis(tiff_array, -1, 0)
+        if array_only:
+            return tiff_array
+        return tiff_array, gdo
     tiff_array = np.array(gdo.ReadAsArray(lon_offset_px, lat_offset_px))
     if bands_last:
         if tiff_array.ndim == 3:
@@ -112,16 +206,114 @@ def gdal_write(drv_type, img, dst, projection, coordinates, **kwargs):
     mem.SetGeoTransform(coordinates)
     mem.SetProjection(projection)
 
-    for bandIdx in range(n_bands):
-        band = img[:, :, bandIdx]
-        raster_band = mem.GetRasterBand(bandIdx + 1)
-        raster_band.WriteArray(band)
-        if nodata:
-            raster_band.SetNoDataValue(nodata)
+    if nodata:
+        for bandIdx in range(n_bands):
+            mem.GetRasterBand(bandIdx + 1).SetNoDataValue(nodata)
+    if n_bands == 1:
+        mem.GetRasterBand(1).WriteArray(img[:, :, 0])
+    else:
+        # Write all bands at once from the pixel-interleaved buffer instead of slicing strided bands:
+        img = np.ascontiguousarray(img, dtype=gdal_array.GDALTypeCodeToNumericTypeCode(dtype))
+        mem.WriteRaster(0, 0, img_w, img_h, img.data, buf_type=dtype,
+                        buf_pixel_space=img.itemsize * n_bands,
+                        buf_line_space=img.itemsize * n_bands * img_w,
+                        buf_band_space=img.itemsize)
     mem.FlushCache()
     return mem
 
 
+# Edge length in pixels of the tiles written with the default creation options:
+default_block_size = 512
+
+
+def get_creation_options(dtype, compress="DEFLATE", tiled=True, block_size=default_block_size,
+                         num_threads="ALL_CPUS", bigtiff="IF_SAFER"):
+    """
+    Get the GeoTIFF creation options for a compact and fast to read output:
+    Tiled, compressed with a predictor suited to the dtype and compressed using several threads.
+
+    :param dtype: The numpy dtype of the raster
+    :param compress: The compression, e.g. DEFLATE, ZSTD or LZW. None for no compression.
+    :param tiled: Write the raster as tiles instead of strips. Default is True.
+    :param block_size: The tile size in pixels
+    :param num_threads: The number of threads used to compress, e.g. 4 or ALL_CPUS
+    :param bigtiff: The BIGTIFF creation option
+    :return: The creation options as a list of str, such as ["COMPRESS=DEFLATE"]
+    :rtype: list of str
+    """
+    options = ["BIGTIFF=%s" % bigtiff]
+    if tiled:
+        options += ["TILED=YES", "BLOCKXSIZE=%s" % block_size, "BLOCKYSIZE=%s" % block_size]
+    if compress:
+        options += ["COMPRESS=%s" % compress, "NUM_THREADS=%s" % num_threads]
+        dtype = np.dtype(dtype)
+        # Horizontal differencing for integers, floating point predictor for floats:
+        if dtype.kind == "f":
+            options.append("PREDICTOR=3")
+        elif dtype.kind in "iu" and dtype.itemsize > 1:
+            options.append("PREDICTOR=2")
+    return options
+
+
+def merge_creation_options(options, overrides):
+    """
+    Merge two lists of creation options, the overriding ones replacing the options of the same name.
+
+    :param options: The creation options as a list of str, such as ["COMPRESS=DEFLATE"]
+    :param overrides: The overriding creation options
+    :return: The merged creation options, in the order of the options followed by the new ones of the overrides.
+    :rtype: list of str
+    """
+    merged = {}
+    for option in list(options) + list(overrides or []):
+        merged[option.split("=")[0].upper()] = option
+    return list(merged.values())
+
+
+def write_cog(img, dst, projection, coordinates, **kwargs):
+    """
+    Writes a Cloud-Optimized GeoTiff (COG), i.e. a tiled and compressed GeoTiff including its overviews.
+    Uses the COG driver if available (GDAL >= 3.1), the GTiff driver otherwise.
+
+    :param img: The numpy array to write
+    :param dst: The destination path
+    :param projection: The gdal projection as `str`
+    :param coordinates: The geotransform [Top-Left X, W-E Resolution, 0, Top Left Y, 0, N-S Resolution]
+    :keyword dtype: The desired gdal dtype
+    :keyword nodata: Assign a nodata value
+    :keyword compress: The compression, e.g. DEFLATE or ZSTD. Default is DEFLATE.
+    :keyword resampling: The resampling used for the overviews. Default is AVERAGE, use NEAREST for masks.
+    :keyword num_threads: The number of threads used to compress. Default is ALL_CPUS.
+    :keyword options: Creation options as a list of str, overriding the default ones of the same name.
+                      They are passed to the COG driver if available, to the GTiff driver otherwise.
+    :return: Writes image to given path. Returns 0 if all went well, 1 otherwise.
+    :rtype: int
+    """
+    compress = kwargs.pop("compress", "DEFLATE")
+    resampling = kwargs.pop("resampling", "AVERAGE")
+    num_threads = kwargs.pop("num_threads", "ALL_CPUS")
+    overrides = kwargs.pop("options", None)
+    mem = write_to_memory(img, "", projection, coordinates, **kwargs)
+    if gdal.GetDriverByName("COG") is not None:
+        options = ["COMPRESS=%s" % compress, "PREDICTOR=YES", "NUM_THREADS=%s" % num_threads,
+                   "OVERVIEWS=IGNORE_EXISTING", "RESAMPLING=%s" % resampling, "BIGTIFF=IF_SAFER"]
+        ds = gdal.GetDriverByName("COG").CreateCopy(dst, mem, options=merge_creation_options(options, overrides))
+    else:
+        factors, size = [], max(mem.RasterXSize, mem.RasterYSize)
+        while size > 512:
+            size //= 2
+            factors.append(2 ** (len(factors) + 1))
+        mem.BuildOverviews(resampling, factors)
+        options = get_creation_options(img.dtype, compress=compress, num_threads=num_threads)
+        options = merge_creation_options(options + ["COPY_SRC_OVERVIEWS=YES"], overrides)
+        ds = gdal.GetDriverByName("GTiff").CreateCopy(dst, mem, options=options)
+    mem = None
+    if ds is not None:
+        ds = None
+        return 0
+    return 1
+
+
 def write_to_memory(img, dst, projection, coordinates, **kwargs):
     """
 
@@ -184,6 +376,34 @@ def write_geotiff_existing(img, dst, ds, **kwargs):
     return write_geotiff(img, dst, projection, geotransform, **kwargs)
 
 
+@functools.lru_cache(maxsize=64)
+def _get_transformation(old_epsg, new_epsg, thread_id):
+    source = osr.SpatialReference()
+    source.ImportFromEPSG(old_epsg)
+    # The target projection
+    target = osr.SpatialReference()
+    target.ImportFromEPSG(new_epsg)
+    if int(osgeo.__version__[0]) >= 3:
+        # GDAL 3 changes axis order: https://github.com/OSGeo/gdal/issues/1546
+        source.SetAxisMappingStrategy(osgeo.osr.OAMS_TRADITIONAL_GIS_ORDER)
+        target.SetAxisMappingStrategy(osgeo.osr.OAMS_TRADITIONAL_GIS_ORDER)
+    return osr.CoordinateTransformation(source, target)
+
+
+def get_transformation(old_epsg, new_epsg=4326):
+    """
+    Get the transformation between two EPSG coordinate reference systems.
+    The transformations are cached, so that the coordinate systems are only set up once.
+    As a transformation cannot be shared between threads, each thread gets its own one.
+
+    :param old_epsg: The EPSG code of the old coordinate system
+    :param new_epsg: The EPSG code of the new coordinate system to transfer to. Default is 4326 (WGS84).
+    :return: The transformation, using the traditional (x, y) or (lon, lat) axis order.
+    :rtype: :class:`osr.CoordinateTransformation`
+    """
+    return _get_transformation(int(old_epsg), int(new_epsg), threading.get_ident())
+
+
 def transform_point(point, old_epsg, new_epsg=4326):
     """
     Transform a tuple (x,y) (or lon/lat) to a different EPSG coordinate reference system.
@@ -195,16 +415,23 @@ def transform_point(point, old_epsg, new_epsg=4326):
     :param new_epsg: The EPSG code of the new coordinate system to transfer to. Default is 4326 (WGS84).
     :return: The point's location in the new epsg as (lon/lat) - z is omitted due to it being 0 most of the time
     """
-
-    source = osr.SpatialReference()
-    source.ImportFromEPSG(old_epsg)
-    # The target projection
-    target = osr.SpatialReference()
-    target.ImportFromEPSG(new_epsg)
-    if int(osgeo.__version__[0]) >= 3:
-        # GDAL 3 changes axis order: https://github.com/OSGeo/gdal/issues/1546
-        source.SetAxisMappingStrategy(osgeo.osr.OAMS_TRADITIONAL_GIS_ORDER)
-        target.SetAxisMappingStrategy(osgeo.osr.OAMS_TRADITIONAL_GIS_ORDER)
-    transform = osr.CoordinateTransformation(source, target)
-    new_pt = transform.TransformPoint(point[0], point[1])
+    new_pt = get_transformation(old_epsg, new_epsg).TransformPoint(point[0], point[1])
     return new_pt[0], new_pt[1]
+
+
+def transform_points(points, old_epsg, new_epsg=4326):
+    """
+    Transform a set of points (x,y) (or lon/lat) to a different EPSG coordinate reference system in a single call.
+    Note: This works only with 2D points (x,y) - Z is omitted in the output.
+
+    :param points: The points as array-like of shape (n, 2), e.g. [(x0, y0), (x1, y1)]
+    :param old_epsg: The EPSG code of the old coordinate system
+    :param new_epsg: The EPSG code of the new coordinate system to transfer to. Default is 4326 (WGS84).
+    :return: The points' locations in the new epsg as array of shape (n, 2)
+    :rtype: :class:`numpy.ndarray`
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if not points.size:
+        return np.empty((0, 2), dtype=np.float64)
+    new_pts = get_transformation(old_epsg, new_epsg).TransformPoints(points.tolist())
+    return np.array(new_pts, dtype=np.float64)[:, :2]
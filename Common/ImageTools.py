@@ -20,21 +20,29 @@ limitations under the License.
 import os
 import numpy as np
 from osgeo import gdal
-from Common import FileSystem
+from Common import FileSystem, BlockProcessing
 from Common.GDal import buildvrt, translate, warp, retile, merge
 from Common.GDalDatasetWrapper import GDalDatasetWrapper
 
 
-def extract_class(mask, class_to_extract, value_type):
+def extract_class(mask, class_to_extract, value_type, **kwargs):
     """
     Extract either bits or values from an image.
-    :param mask: Numpy array
+    :param mask: Numpy array or :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper`.
+    Datasets are processed block by block using :func:`Common.BlockProcessing.process_blocks`.
     :param value_type: The type of the value to be extracted. Can be one of 'Bit', 'Value' or 'Threshold'.
     :param class_to_extract: The items to be extracted.
     In the case of 'Bit' and 'Value' an array of items to be extracted is expected; In the case of threshold a single
     integer.
+    :param kwargs: Optional arguments of :func:`Common.BlockProcessing.process_blocks` for datasets, e.g. n_threads.
     :return: Numpy array of the same size as the input with the desired classes extracted.
+    For datasets, an uint8 :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper`.
     """
+    if isinstance(mask, GDalDatasetWrapper):
+        # The input nodata has no meaning for the extracted classes:
+        kwargs.setdefault("nodata", None)
+        return BlockProcessing.process_blocks(lambda block: extract_class(block, class_to_extract, value_type),
+                                              mask, dtypes=[np.uint8], **kwargs)[0]
     value_type = str(value_type).lower()
     if value_type == "bit":
         return extract_bits(mask, class_to_extract)
@@ -54,44 +62,98 @@ def extract_class(mask, class_to_extract, value_type):
     raise ValueError("Unknown value type encountered: %s" % value_type)
 
 
+def _get_lut(img, selected):
+    """
+    Get a lookup table with one entry per possible value of an uint8 or uint16 image.
+
+    :param img: The input image
+    :param selected: Function returning for an array of all possible values which ones are selected.
+    :return: The boolean lookup table, None for other dtypes.
+    """
+    if img.dtype not in [np.uint8, np.uint16]:
+        return None
+    return selected(np.arange(np.iinfo(img.dtype).max + 1, dtype=img.dtype))
+
+
 def extract_values(img, values):
     """
-    Extract values from a given image
+    Extract values from a given image in a single pass.
+    uint8 and uint16 images are looked up in a table of all their possible values.
     :param img: The input image
     :param values: The list of values to be extracted
-    :return:
+    :return: Boolean numpy array of the same size as the input, True where one of the values is found.
     """
     if len(values) < 1:
         raise ValueError("No list of values given")
-    full_img = [img == val for val in values]
-    return np.bitwise_or.reduce(full_img)
+    lut = _get_lut(img, lambda v: np.isin(v, values))
+    if lut is not None:
+        return lut[img]
+    return np.isin(img, values)
 
 
 def extract_bits(img, bits):
     """
-    Extract bits from a given image
+    Extract bits from a given image in a single pass, the bits being combined into a single mask.
     :param img: The input image
     :param bits: The list of bit positions to be extracted.
     E.g. bit position 5 --> Value 32 (2**5) will be extracteed
-    :return:
+    :return: Boolean numpy array of the same size as the input, True where one of the bits is set.
     """
     if len(bits) < 1:
         raise ValueError("No list of bits given")
-    full_img = [np.bitwise_and(img, 2**bit) > 0 for bit in bits]
-    return np.bitwise_or.reduce(full_img)
+    bit_mask = img.dtype.type(sum(2**bit for bit in set(bits)))
+    lut = _get_lut(img, lambda v: np.bitwise_and(v, bit_mask) != 0)
+    if lut is not None:
+        return lut[img]
+    return np.bitwise_and(img, bit_mask) != 0
 
 
-def normalize(img, value_range_out, value_range_in, clip=False, dtype=None):
+def extract_classes(mask, classes_to_extract, value_type):
+    """
+    Extract several sets of bits or values from an image at once, e.g. the cloud and the snow classes of a mask.
+    For uint8 and uint16 images, the image is looked up only once in a table encoding all the sets.
+    :param mask: Numpy array
+    :param classes_to_extract: The list of items to be extracted for each output, e.g. [[1, 2], [5]]
+    :param value_type: The type of the value to be extracted. Can be one of 'Bit' or 'Value'.
+    :return: The list of boolean numpy arrays, one for each set of items.
+    """
+    value_type = str(value_type).lower()
+    if value_type not in ["bit", "value"]:
+        raise ValueError("Unknown value type encountered: %s" % value_type)
+    extract = extract_bits if value_type == "bit" else extract_values
+    if mask.dtype not in [np.uint8, np.uint16] or len(classes_to_extract) > 64:
+        return [extract(mask, items) for items in classes_to_extract]
+    # Encode the membership of each possible value to each set as one bit of the table:
+    codes = np.zeros(np.iinfo(mask.dtype).max + 1, dtype=np.uint64)
+    all_values = np.arange(codes.size, dtype=mask.dtype)
+    for i, items in enumerate(classes_to_extract):
+        codes[extract(all_values, items)] |= np.uint64(1 << i)
+    n_bytes = max(1, int(np.ceil(len(classes_to_extract) / 8.)))
+    codes = codes.astype(np.dtype("uint%s" % (8 * 2 ** int(np.ceil(np.log2(n_bytes))))))
+    img_codes = codes[mask]
+    return [np.bitwise_and(img_codes, codes.dtype.type(1 << i)) != 0 for i in range(len(classes_to_extract))]
+
+
+def normalize(img, value_range_out, value_range_in, clip=False, dtype=None, **kwargs):
     """
     Normalize an image to a fixed range of values
 
-    :param img: The input image
+    :param img: The input image, either as numpy array or :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper`.
+                Datasets are processed block by block using :func:`Common.BlockProcessing.process_blocks`.
     :param value_range_out: The range of output values
     :param value_range_in: The range of output values
     :param clip: Clip the min max values
     :param dtype: The output array dtype
-    :return: A numpy array of the same size as the input with values scaled in the desired range
+    :param kwargs: Optional arguments of :func:`Common.BlockProcessing.process_blocks` for datasets, e.g. n_threads.
+    :return: A numpy array of the same size as the input with values scaled in the desired range.
+             For datasets, a :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper`.
     """
+    if isinstance(img, GDalDatasetWrapper):
+        # The input nodata has no meaning for the scaled values:
+        kwargs.setdefault("nodata", None)
+        return BlockProcessing.process_blocks(lambda block: normalize(block, value_range_out, value_range_in,
+                                                                      clip=clip, dtype=dtype),
+                                              img, dtypes=[dtype or float], **kwargs)[0]
     new_value_min, new_value_max = value_range_out
     old_value_min, old_value_max = value_range_in
 
@@ -111,6 +173,214 @@ def normalize(img, value_range_out, value_range_in, clip=False, dtype=None):
     return np.array(scale_factor * (temp_img - old_value_max) + new_value_max, dtype=dtype)
 
 
+def normalize_to_dtype(img, value_range_out, value_range_in, clip=False, dtype=np.float32, out=None,
+                       block_lines=None):
+    """
+    Normalize an image to a fixed range of values, see :func:`normalize`.
+    The computation is done in float32, with scale and offset fused into a single multiply-add,
+    and the result is written directly into the output buffer.
+    Integer outputs are truncated as in :func:`normalize`, but from a float32 instead of a float64 result.
+    Both can thus differ by one for values lying on an integer: A float32 index of -0.6 scaled from (-1, 1)
+    to (0, 1000) gives 200 here, whereas :func:`normalize` gives 199 as its float64 result is 199.99998...
+
+    :param img: The input image
+    :param value_range_out: The range of output values
+    :param value_range_in: The range of input values
+    :param clip: Clip the min max values
+    :param dtype: The output array dtype. Default is float32. Ignored if `out` is given.
+    :param out: Optional output array of the same shape as the input, e.g. the input itself if it is float32.
+    :param block_lines: If given, process the image by blocks of this number of lines, using a float32 buffer
+                        of the size of a block only. Useful for integer outputs.
+    :return: A numpy array of the same size as the input with values scaled in the desired range
+    """
+    new_value_min, new_value_max = value_range_out
+    old_value_min, old_value_max = value_range_in
+    # Need to catch the following case separately as it produces nan otherwise:
+    if abs(old_value_max - old_value_min) < np.finfo(float).eps:
+        scale_factor = 1.
+    else:
+        scale_factor = 1. * (new_value_max - new_value_min) / (old_value_max - old_value_min)
+    offset = new_value_max - scale_factor * old_value_max
+    if out is None:
+        out = np.empty(img.shape, dtype=dtype)
+    n_lines = img.shape[0] if img.ndim else 1
+    step = block_lines or n_lines
+    # Work directly in the output if possible, in a buffer of a single block otherwise:
+    buffer = None if out.dtype == np.float32 else np.empty((min(step, n_lines),) + img.shape[1:], dtype=np.float32)
+    for y in range(0, n_lines, step):
+        block = out[y:y + step] if buffer is None else buffer[:min(step, n_lines - y)]
+        np.copyto(block, img[y:y + step], casting="unsafe")
+        if clip:
+            np.clip(block, old_value_min, old_value_max, out=block)
+        block *= np.float32(scale_factor)
+        block += np.float32(offset)
+        if buffer is not None:
+            np.copyto(out[y:y + step], block, casting="unsafe")
+    return out
+
+
+def downsample(img, factor, method="mean", nodata=None):
+    """
+    Downsample an image by integer factors, reducing each block of factor_y x factor_x pixels to a single one.
+
+    :param img: The input image of shape (y, x) or (y, x, bands). Its size has to be a multiple of the factors.
+    :param factor: The (y, x) downsampling factors
+    :param method: One of 'mean', 'mode' or 'nearest'. For 'mode', ties are resolved by the smallest value.
+    :param nodata: Pixels of this value are ignored by the mean. Blocks without any valid pixel are set to it.
+    :return: The downsampled image. Of dtype float32 (or float64 if the input is) for the mean,
+             of the input dtype otherwise.
+    """
+    fy, fx = int(factor[0]), int(factor[1])
+    h, w = img.shape[:2]
+    if h % fy or w % fx:
+        raise ValueError("Image of shape %s cannot be downsampled by %s" % (img.shape, factor))
+    method = method.lower()
+    if method == "nearest":
+        # Same as GDAL: The pixel covering the center of each block.
+        return img[fy // 2::fy, fx // 2::fx]
+    blocks = img.reshape((h // fy, fy, w // fx, fx) + img.shape[2:])
+    if method == "mean":
+        dtype = np.float64 if img.dtype == np.float64 else np.float32
+        if nodata is None:
+            return blocks.mean(axis=(1, 3), dtype=dtype)
+        valid = blocks != nodata
+        total = np.where(valid, blocks, 0).sum(axis=(1, 3), dtype=dtype)
+        count = valid.sum(axis=(1, 3))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(count > 0, total / count, nodata).astype(dtype)
+    if method == "mode":
+        # Gather the pixels of each block on the last axis:
+        blocks = np.moveaxis(blocks, 2, 1).reshape((h // fy, w // fx, fy * fx) + img.shape[2:])
+        blocks = np.sort(blocks, axis=2)
+        counts = np.zeros(blocks.shape, dtype=np.uint16)
+        for i in range(fy * fx):
+            counts[:, :, i] = (blocks == blocks[:, :, i:i + 1]).sum(axis=2)
+        # The first maximum in the sorted values is the smallest of the most frequent ones:
+        index = np.expand_dims(np.argmax(counts, axis=2), 2)
+        return np.take_along_axis(blocks, index, axis=2)[:, :, 0]
+    raise ValueError("Unknown downsampling method %s" % method)
+
+
+def upsample(img, factor):
+    """
+    Upsample an image by integer factors, repeating each pixel factor_y x factor_x times.
+
+    :param img: The input image of shape (y, x) or (y, x, bands)
+    :param factor: The (y, x) upsampling factors
+    :return: The upsampled image
+    """
+    return np.repeat(np.repeat(img, int(factor[0]), axis=0), int(factor[1]), axis=1)
+
+
+def _get_integer_factor(value, tolerance=1e-6):
+    """
+    Get the integer closest to a value, or None if they differ.
+    """
+    rounded = int(round(value))
+    return rounded if rounded >= 1 and abs(value - rounded) < tolerance else None
+
+
+class ResampledDataset(object):
+    """
+    A dataset resampled by integer factors window by window, without reading the full source.
+    Each window read is mapped to the source window covering it, which is then downsampled or upsampled
+    (See :func:`downsample` and :func:`upsample`). The result is the same as resampling the full image at once.
+    """
+
+    def __init__(self, src, resolution, down=(1, 1), up=(1, 1), method="mean"):
+        """
+        :param src: The source dataset, supporting `read_window`
+        :param resolution: The (x, y) resolution of the resampled dataset
+        :param down: The (y, x) downsampling factors. The source size has to be a multiple of them.
+        :param up: The (y, x) upsampling factors
+        :param method: The downsampling method. One of 'mean', 'mode' or 'nearest'.
+        """
+        self.src = src
+        self.down, self.up = down, up
+        self.method = method
+        width, height = src.size
+        self._size = (width // down[1] * up[1], height // down[0] * up[0])
+        ulx, _, _, uly, _, _ = src.geotransform
+        self.geotransform = (ulx, resolution[0], 0, uly, 0, resolution[1])
+        self.projection = src.projection
+        self.nodata_value = src.nodata_value
+
+    @property
+    def size(self):
+        """
+        Get the raster size in pixels
+
+        :return: The (x, y) size
+        :rtype: tuple of int
+        """
+        return self._size
+
+    @property
+    def resolution(self):
+        return self.geotransform[1], self.geotransform[-1]
+
+    def read_window(self, x, y, w, h):
+        """
+        Read a window of the resampled dataset, only reading the corresponding window of the source.
+
+        :param x: The pixel offset in x
+        :param y: The pixel offset in y
+        :param w: The window width
+        :param h: The window height
+        :return: The numpy array of the window
+        """
+        (dy, dx), (uy, ux) = self.down, self.up
+        if (dy, dx) != (1, 1):
+            img = self.src.read_window(x * dx, y * dy, w * dx, h * dy)
+            return downsample(img, (dy, dx), self.method, nodata=self.nodata_value)
+        # Read the source pixels covering the window, then crop their repetition to it:
+        x0, y0 = x // ux, y // uy
+        img = self.src.read_window(x0, y0, -(-(x + w) // ux) - x0, -(-(y + h) // uy) - y0)
+        return upsample(img, (uy, ux))[y - y0 * uy:y - y0 * uy + h, x - x0 * ux:x - x0 * ux + w]
+
+    @property
+    def array(self):
+        return self.read_window(0, 0, *self.size)
+
+
+def resample(src, resolution, method="mean", lazy=False):
+    """
+    Resample a single band dataset to a given resolution, e.g. to harmonize S2 bands between the 10/20/60m grids.
+    Integer factors are handled in memory using :func:`downsample` and :func:`upsample` (which always repeats).
+    Other resolutions fall back to a lazy :func:`gdal_translate`.
+
+    :param src: The input dataset
+    :type src: :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper`
+    :param resolution: The (x, y) target resolution, e.g. (20, -20)
+    :param method: The downsampling method. One of 'mean', 'mode' or 'nearest'.
+    :param lazy: If True, the source is not read: Integer factors are applied to each window read
+                 (See :class:`ResampledDataset`), e.g. by :func:`Common.BlockProcessing.process_blocks`.
+    :return: A :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper` object,
+             or a :class:`ResampledDataset` if `lazy` is set.
+    """
+    res_x, res_y = src.resolution
+    if tuple(resolution) == (res_x, res_y):
+        return src
+    width, height = src.size
+    down = _get_integer_factor(resolution[1] / res_y), _get_integer_factor(resolution[0] / res_x)
+    up = _get_integer_factor(res_y / resolution[1]), _get_integer_factor(res_x / resolution[0])
+    # Only a single pixel is read in order to know the number of bands:
+    factors = None
+    if src.read_window(0, 0, 1, 1).ndim == 2:
+        if None not in down and not height % down[0] and not width % down[1]:
+            factors = {"down": down}
+        elif None not in up:
+            factors = {"up": up}
+    if factors is None:
+        gdal_methods = {"mean": "average", "mode": "mode", "nearest": "near"}
+        return gdal_translate(src, tr=" ".join([str(i) for i in resolution]), r=gdal_methods[method], lazy=True)
+    resampled = ResampledDataset(src, resolution, method=method, **factors)
+    if lazy:
+        return resampled
+    return GDalDatasetWrapper(array=resampled.array, projection=src.projection,
+                              geotransform=resampled.geotransform, nodata_value=src.nodata_value)
+
+
 def gdal_buildvrt(*inputs, dst=None, **options):
     """
     Build a gdalvrt using in memory bindings.
@@ -133,6 +403,7 @@ def gdal_translate(src, dst=None, **options):
     :param dst: If specified, the output will be writen to
     the given path on a physical disk.
     Note: This overwrites a previous file at the same location.
+    :keyword lazy: If True and no dst is given, return a deferred in-memory VRT instead of executing the operation.
     :return: A :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper` object
     :rtype: `osgeo.gdal.dataset` or file on disk (see parameter ``dst``).
     """
@@ -147,6 +418,7 @@ def gdal_warp(src, dst=None, **options):
     :param dst: If specified, the output will be writen to
     the given path on a physical disk.
     Note: This overwrites a previous file at the same location.
+    :keyword lazy: If True and no dst is given, return a deferred in-memory VRT instead of executing the operation.
     :return: A :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper` object
     :rtype: `osgeo.gdal.dataset` or file on disk (see parameter ``dst``).
     """
@@ -155,42 +427,17 @@ def gdal_warp(src, dst=None, **options):
 
 def gdal_merge(*src, dst=None, **options):
     """
-    Merge a dataset using a modified gdal_merge.
+    Merge a list of datasets in-process, following the behaviour of gdal_merge.py.
 
     :param src: The list of input filenames or datasets.
     :param dst: If specified, the output will be writen to
     the given path on a physical disk.
-    :param options: Optional keyword arguments
-    :return:
-    """
-    gdal_common_params = ["optfile"]
-    options_list = [""]
-    for k, v in options.items():
-        if k in gdal_common_params:
-            options_list += ["--%s" % k, "%s" % v]
-        elif type(v) is not bool:
-            options_list += ["-%s" % k, "%s" % v]
-        elif type(v) is bool and v is True:
-            options_list.append("-%s" % k)
-        else:
-            pass
-    #src = [i.get_ds() if type(i) == GDalDatasetWrapper else i for i in src]
-    # Remove previous existing file if writing to disk is enabled:
-    if dst and type(dst) == str:
-        FileSystem.remove_file(dst)
-        # Note: De-allocation before file is actually written to disk
-        # cf. https://gdal.org/api/python_gotchas.html
-        options_list += ["-o", "%s" % dst]
-        _ = merge.run_merge(*[s for s in src], argv=options_list)
-        _ = None
-        ds_out = gdal.Open(dst)
-    else:
-        # Write directly into memory if no path specified (faster):
-        ds_out = merge.run_merge(*[s for s in src], argv=options_list)
-    arr_bands_last = np.array(ds_out.ReadAsArray())
-    if arr_bands_last.ndim == 3:
-        arr_bands_last = np.moveaxis(arr_bands_last, 0, -1)
-    return GDalDatasetWrapper(ds=ds_out, array=arr_bands_last)
+    Note: This overwrites a previous file at the same location.
+    :param options: Optional keyword arguments, e.g. n, a_nodata, separate or optfile.
+    :return: A :class:`Common.GDalDatasetWrapper.GDalDatasetWrapper` object
+    :rtype: `osgeo.gdal.dataset` or file on disk (see parameter ``dst``).
+    """
+    return merge.gdal_merge(*src, dst=dst, **options)
 
 
 def gdal_retile(src, dst, **options):
@@ -199,10 +446,10 @@ def gdal_retile(src, dst, **options):
     :param dst: The destination directory
     :param src: The source filename or dataset
     :type src: :class:`Gdal.Dataset or str
-    :param options: Optional arguments
+    :param options: Optional arguments, see :func:`Common.GDal.retile.gdal_retile`
     :return: The list of files created
     :rtype: list of str
     """
     if not os.path.isdir(dst):
         os.makedirs(dst)
-    return retile.run_tiling(ds_or_path=src, TargetDir=dst, **options)
+    return retile.gdal_retile(src, dst, **options)
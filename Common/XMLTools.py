@@ -20,7 +20,9 @@ limitations under the License.
 
 from __future__ import print_function
 import os
+import re
 import shutil
+import functools
 import logging
 
 log = logging.getLogger(__name__)
@@ -80,6 +82,60 @@ def get_xpath(xml, xpath):
     return root.findall(xpath)
 
 
+def _get_xpath_steps(xpath):
+    """
+    Split a simple xpath of child elements, such as ./Fixed_Header/Mission, into its tags.
+    :param xpath: The xpath
+    :return: The list of tags ('*' matching any tag) or None if the xpath is not a simple path of child elements.
+    """
+    if xpath.startswith("./"):
+        xpath = xpath[2:]
+    steps = xpath.split("/")
+    if not xpath or any(not step or step in [".", ".."] or re.search(r"[\[\]@():{}]", step) for step in steps):
+        return None
+    return steps
+
+
+@functools.lru_cache(maxsize=4096)
+def _get_xpath_text(xml, mtime, xpath, first):
+    from xml.etree import ElementTree
+    steps = _get_xpath_steps(xpath)
+    if steps is None:
+        results = [el.text for el in get_xpath(xml, xpath)]
+        return tuple(results[:1] if first else results)
+    results, stack = [], []
+    for event, el in ElementTree.iterparse(xml, events=("start", "end")):
+        if event == "start":
+            stack.append(el.tag.split('}', 1)[-1])  # strip all namespaces
+            continue
+        # The root element is not part of the path:
+        path = stack[1:]
+        if len(path) == len(steps) and all(step in ["*", tag] for step, tag in zip(steps, path)):
+            results.append(el.text)
+            if first:
+                break
+        stack.pop()
+        # Children are not needed anymore once their parent is complete:
+        el.clear()
+    return tuple(results)
+
+
+def get_xpath_text(xml, xpath, first=False):
+    """
+    Return the text of all xpath results of an xml-file. Strips of ALL namespaces.
+    Simple paths of child elements (e.g. ./Fixed_Header/Mission) are streamed, clearing the elements once read
+    and stopping at the first match if `first` is set - other xpaths use :func:`get_xpath`.
+    The results are cached as long as the file is not modified.
+    :param xml: The full path to the xml file
+    :param xpath: The xpath to be searched for.
+    :param first: Only return the first result.
+    :return: The text of each matching element
+    :rtype: tuple of str
+    """
+    xml = os.path.abspath(xml)
+    return _get_xpath_text(xml, os.stat(xml).st_mtime_ns, xpath, first)
+
+
 def get_single_xpath(xml, xpath):
     """
     Get a single xpath element
@@ -87,4 +143,4 @@ def get_single_xpath(xml, xpath):
     :param xpath: The xpath to be searched for.
     :return:
     """
-    return get_xpath(xml, xpath)[0].text
+    return get_xpath_text(xml, xpath, first=True)[0]
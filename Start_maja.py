@@ -301,16 +301,11 @@ class StartMaja(object):
 
         regexes = ["%s%s_%s.DBL(.DIR)?$" % (AuxFile.DTMFile.get_specifiable_regex(), self.tile, nbr)
                    for nbr in AuxFile.DTMFile.mnt_version[type_dem]]
-        mnt_folders = []
+        mnts = []
         for regex in regexes:
-            try:
-                mnt_folders += FileSystem.find(regex, self.rep_mnt)
-            except ValueError:
-                pass
-        if not mnt_folders:
+            mnts += AuxFile.DTMFile.from_directory(self.rep_mnt, regex=regex)
+        if not mnts:
             return None
-        mnts = [AuxFile.DTMFile(mnt) for mnt in mnt_folders]
-        mnts = [mnt for mnt in mnts if mnt is not None]
         return mnts[0]
 
     def get_cams_files(self):
@@ -322,13 +317,7 @@ class StartMaja(object):
         For each CAMS a single .HDR file and an associated .DBL.DIR/.DBL file
         has to be found. Otherwise it gets discarded
         """
-        try:
-            cams_folders = FileSystem.find(AuxFile.CAMSFile.regex, self.rep_cams)
-        except ValueError:
-            return []
-        cams = [AuxFile.CAMSFile(c) for c in cams_folders]
-        cams = [c for c in cams if c is not None]
-        return cams
+        return AuxFile.CAMSFile.from_directory(self.rep_cams)
 
     def create_workplans(self, max_product_difference):
         """
@@ -19,10 +19,31 @@ limitations under the License.
 
 import sys
 import os
+import logging
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))  # Import relative modules
 
 __version__ = "4.0.1"
 
+logger = logging.getLogger("root")
+
+
+def create_dtm(site, platform_id, mission_field, mnt_resolutions, coarse_res, **kwargs):
+    """
+    Create the DTM of a single site. Used as worker of :class:`DTMBatchCreator`.
+    :param site: The :class:`prepare_mnt.mnt.SiteInfo.Site` of the tile
+    :param platform_id: The platform ID used in the filenames, e.g. S2_
+    :param mission_field: The <Mission>-field of the HDR file, e.g. SENTINEL-2_
+    :param mnt_resolutions: The list of resolutions to be written.
+    :param coarse_res: The coarse resolution in x and y
+    :param kwargs: Forwarded parameters to :class:`prepare_mnt.mnt.MNTFactory`
+    :return: The number of files and total size in bytes left in /vsimem by the worker process.
+    """
+    from prepare_mnt.mnt.MNTFactory import MNTFactory
+    from Common.GDal import vsimem
+    MNTFactory(site=site, platform_id=platform_id, mission_field=mission_field,
+               mnt_resolutions=mnt_resolutions, coarse_res=coarse_res, **kwargs).factory()
+    return vsimem.log_usage()
+
 
 class DTMCreator:
     """
@@ -31,7 +52,7 @@ class DTMCreator:
     both of filename *AUX_REFDE2*, which are created in the given output path
     """
 
-    def __init__(self, product_path, dem_dir, water_dir, type_dem, coarse_res, full_res_only):
+    def __init__(self, product_path, dem_dir, water_dir, type_dem, coarse_res, full_res_only, nthreads=4):
         """
         Init the DTMCreator by finding the Metadata file assiociated with the product
         :param product_path: The full path to the L1C/L2A product folder
@@ -42,12 +63,13 @@ class DTMCreator:
         :param coarse_res: Coarse resolution of the MNT in Meter
         :type coarse_res: int
         :param full_res_only: Write full resolution masks only
+        :param nthreads: Number of rasters written concurrently
         """
         from Chain import Product
         self.product = Product.MajaProduct.factory(os.path.normpath(product_path))
-        print(self.product)
         if not self.product:
             raise ValueError("Unknown product found for path %s" % product_path)
+        logger.info(self.product)
         self.dem_dir = dem_dir
         self.water_dir = water_dir
         self.type_dem = type_dem
@@ -55,6 +77,7 @@ class DTMCreator:
             raise ValueError("Need to provide param '--dem_dir' for chosen DEM type: %s" % self.type_dem)
         self.coarse_res = int(coarse_res)
         self.full_res_only = full_res_only
+        self.nthreads = nthreads
 
     def run(self, outdir, tempdir):
         """
@@ -67,8 +90,93 @@ class DTMCreator:
                              raw_gsw=self.water_dir,
                              wdir=tempdir,
                              type_dem=self.type_dem,
-                             full_res_only=self.full_res_only)
-        print("Finished DTM creation for site/tile %s" % self.product.tile)
+                             full_res_only=self.full_res_only,
+                             n_threads=self.nthreads)
+        logger.info("Finished DTM creation for site/tile %s" % self.product.tile)
+
+
+class DTMBatchCreator:
+    """
+    Class to create the DTMs of a list of tiles without any L1 product, e.g. in order to precompute
+    the DTMs of a whole region. The footprint of each tile is derived from the tiling grid of its platform.
+    The tiles are processed in parallel, all of them sharing the same raw DEM and water-mask directories.
+    """
+
+    def __init__(self, tiles, platform, dem_dir, water_dir, type_dem, full_res_only, nthreads=4, nprocs=1,
+                 product_type="natif", grid_file=None):
+        """
+        Init the DTMBatchCreator by deriving the sites of all tiles
+        :param tiles: The list of tile IDs, e.g. S2 tiles or L8 path/rows
+        :param platform: The platform of the tiles. One of sentinel2, landsat8 or venus.
+        :param dem_dir: DEM directory
+        :param water_dir: Water-mask directory
+        :param type_dem: Type of mnt
+        :param full_res_only: Write full resolution masks only
+        :param nthreads: Number of rasters written concurrently for each tile
+        :param nprocs: Number of tiles processed concurrently
+        :param product_type: The type of products the DTMs are used with. Either natif or muscate.
+        :param grid_file: The csv-file containing the tiling grid.
+                          Not needed for S2, whose tiles are derived from their ID.
+        """
+        from Chain.S2Product import Sentinel2Natif
+        from Chain.L8Product import Landsat8Natif
+        from Chain.VSProduct import VenusNatif
+        from prepare_mnt.mnt import TileGrid
+        product_classes = {"sentinel2": Sentinel2Natif, "landsat8": Landsat8Natif, "venus": VenusNatif}
+        if platform not in product_classes:
+            raise ValueError("Unknown platform %s" % platform)
+        product_class = product_classes[platform]
+        if platform != "sentinel2" and not grid_file:
+            raise ValueError("Need to provide a tiling grid for platform %s" % platform)
+        grid = TileGrid.read_grid(grid_file) if grid_file else None
+        self.sites = [TileGrid.get_site(tile, platform, product_class.base_resolution, grid) for tile in tiles]
+        self.platform_id = product_class.platform_strings[platform]
+        self.mission_field = product_class.xml_maja_types[platform][product_type]
+        self.coarse_res = product_class.coarse_resolution
+        self.mnt_resolutions = product_class.get_mnt_resolutions(product_class.base_resolution)
+        self.dem_dir = dem_dir
+        self.water_dir = water_dir
+        self.type_dem = type_dem
+        if self.type_dem != "srtm" and not self.dem_dir:
+            raise ValueError("Need to provide param '--dem_dir' for chosen DEM type: %s" % self.type_dem)
+        self.full_res_only = full_res_only
+        self.nthreads = nthreads
+        self.nprocs = nprocs
+
+    def run(self, outdir, tempdir):
+        """
+        Run the DTM Creation for all tiles
+        :param outdir: Output directory
+        :param tempdir: Temporary-/Working-directory. A sub-directory is used for each tile.
+        :return: The list of tiles for which the DTM creation failed.
+        """
+        import tempfile
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        if not tempdir:
+            tempdir = tempfile.mkdtemp(prefix="dtm_batch_")
+        # Share the raw data amongst all tiles:
+        raw_dem = self.dem_dir if self.dem_dir else os.path.join(tempdir, "raw_dem")
+        raw_gsw = self.water_dir if self.water_dir else os.path.join(tempdir, "raw_gsw")
+        failed = []
+        with ProcessPoolExecutor(max_workers=self.nprocs) as executor:
+            futures = {executor.submit(create_dtm, site, self.platform_id, self.mission_field,
+                                       self.mnt_resolutions, self.coarse_res,
+                                       dem_dir=outdir,
+                                       raw_dem=raw_dem,
+                                       raw_gsw=raw_gsw,
+                                       wdir=os.path.join(tempdir, site.nom),
+                                       type_dem=self.type_dem,
+                                       full_res_only=self.full_res_only,
+                                       n_threads=self.nthreads): site.nom for site in self.sites}
+            for future in as_completed(futures):
+                try:
+                    n_files, size = future.result()
+                    logger.info("Finished DTM creation for site/tile %s (/vsimem: %s file(s), %.1f MB)"
+                                % (futures[future], n_files, size / 1024. / 1024.))
+                except Exception:
+                    logger.exception("DTM creation failed for site/tile %s" % futures[future])
+                    failed.append(futures[future])
+        return failed
 
 
 if __name__ == "__main__":
@@ -82,7 +190,20 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("-p", "--product",
                         help="The path to a Landsat-8, Venus or Sentinel-2 L1C/L2A product folder.",
-                        required=True, type=str)
+                        required=False, type=str)
+    parser.add_argument("--tiles", help="Batch mode: The list of tiles to create the DTMs for, e.g. S2 tile IDs"
+                                        " or L8 path/rows. Replaces the parameter '--product'.",
+                        nargs="+", required=False, type=str)
+    parser.add_argument("--platform", help="Batch mode: The platform of the tiles. Default is sentinel2.",
+                        required=False, type=str, default="sentinel2", choices=["sentinel2", "landsat8", "venus"])
+    parser.add_argument("--product_type", help="Batch mode: The type of products. Default is natif.",
+                        required=False, type=str, default="natif", choices=["natif", "muscate"])
+    parser.add_argument("--grid", help="Batch mode: The csv-file with the columns name,epsg,ulx,uly,lrx,lry"
+                                       " describing the tiles. Required for Landsat-8 and Venus,"
+                                       " not needed for Sentinel-2.",
+                        required=False, type=str)
+    parser.add_argument("--nprocs", help="Batch mode: Number of tiles processed concurrently. Default is 1",
+                        default=1, required=False, type=int)
     parser.add_argument("-o", "--out_dir", help="Output directory. Default is the current directory.",
                         default=os.getcwd(), required=False, type=str)
     parser.add_argument("-d", "--dem_dir",
@@ -101,7 +222,21 @@ if __name__ == "__main__":
                         help="Coarse resolution in meters. Default is 240", default=240, required=False, type=int)
     parser.add_argument("--full_res_only", help="Output full resolution imgs only. Discards the coarse_res parameter.",
                         action="store_true", required=False, default=False)
+    parser.add_argument("-n", "--nthreads", help="Number of rasters written concurrently. Default is 4",
+                        default=4, required=False, type=int)
     parser.add_argument('-v', '--version', action='version', version='%(prog)s ' + str(__version__))
     args = parser.parse_args()
-    creator = DTMCreator(args.product, args.dem_dir, args.water_dir, args.type_dem, args.coarse_res, args.full_res_only)
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format="%(asctime)s [%(levelname)-5.5s] %(message)s")
+    if args.tiles:
+        if args.platform != "sentinel2" and not args.grid:
+            parser.error("Need to provide '--grid' for the tiles of platform %s" % args.platform)
+        creator = DTMBatchCreator(args.tiles, args.platform, args.dem_dir, args.water_dir, args.type_dem,
+                                  args.full_res_only, args.nthreads, args.nprocs, args.product_type, args.grid)
+        failed = creator.run(args.out_dir, args.temp_dir)
+        sys.exit(1 if failed else 0)
+    if not args.product:
+        parser.error("Need to provide either '--product' or '--tiles'")
+    creator = DTMCreator(args.product, args.dem_dir, args.water_dir, args.type_dem, args.coarse_res, args.full_res_only,
+                         args.nthreads)
     creator.run(args.out_dir, args.temp_dir)
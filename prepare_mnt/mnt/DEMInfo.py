@@ -17,11 +17,15 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from Common.GDalDatasetWrapper import GDalDatasetWrapper
+from osgeo import osr
+from Common import ImageIO
 import numpy as np
 
 
 class DEMInfo:
+    # Number of lines read at once for the calculation of the statistics:
+    block_lines = 512
+
     def __init__(self, site, dem_full_res):
         self.name = site.nom
         self.epsg = site.epsg_str
@@ -32,11 +36,35 @@ class DEMInfo:
         self.lx = site.px
         self.ly = site.py
         self.alt = dem_full_res
-        driver = GDalDatasetWrapper.from_file(dem_full_res)
-        self.mean_alt = np.mean(driver.array)
-        self.std_dev_alt = np.std(driver.array)
-        self.short_description = driver.utm_description
-        self.nodata = driver.nodata_value
-        res_arr = driver.resolution
+        ds = ImageIO.open_tiff(dem_full_res)
+        band = ds.GetRasterBand(1)
+        self.mean_alt, self.std_dev_alt = self.get_mean_std(band, self.block_lines)
+        self.short_description = osr.SpatialReference(wkt=ds.GetProjection()).GetAttrValue("PROJCS")
+        self.nodata = band.GetNoDataValue()
+        res_arr = ds.GetGeoTransform()[1], ds.GetGeoTransform()[5]
         self.dem_subsampling_ratio = str(int(float(res_arr[0]) / float(site.res_x)))
+        band, ds = None, None
+
+    @staticmethod
+    def get_mean_std(band, block_lines):
+        """
+        Calculate the mean and standard deviation of all pixels of a band without reading it at once.
+        The statistics of each block of lines are merged using the parallel algorithm of Chan et al.
 
+        :param band: The :class:`gdal.Band` to read from
+        :param block_lines: The number of lines read at once
+        :return: The mean and standard deviation, identical to `np.mean` and `np.std` of the full array.
+        :rtype: tuple of float
+        """
+        count, mean, m2 = 0, 0., 0.
+        for y in range(0, band.YSize, block_lines):
+            arr = band.ReadAsArray(0, y, band.XSize, min(block_lines, band.YSize - y)).astype(np.float64)
+            count_block = arr.size
+            mean_block = np.mean(arr)
+            m2_block = np.sum(np.square(arr - mean_block, out=arr))
+            delta = mean_block - mean
+            total = count + count_block
+            mean += delta * count_block / total
+            m2 += m2_block + delta * delta * count * count_block / total
+            count = total
+        return mean, np.sqrt(m2 / count)
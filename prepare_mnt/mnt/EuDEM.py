@@ -93,8 +93,9 @@ class EuDEM(MNT):
         # Fusion of all EuDEM files
         ds_cropped = []
         for fn in unzipped:
+            # The warp is computed while reading the array:
             ds = ImageTools.gdal_warp(fn,
-                                      of="GTiff",
+                                      lazy=True,
                                       ot="Int16",
                                       r="cubic",
                                       te=self.site.te_str,
@@ -115,8 +116,9 @@ class EuDEM(MNT):
         """
         grid_step = 10
         from Common import ImageIO
-        ur_etrs89 = ImageIO.transform_point((site.lr_lonlat[0], site.ul_lonlat[1]), old_epsg=4326, new_epsg=3035)
-        ll_etrs89 = ImageIO.transform_point((site.ul_lonlat[0], site.lr_lonlat[1]), old_epsg=4326, new_epsg=3035)
+        ur_etrs89, ll_etrs89 = ImageIO.transform_points([(site.lr_lonlat[0], site.ul_lonlat[1]),
+                                                        (site.ul_lonlat[0], site.lr_lonlat[1])],
+                                                       old_epsg=4326, new_epsg=3035)
 
         def myfloor(val, base=grid_step):
             return base * math.floor(val / base)
@@ -28,8 +28,10 @@ from scipy import ndimage
 from scipy.ndimage import zoom
 import math
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from Common import FileSystem, ImageTools, ImageIO, XMLTools
 from prepare_mnt.mnt.DEMInfo import DEMInfo
+from prepare_mnt.mnt.MosaicCache import MosaicCache
 
 # GlobalSurfaceWater (GSW) base url for direct-download of the files:
 surface_water_url = "https://storage.googleapis.com/global-surface-water/downloads2/occurrence/occurrence_%s_v1_1.tif"
@@ -41,6 +43,9 @@ class MNT(object):
     DEM := Digital Elevation model)
     MNT := Modèle numérique de terrain; french for DEM
     """
+    # Number of additional MNT pixels read around each block for the spline interpolation:
+    spline_halo = 16
+
     def __init__(self, site, **kwargs):
         if not int(gdal.VersionInfo()) >= 2000000:
             raise ImportError("MNT creation needs Gdal >2.0!")
@@ -69,6 +74,14 @@ class MNT(object):
         self.gsw_threshold = kwargs.get("gsw_threshold", 30.)
         self.gsw_dst = kwargs.get("gsw_dst", os.path.join(self.wdir, "surface_water_mask.tif"))
         self.quiet = not kwargs.get("verbose", False)
+        # Edge length of the blocks used for the slope/aspect calculation at full resolution:
+        self.block_size = kwargs.get("block_size", 1024)
+        # Number of rasters of the final product written concurrently:
+        self.n_threads = kwargs.get("n_threads", 4)
+        # Preprocessed raw mosaics are shared by all tiles using the same raw_dem/raw_gsw directories:
+        mosaic_dir = kwargs.get("mosaic_dir", None)
+        self.dem_cache = MosaicCache(mosaic_dir if mosaic_dir else os.path.join(self.raw_dem, "mosaic_cache"))
+        self.gsw_cache = MosaicCache(mosaic_dir if mosaic_dir else os.path.join(self.raw_gsw, "mosaic_cache"))
 
     def get_raw_data(self):
         """
@@ -86,25 +99,30 @@ class MNT(object):
         raise NotImplementedError
 
     @staticmethod
-    def calc_gradient(mnt_arr, res_x, res_y):
+    def calc_gradient(mnt_arr, res_x, res_y, dtype=np.float64):
         """
         Calculate the gradient in x and y direction.
         :param mnt_arr: The ALT numpy array
         :param res_x: The resolution in x-direction. *Both positive and negative will work.*
         :param res_y: The resolution in y-direction. *Both positive and negative will work.*
+        :param dtype: The dtype of the gradients. Use np.float32 to halve their memory footprint.
         :return: The gradient/derivative in x- and y-direction.
         """
         # TODO Find a pure numpy 2D convolution.
         kernel_horizontal = np.array([[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]])
         kernel_vertical = np.array([[1, 2, 1], [0, 0, 0], [-1, -2, -1]])
-        dz_dc = ndimage.convolve(mnt_arr, kernel_horizontal) / 8. / np.abs(res_x)
-        dz_dl = ndimage.convolve(mnt_arr, kernel_vertical) / 8. / np.abs(res_y)
+        dz_dc = ndimage.convolve(mnt_arr, kernel_horizontal, output=dtype)
+        dz_dl = ndimage.convolve(mnt_arr, kernel_vertical, output=dtype)
+        for grad, res in [(dz_dc, res_x), (dz_dl, res_y)]:
+            np.divide(grad, 8., out=grad)
+            np.divide(grad, np.abs(res), out=grad)
         return dz_dc, dz_dl
 
     @staticmethod
-    def calc_slope_aspect(dz_dc, dz_dl):
+    def calc_slope_aspect_reference(dz_dc, dz_dl):
         """
-        Calculate the slope and aspect.
+        Calculate the slope and aspect in double precision.
+        This is the reference for :func:`calc_slope_aspect`, which only uses it for single pixels.
         :param dz_dc: The derivative in x-direction
         :param dz_dl: The derivative in y-direction
         :return: The slope and aspect as numpy arrays.
@@ -117,6 +135,45 @@ class MNT(object):
         aspect = np.array(aspect * 100., dtype=np.int16)
         return slope, aspect
 
+    @staticmethod
+    def calc_slope_aspect(dz_dc, dz_dl):
+        """
+        Calculate the slope and aspect.
+        The computation is done in-place on float32 buffers. Pixels whose float32 result lies too close
+        to an integer boundary of the int16 output are recomputed with
+        :func:`calc_slope_aspect_reference`, so that the result is identical to the double precision one.
+        :param dz_dc: The derivative in x-direction
+        :param dz_dl: The derivative in y-direction
+        :return: The slope and aspect as numpy arrays.
+        """
+        flat, tol_flat, tol_scaled = 0.0001, 1e-7, 1e-3
+        # The aspect is pi + arctan2(-dz_dc, -dz_dl), which is in [0, 2pi]:
+        neg_dc = np.negative(dz_dc, dtype=np.float32)
+        neg_dl = np.negative(dz_dl, dtype=np.float32)
+        aspect = np.arctan2(neg_dc, neg_dl)
+        np.add(aspect, np.pi, out=aspect)
+        slope = np.multiply(neg_dc, neg_dc, out=neg_dc)
+        work = np.multiply(neg_dl, neg_dl, out=neg_dl)
+        np.add(slope, work, out=slope)
+        np.sqrt(slope, out=slope)
+        np.arctan(slope, out=slope)
+        np.subtract(slope, flat, out=work)
+        np.abs(work, out=work)
+        ambiguous = np.less(work, tol_flat)
+        for img in [slope, aspect]:
+            np.multiply(img, 100., out=img)
+            np.rint(img, out=work)
+            np.subtract(img, work, out=work)
+            np.abs(work, out=work)
+            ambiguous |= work < tol_scaled
+        np.multiply(aspect, slope >= flat * 100., out=aspect)
+        slope_int = slope.astype(np.int16)
+        aspect_int = aspect.astype(np.int16)
+        idx = np.nonzero(ambiguous)
+        slope_int[idx], aspect_int[idx] = MNT.calc_slope_aspect_reference(np.asarray(dz_dc, dtype=np.float64)[idx],
+                                                                          np.asarray(dz_dl, dtype=np.float64)[idx])
+        return slope_int, aspect_int
+
     @staticmethod
     def resample_to_full_resolution(image, mnt_resolution, full_resolution, order=3):
         """
@@ -134,6 +191,85 @@ class MNT(object):
         # Order 3 = Cubic interpolation
         return zoom(image, zoom_factor, order=order)
 
+    @staticmethod
+    def get_block_windows(shape_in, shape_out, block_size, halo):
+        """
+        Split an output image into blocks and get the input window needed to calculate each of them.
+        The coordinate mapping is the one used by :func:`scipy.ndimage.zoom`.
+
+        :param shape_in: The (y, x) shape of the input image.
+        :param shape_out: The (y, x) shape of the output image.
+        :param block_size: The maximum edge length of an output block.
+        :param halo: The number of input pixels added around each window.
+        :return: Generator of tuples containing the output window (y0, y1, x0, x1), the input window
+                 (y0, y1, x0, x1) and the input coordinates for each axis relative to the input window.
+        """
+        scale = [(n_in - 1.) / (n_out - 1.) if n_out > 1 else 1. for n_in, n_out in zip(shape_in, shape_out)]
+        for r0 in range(0, shape_out[0], block_size):
+            r1 = min(r0 + block_size, shape_out[0])
+            coords_y = np.arange(r0, r1) * scale[0]
+            y0 = max(0, int(math.floor(coords_y[0])) - halo)
+            y1 = min(shape_in[0], int(math.ceil(coords_y[-1])) + halo + 1)
+            for c0 in range(0, shape_out[1], block_size):
+                c1 = min(c0 + block_size, shape_out[1])
+                coords_x = np.arange(c0, c1) * scale[1]
+                x0 = max(0, int(math.floor(coords_x[0])) - halo)
+                x1 = min(shape_in[1], int(math.ceil(coords_x[-1])) + halo + 1)
+                yield (r0, r1, c0, c1), (y0, y1, x0, x1), (coords_y - y0, coords_x - x0)
+
+    def write_slope_aspect(self, mnt_path, slp_path, asp_path, mnt_resolution, full_resolution):
+        """
+        Calculate the slope and aspect at full resolution block by block and write them to disk.
+        For each block, the gradient is calculated on an overlapping window of the MNT, then resampled
+        using a cubic spline (See :func:`resample_to_full_resolution`).
+        The peak memory is thus bounded by `self.block_size`.
+
+        :param mnt_path: The path to the MNT at its own resolution.
+        :param slp_path: The path to write the slope to.
+        :param asp_path: The path to write the aspect to.
+        :param mnt_resolution: The input resolution as tuple (res_x, res_y)
+        :param full_resolution: The output resolution as tuple (res_x, res_y)
+        :return: Writes the slope and aspect to the given paths.
+        """
+        ds_mnt = ImageIO.open_tiff(mnt_path)
+        band_mnt = ds_mnt.GetRasterBand(1)
+        # The MNT is usually an uncompressed intermediate file, whose blocks can be paged in on demand:
+        mmap_mnt = ImageIO.get_memmap(ds_mnt) if ds_mnt.RasterCount == 1 else None
+        zoom_factor = (np.abs(mnt_resolution[0] / full_resolution[0]),
+                       np.abs(mnt_resolution[1] / full_resolution[1]))
+        shape_in = (ds_mnt.RasterYSize, ds_mnt.RasterXSize)
+        shape_out = tuple([int(round(n * z)) for n, z in zip(shape_in, zoom_factor)])
+
+        geotransform = list(ds_mnt.GetGeoTransform())
+        geotransform[1] = float(full_resolution[0])
+        geotransform[-1] = float(full_resolution[1])
+        outputs = []
+        for path in [slp_path, asp_path]:
+            ds_out = gdal.GetDriverByName("GTiff").Create(path, shape_out[1], shape_out[0], 1, gdal.GDT_Int16)
+            ds_out.SetGeoTransform(tuple(geotransform))
+            ds_out.SetProjection(ds_mnt.GetProjection())
+            outputs.append(ds_out)
+        band_slp, band_asp = [ds.GetRasterBand(1) for ds in outputs]
+
+        for (r0, r1, c0, c1), (y0, y1, x0, x1), (coords_y, coords_x) in \
+                self.get_block_windows(shape_in, shape_out, self.block_size, self.spline_halo):
+            # Read one more pixel on each side for the gradient kernels - except at the image border:
+            ry0, ry1 = max(0, y0 - 1), min(shape_in[0], y1 + 1)
+            rx0, rx1 = max(0, x0 - 1), min(shape_in[1], x1 + 1)
+            if mmap_mnt is not None:
+                mnt_in = np.array(mmap_mnt[ry0:ry1, rx0:rx1], dtype=mmap_mnt.dtype.newbyteorder("="))
+            else:
+                mnt_in = band_mnt.ReadAsArray(rx0, ry0, rx1 - rx0, ry1 - ry0)
+            grad_y_mnt, grad_x_mnt = self.calc_gradient(mnt_in, mnt_resolution[0], mnt_resolution[1], dtype=np.float32)
+            crop = (slice(y0 - ry0, y1 - ry0), slice(x0 - rx0, x1 - rx0))
+            coords = np.meshgrid(coords_y, coords_x, indexing="ij")
+            grad_y = ndimage.map_coordinates(grad_y_mnt[crop], coords, order=3, mode="constant")
+            grad_x = ndimage.map_coordinates(grad_x_mnt[crop], coords, order=3, mode="constant")
+            slope, aspect = self.calc_slope_aspect(grad_y, grad_x)
+            band_slp.WriteArray(slope, c0, r0)
+            band_asp.WriteArray(aspect, c0, r0)
+        band_slp, band_asp, outputs, band_mnt, ds_mnt, mmap_mnt = None, None, None, None, None, None
+
     @staticmethod
     def get_gsw_codes(site, grid_step=10):
         """
@@ -185,28 +321,57 @@ class MNT(object):
             filenames.append(output_path)
         return filenames
 
+    def threshold_water_granule(self, occ_file, dst):
+        """
+        Threshold a single gsw occurrence granule to a binary water mask.
+        The granule is processed strip by strip in order to avoid loading the full occurrence file.
+
+        :param occ_file: The gsw occurrence file
+        :param dst: The destination path of the binary water granule.
+        :return: Writes the granule to the given dst.
+        """
+        ds_occ = gdal.Open(occ_file)
+        band = ds_occ.GetRasterBand(1)
+        src_nodata = band.GetNoDataValue()
+        size_x, size_y = ds_occ.RasterXSize, ds_occ.RasterYSize
+        ds_out = gdal.GetDriverByName("GTiff").Create(dst, size_x, size_y, 1, gdal.GDT_Byte,
+                                                      ImageIO.get_creation_options(np.uint8))
+        ds_out.SetGeoTransform(ds_occ.GetGeoTransform())
+        ds_out.SetProjection(ds_occ.GetProjection())
+        band_out = ds_out.GetRasterBand(1)
+        strip_height = 512
+        for y_off in range(0, size_y, strip_height):
+            occ = band.ReadAsArray(0, y_off, size_x, min(strip_height, size_y - y_off))
+            water = occ > self.gsw_threshold
+            # Nodata areas are not considered as water:
+            if src_nodata is not None:
+                water &= occ != src_nodata
+            band_out.WriteArray(water.astype(np.uint8), 0, y_off)
+        band_out, ds_out, band, ds_occ = None, None, None, None
+
     def prepare_water_data(self):
         """
         Prepare the water mask constituing of a set of gsw files.
+        Each thresholded gsw granule is cached, so it is only processed once for all the sites covering it.
 
         :return: Writes the tiles water_mask to the self.gsw_dst path.
         """
         occ_files = self.get_raw_water_data()
-        vrt_path = os.path.join(self.wdir, "vrt_%s.vrt" % self.site.nom)
-        ImageTools.gdal_buildvrt(*occ_files, dst=vrt_path)
-        # Overlay occurrence image with same extent as the given site.
+        granules = self.gsw_cache.get_granules("gsw", occ_files, self.threshold_water_granule,
+                                               threshold=self.gsw_threshold)
+        mosaic = os.path.join(self.wdir, "gsw_%s.vrt" % self.site.nom)
+        ImageTools.gdal_buildvrt(*granules, dst=mosaic)
+        # Overlay the water mosaic with same extent as the given site.
         # Should the occurrence files not be complete, this sets all areas not covered by the occurrence to 0.
-        ds_warped = ImageTools.gdal_warp(vrt_path,
-                                         r="near",
-                                         te=self.site.te_str,
-                                         t_srs=self.site.epsg_str,
-                                         tr=self.site.tr_str,
-                                         dstnodata=0,
-                                         multi=True)
-        # Threshold the final image and write to destination:
-        image_bin = ds_warped.array > self.gsw_threshold
-        FileSystem.remove_file(vrt_path)
-        ImageIO.write_geotiff_existing(image_bin, self.gsw_dst, ds_warped.get_ds())
+        ImageTools.gdal_warp(mosaic, dst=self.gsw_dst,
+                             r="near",
+                             te=self.site.te_str,
+                             t_srs=self.site.epsg_str,
+                             tr=self.site.tr_str,
+                             dstnodata="None",
+                             wo="INIT_DEST=0",
+                             multi=True)
+        FileSystem.remove_file(mosaic)
 
     def to_maja_format(self, platform_id, mission_field, mnt_resolutions, coarse_res, full_res_only=False):
         """
@@ -240,89 +405,70 @@ class MNT(object):
         FileSystem.create_directory(dbl_dir)
         hdr = os.path.join(self.dem_dir, basename + ".HDR")
 
-        # Calulate gradient mask at MNT resolution:
-        mnt_in, drv = ImageIO.tiff_to_array(mnt_max_res, array_only=False)
-        grad_y_mnt, grad_x_mnt = self.calc_gradient(mnt_in, self.site.res_x, self.site.res_y)
-
         full_res = (int(mnt_resolutions[0]["val"].split(" ")[0]),
                     int(mnt_resolutions[0]["val"].split(" ")[1]))
 
-        grad_x = self.resample_to_full_resolution(grad_x_mnt, mnt_resolution=mnt_res, full_resolution=full_res, order=3)
-        grad_y = self.resample_to_full_resolution(grad_y_mnt, mnt_resolution=mnt_res, full_resolution=full_res, order=3)
-
-        slope, aspect = self.calc_slope_aspect(grad_y, grad_x)
-
-        # Write full res slope and aspect
-        geotransform = list(drv.GetGeoTransform())
-        geotransform[1] = float(full_res[0])
-        geotransform[-1] = float(full_res[1])
-        projection = drv.GetProjection()
+        # Calculate full res slope and aspect
         tmp_asp = tempfile.mktemp(dir=self.wdir, suffix="_asp.tif")
-        ImageIO.write_geotiff(aspect, tmp_asp, projection, tuple(geotransform))
         tmp_slp = tempfile.mktemp(dir=self.wdir, suffix="_slp.tif")
-        ImageIO.write_geotiff(slope, tmp_slp, projection, tuple(geotransform))
+        self.write_slope_aspect(mnt_max_res, tmp_slp, tmp_asp, mnt_resolution=mnt_res, full_resolution=full_res)
 
         # Full resolution:
         write_resolution_name = True if len(mnt_resolutions) > 1 else False
+        write_coarse_res = coarse_res and not full_res_only
+        coarse_res_str = str(coarse_res[0]) + " " + str(coarse_res[1]) if write_coarse_res else None
+
+        # The ALT, ASP and SLP rasters are all Int16:
+        creation_options = ImageIO.get_creation_options(np.int16)
+
+        def warp_full_and_coarse(src, path_full, tr, path_coarse=None):
+            if not path_coarse:
+                ImageTools.gdal_warp(src, dst=path_full, tr=tr, r="cubic", multi=True, co=creation_options)
+                return
+            # Keep the full resolution raster in memory, so that the coarse one is derived from it
+            # without reading back the file just written:
+            full = ImageTools.gdal_warp(src, tr=tr, r="cubic", multi=True, of="MEM")
+            ImageTools.gdal_translate(full, dst=path_full, co=creation_options)
+            ImageTools.gdal_warp(full, dst=path_coarse, tr=coarse_res_str, multi=True, co=creation_options)
+
         # Names for R1, R2 etc.
         rasters_written = []
-        path_alt, path_asp, path_slp = "", "", ""
         all_paths_alt = []
-        for res in mnt_resolutions:
-            # ALT:
-            bname_alt = basename + "_ALT"
-            bname_alt += "_" + str(res["name"]) if write_resolution_name else ""
-            bname_alt += ".TIF"
-            rel_alt = os.path.join(dbl_base, bname_alt)
-            path_alt = os.path.join(self.dem_dir, rel_alt)
-            all_paths_alt.append(path_alt)
-            ImageTools.gdal_warp(mnt_max_res, dst=path_alt, tr=res["val"], r="cubic", multi=True)
-            rasters_written.append(rel_alt)
-            # ASP:
-            bname_asp = basename + "_ASP"
-            bname_asp += "_" + res["name"] if write_resolution_name else ""
-            bname_asp += ".TIF"
-            rel_asp = os.path.join(dbl_base, bname_asp)
-            path_asp = os.path.join(self.dem_dir, rel_asp)
-            ImageTools.gdal_warp(tmp_asp, dst=path_asp, tr=res["val"], r="cubic", multi=True)
-            rasters_written.append(rel_asp)
-            # SLP:
-            bname_slp = basename + "_SLP"
-            bname_slp += "_" + res["name"] if write_resolution_name else ""
-            bname_slp += ".TIF"
-            rel_slp = os.path.join(dbl_base, bname_slp)
-            path_slp = os.path.join(self.dem_dir, rel_slp)
-            ImageTools.gdal_warp(tmp_slp, dst=path_slp, tr=res["val"], r="cubic", multi=True)
-            rasters_written.append(rel_slp)
-
-        # Optional coarse_res writing:
-        if coarse_res and not full_res_only:
-            # Resize all rasters for coarse res.
-            coarse_res_str = str(coarse_res[0]) + " " + str(coarse_res[1])
-            # ALC:
-            bname_alc = basename + "_ALC.TIF"
-            rel_alc = os.path.join(dbl_base, bname_alc)
-            path_alc = os.path.join(self.dem_dir, rel_alc)
-            ImageTools.gdal_warp(path_alt, dst=path_alc, tr=coarse_res_str, multi=True)
-            rasters_written.append(rel_alc)
-            # ALC:
-            bname_asc = basename + "_ASC.TIF"
-            rel_asc = os.path.join(dbl_base, bname_asc)
-            path_asc = os.path.join(self.dem_dir, rel_asc)
-            ImageTools.gdal_warp(path_asp, dst=path_asc, tr=coarse_res_str, multi=True)
-            rasters_written.append(rel_asc)
-            # ALC:
-            bname_slc = basename + "_SLC.TIF"
-            rel_slc = os.path.join(dbl_base, bname_slc)
-            path_slc = os.path.join(self.dem_dir, rel_slc)
-            ImageTools.gdal_warp(path_slp, dst=path_slc, tr=coarse_res_str, multi=True)
-            rasters_written.append(rel_slc)
-            # Water mask:
-            bname_msk = basename + "_MSK.TIF"
-            rel_msk = os.path.join(dbl_base, bname_msk)
-            path_msk = os.path.join(self.dem_dir, rel_msk)
-            ImageTools.gdal_warp(self.gsw_dst, dst=path_msk, tr=coarse_res_str, multi=True)
-            rasters_written.append(rel_msk)
+        with ThreadPoolExecutor(max_workers=self.n_threads) as executor:
+            futures = []
+            for i, res in enumerate(mnt_resolutions):
+                # The coarse rasters are derived from the last resolution:
+                is_last = i == len(mnt_resolutions) - 1
+                for name, coarse_name, src in [("ALT", "ALC", mnt_max_res),
+                                               ("ASP", "ASC", tmp_asp),
+                                               ("SLP", "SLC", tmp_slp)]:
+                    bname = basename + "_" + name
+                    bname += "_" + str(res["name"]) if write_resolution_name else ""
+                    bname += ".TIF"
+                    rel = os.path.join(dbl_base, bname)
+                    path = os.path.join(self.dem_dir, rel)
+                    rasters_written.append(rel)
+                    if name == "ALT":
+                        all_paths_alt.append(path)
+                    path_coarse = None
+                    if write_coarse_res and is_last:
+                        path_coarse = os.path.join(self.dem_dir, dbl_base, basename + "_" + coarse_name + ".TIF")
+                    futures.append(executor.submit(warp_full_and_coarse, src, path, res["val"], path_coarse))
+            # Optional coarse_res writing:
+            if write_coarse_res:
+                rasters_written += [os.path.join(dbl_base, basename + "_" + name + ".TIF")
+                                    for name in ["ALC", "ASC", "SLC"]]
+                # Water mask:
+                bname_msk = basename + "_MSK.TIF"
+                rel_msk = os.path.join(dbl_base, bname_msk)
+                path_msk = os.path.join(self.dem_dir, rel_msk)
+                futures.append(executor.submit(ImageTools.gdal_warp, self.gsw_dst, dst=path_msk,
+                                               tr=coarse_res_str, multi=True,
+                                               co=ImageIO.get_creation_options(np.uint8)))
+                rasters_written.append(rel_msk)
+            # Re-raise the first error encountered, if any:
+            for future in futures:
+                future.result()
 
         # Write HDR Metadata:
 
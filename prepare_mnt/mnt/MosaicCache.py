@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2016-2020 Centre National d'Etudes Spatiales (CNES), CSSI, CESBIO  All Rights Reserved
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import uuid
+import hashlib
+import logging
+from Common import FileSystem
+
+
+class MosaicCache(object):
+    """
+    Persistent cache of preprocessed raw data (e.g. nodata-fixed SRTM or thresholded GSW).
+    The entries are keyed by the content of the raw files they are built from as well as the
+    processing parameters. Each raw granule is preprocessed on its own (See :func:`get_granules`),
+    so that all tiles sharing a granule share its preprocessed version, whatever their other granules are.
+    The input of a tile is then assembled as a VRT over its cached granules.
+    """
+    def __init__(self, cache_dir):
+        """
+        Initialise the cache in the given directory.
+
+        :param cache_dir: The directory the mosaics are stored in. Created if not existing.
+        """
+        self.cache_dir = cache_dir
+        FileSystem.create_directory(self.cache_dir)
+
+    @staticmethod
+    def get_key(inputs, **params):
+        """
+        Get the content-key of a mosaic built from a set of raw files.
+        The raw files are identified by their basename, size and modification time.
+
+        :param inputs: The list of raw files used to build the mosaic.
+        :param params: The processing parameters applied to the raw files, e.g. a threshold.
+        :return: The key as hex-string.
+        :rtype: str
+        """
+        sha = hashlib.sha1()
+        for fn in sorted(inputs, key=os.path.basename):
+            stat = os.stat(fn)
+            sha.update(("%s:%s:%s;" % (os.path.basename(fn), stat.st_size, int(stat.st_mtime))).encode("utf-8"))
+        for k in sorted(params.keys()):
+            sha.update(("%s=%s;" % (k, params[k])).encode("utf-8"))
+        return sha.hexdigest()
+
+    def get_path(self, prefix, key):
+        """
+        Get the path of a cached mosaic
+
+        :param prefix: The type of mosaic, e.g. 'srtm'
+        :param key: The content-key, see :func:`get_key`
+        :return: The path to the mosaic inside the cache directory.
+        """
+        return os.path.join(self.cache_dir, "%s_%s.tif" % (prefix, key))
+
+    def get(self, prefix, inputs, builder, **params):
+        """
+        Get a mosaic from the cache. If it is not existing yet, it is built first.
+        The mosaic is written to a temporary file which is then moved in place, so that
+        several processes can share the same cache.
+
+        :param prefix: The type of mosaic, e.g. 'srtm'
+        :param inputs: The list of raw files used to build the mosaic.
+        :param builder: Function building the mosaic. Called as ``builder(inputs, dst)``.
+        :param params: The processing parameters, forwarded to :func:`get_key`.
+        :return: The path to the cached mosaic.
+        :rtype: str
+        """
+        path = self.get_path(prefix, self.get_key(inputs, **params))
+        if os.path.isfile(path):
+            logger.debug("Using cached mosaic %s" % path)
+            return path
+        tmp_path = os.path.join(self.cache_dir, "tmp_%s_%s" % (uuid.uuid4().hex, os.path.basename(path)))
+        try:
+            builder(inputs, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            FileSystem.remove_file(tmp_path)
+        logger.debug("Added mosaic %s to cache" % path)
+        return path
+
+    def get_granules(self, prefix, inputs, builder, **params):
+        """
+        Get the preprocessed version of each raw granule from the cache, building the missing ones.
+
+        :param prefix: The type of granule, e.g. 'srtm'
+        :param inputs: The list of raw granule files.
+        :param builder: Function preprocessing a single granule. Called as ``builder(raw_file, dst)``.
+        :param params: The processing parameters, forwarded to :func:`get_key`.
+        :return: The paths to the cached granules, in the order of the inputs.
+        :rtype: list of str
+        """
+        return [self.get(prefix, [raw], lambda raw_files, dst: builder(raw_files[0], dst), **params)
+                for raw in inputs]
+
+
+if __name__ == "__main__":
+    pass
+else:
+    logger = logging.getLogger("root")
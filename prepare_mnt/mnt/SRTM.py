@@ -21,7 +21,8 @@ from prepare_mnt.mnt.MNTBase import MNT
 import os
 import logging
 import math
-from Common import FileSystem, ImageTools
+import numpy as np
+from Common import FileSystem, ImageTools, ImageIO
 
 srtm_url = "http://srtm.csi.cgiar.org/wp-content/uploads/files/srtm_5x5/TIFF/%s.zip"
 
@@ -65,32 +66,41 @@ class SRTM(MNT):
             filenames.append(output_path)
         return filenames
 
+    def preprocess_srtm_granule(self, srtm_archive, dst):
+        """
+        Preprocess a single srtm archive: Extract it and set its nodata to 0.
+
+        :param srtm_archive: The srtm zip-archive
+        :param dst: The destination path of the preprocessed granule.
+        :return: Writes the granule to the given dst.
+        """
+        basename = os.path.splitext(os.path.basename(srtm_archive))[0]
+        FileSystem.unzip(srtm_archive, self.wdir)
+        fn_unzipped = FileSystem.find_single(pattern=basename + ".tif", path=self.wdir)
+        ImageTools.gdal_warp(fn_unzipped, dst=dst,
+                             srcnodata=-32768,
+                             dstnodata=0,
+                             co=ImageIO.get_creation_options(np.int16),
+                             multi=True)
+
     def prepare_mnt(self):
         """
         Prepare the srtm files.
+        Each preprocessed srtm granule is cached, so it is only extracted once for all the sites covering it.
 
         :return: Path to the full resolution DEM file.gsw
         :rtype: str
         """
         # Find/Download SRTM archives:
         srtm_archives = self.get_raw_data()
-        # Unzip the downloaded/found srtm zip files:
-        unzipped = []
-        for arch in srtm_archives:
-            basename = os.path.splitext(os.path.basename(arch))[0]
-            FileSystem.unzip(arch, self.wdir)
-            fn_unzipped = FileSystem.find_single(pattern=basename + ".tif", path=self.wdir)
-            unzipped.append(fn_unzipped)
-        # Fusion of all SRTM files
-        concat = ImageTools.gdal_buildvrt(*unzipped, vrtnodata=-32768)
-        # Set nodata to 0
-        nodata = ImageTools.gdal_warp(concat,
-                                      srcnodata=-32768,
-                                      dstnodata=0,
-                                      multi=True)
+        granules = self.dem_cache.get_granules("srtm", srtm_archives, self.preprocess_srtm_granule,
+                                               srcnodata=-32768, dstnodata=0)
+        # Fusion of all SRTM granules
+        mosaic = os.path.join(self.wdir, "srtm_%s.vrt" % self.site.nom)
+        ImageTools.gdal_buildvrt(*granules, dst=mosaic, srcnodata=0, vrtnodata=0)
         # Combine to image of fixed extent
         srtm_full_res = os.path.join(self.wdir, "srtm_%sm.tif" % int(self.site.res_x))
-        ImageTools.gdal_warp(nodata, dst=srtm_full_res,
+        ImageTools.gdal_warp(mosaic, dst=srtm_full_res,
                              r="cubic",
                              te=self.site.te_str,
                              t_srs=self.site.epsg_str,
@@ -98,6 +108,7 @@ class SRTM(MNT):
                              dstnodata=0,
                              srcnodata=0,
                              multi=True)
+        FileSystem.remove_file(mosaic)
         return srtm_full_res
 
     @staticmethod
@@ -18,7 +18,6 @@ limitations under the License.
 """
 
 from Common import ImageIO
-from Common.GDalDatasetWrapper import GDalDatasetWrapper
 from osgeo import osr, gdal
 
 
@@ -43,9 +42,8 @@ class Site:
         Get lat and lon min and max values
         :return: latmin, latmax, lonmin, lonmax of the current sites
         """
-        ul_lonlat = ImageIO.transform_point(self.ul, self.epsg, new_epsg=4326)
-        lr_lonlat = ImageIO.transform_point(self.lr, self.epsg, new_epsg=4326)
-        return ul_lonlat, lr_lonlat
+        ul_lonlat, lr_lonlat = ImageIO.transform_points([self.ul, self.lr], self.epsg, new_epsg=4326)
+        return tuple(ul_lonlat.tolist()), tuple(lr_lonlat.tolist())
 
     @property
     def projwin(self):
@@ -78,21 +76,17 @@ class Site:
     @staticmethod
     def from_raster(name, raster, **kwargs):
         """
-        Create site from a raster on disk
+        Create site from a raster on disk. Only the header of the raster is read.
         :param name: The name of the site
         :param raster: The gdal raster
-        Optional arguments:
+        Optional arguments, kept for compatibility only as the size is read from the header:
         - shape_index_y: Select the band index for the Y-size
         - shape_index_x: Select the band index for the X-size
         :return: A site class given the infos from the raster.
         """
-        driver = GDalDatasetWrapper.from_file(raster)
-        shape_index_y = kwargs.get("shape_index_y", 0)
-        shape_index_x = kwargs.get("shape_index_x", 1)
-        ny, nx = driver.array.shape[shape_index_y], driver.array.shape[shape_index_x]
-        epsg = driver.epsg
-        ulx, uly, lrx, lry = driver.ul_lr
-        ul = (ulx, uly)
-        lr = (lrx, lry)
-        xmin, xres, skx, ymax, sky, yres = driver.geotransform
-        return Site(name, epsg, ul=ul, lr=lr,  px=nx, py=ny, res_x=xres, res_y=yres)
+        info = ImageIO.get_raster_info(raster)
+        nx, ny = info.nx, info.ny
+        xmin, xres, skx, ymax, sky, yres = info.geotransform
+        ul = (xmin, ymax)
+        lr = (xmin + nx * xres, ymax + ny * yres)
+        return Site(name, info.epsg, ul=ul, lr=lr, px=nx, py=ny, res_x=xres, res_y=yres)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2016-2020 Centre National d'Etudes Spatiales (CNES), CSSI, CESBIO  All Rights Reserved
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import re
+import csv
+import math
+from prepare_mnt.mnt.SiteInfo import Site
+
+# Edge length of a Sentinel-2 tile in meters:
+s2_tile_size = 109800
+# Sentinel-2 tiles are aligned on the 60m-grid:
+s2_grid_step = 60
+# Column letters of the 100km MGRS squares, depending on the zone number modulo 3:
+mgrs_col_letters = {1: "ABCDEFGH", 2: "JKLMNPQR", 0: "STUVWXYZ"}
+mgrs_row_letters = "ABCDEFGHJKLMNPQRSTUV"
+# Minimum northing of each latitude band, the southern ones including the false northing:
+mgrs_band_min_northing = {"C": 1100000, "D": 2000000, "E": 2800000, "F": 3700000, "G": 4600000,
+                          "H": 5500000, "J": 6400000, "K": 7300000, "L": 8200000, "M": 9100000,
+                          "N": 0, "P": 800000, "Q": 1700000, "R": 2600000, "S": 3500000,
+                          "T": 4400000, "U": 5300000, "V": 6200000, "W": 7000000, "X": 7900000}
+
+
+def get_s2_tile_origin(tile):
+    """
+    Get the projection and upper left corner of a Sentinel-2 tile.
+    The tiles follow the MGRS 100km squares, enlarged by 4.9km and aligned on the 60m-grid.
+
+    :param tile: The tile ID, e.g. '31TCJ' or 'T31TCJ'
+    :return: The EPSG code as well as the upper left x and y coordinates.
+    :rtype: tuple of int
+    """
+    match = re.match(r"^T?(\d{2})([C-HJ-NP-X])([A-HJ-NP-Z])([A-HJ-NP-V])$", tile.upper())
+    if not match:
+        raise ValueError("Invalid Sentinel-2 tile ID: %s" % tile)
+    zone, band, col, row = int(match.group(1)), match.group(2), match.group(3), match.group(4)
+    if not 1 <= zone <= 60 or col not in mgrs_col_letters[zone % 3]:
+        raise ValueError("Invalid Sentinel-2 tile ID: %s" % tile)
+    easting = (mgrs_col_letters[zone % 3].index(col) + 1) * 100000
+    row_index = mgrs_row_letters.index(row)
+    # The row letters of even zones are shifted by 5:
+    if zone % 2 == 0:
+        row_index = (row_index - 5) % len(mgrs_row_letters)
+    northing = row_index * 100000
+    # The row letters repeat every 2000km:
+    while northing < mgrs_band_min_northing[band]:
+        northing += 2000000
+    epsg = 32600 + zone if band >= "N" else 32700 + zone
+    ulx = int(math.floor(easting / s2_grid_step) * s2_grid_step)
+    uly = int(math.ceil((northing + 100000) / s2_grid_step) * s2_grid_step)
+    return epsg, ulx, uly
+
+
+def get_s2_site(tile, resolution=(10, -10)):
+    """
+    Create the site of a Sentinel-2 tile.
+
+    :param tile: The tile ID, e.g. '31TCJ' or 'T31TCJ'
+    :param resolution: The resolution in x and y
+    :return: The :class:`prepare_mnt.mnt.SiteInfo.Site` of the tile.
+    """
+    epsg, ulx, uly = get_s2_tile_origin(tile)
+    res_x, res_y = resolution
+    return Site(tile.upper().lstrip("T"), epsg,
+                ul=(ulx, uly),
+                lr=(ulx + s2_tile_size, uly - s2_tile_size),
+                px=int(s2_tile_size / abs(res_x)),
+                py=int(s2_tile_size / abs(res_y)),
+                res_x=res_x,
+                res_y=res_y)
+
+
+def read_grid(grid_file):
+    """
+    Read a tiling grid, e.g. of Landsat-8 path/rows or Venus sites, from a csv-file.
+    The file contains a header and one line per tile with the columns::
+        name,epsg,ulx,uly,lrx,lry
+
+    :param grid_file: The path to the csv-file
+    :return: The footprint of each tile given as (epsg, ul, lr), indexed by its name.
+    :rtype: dict
+    """
+    grid = {}
+    with open(grid_file, "r") as f:
+        for line in csv.DictReader(f):
+            grid[line["name"].strip()] = (int(line["epsg"]),
+                                          (float(line["ulx"]), float(line["uly"])),
+                                          (float(line["lrx"]), float(line["lry"])))
+    return grid
+
+
+def get_site(tile, platform, resolution, grid=None):
+    """
+    Create the site of a tile given its ID.
+    Sentinel-2 tiles are derived from their MGRS-ID, all others need to be present in the given grid.
+
+    :param tile: The tile ID, e.g. '31TCJ' for Sentinel-2, '199029' for Landsat-8 or 'KHUMBU' for Venus
+    :param platform: The platform name, e.g. 'sentinel2'
+    :param resolution: The resolution in x and y
+    :param grid: The grid as returned by :func:`read_grid`. Only needed for platforms other than Sentinel-2.
+    :return: The :class:`prepare_mnt.mnt.SiteInfo.Site` of the tile.
+    """
+    if platform == "sentinel2":
+        return get_s2_site(tile, resolution)
+    if not grid or tile not in grid:
+        raise ValueError("Cannot find tile %s in the %s grid" % (tile, platform))
+    epsg, ul, lr = grid[tile]
+    res_x, res_y = resolution
+    return Site(tile, epsg,
+                ul=ul,
+                lr=lr,
+                px=int(round(abs(lr[0] - ul[0]) / abs(res_x))),
+                py=int(round(abs(ul[1] - lr[1]) / abs(res_y))),
+                res_x=res_x,
+                res_y=res_y)
+
+
+if __name__ == "__main__":
+    pass
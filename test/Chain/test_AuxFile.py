@@ -106,6 +106,27 @@ class TestAuxFile(unittest.TestCase):
         dbl = FileSystem.find("DBL.DIR", self.cams_dir)[0]
         self.assertIsNone(DTMFile(dbl))
 
+    def test_cams_from_directory(self):
+        from Common import FileSystem
+        # A CAMS folder without HDR is discarded:
+        orphan = os.path.join(self.cams_dir, "S2__TEST_EXO_CAMS_20180101T000000_20180102T000000.DBL.DIR")
+        os.makedirs(orphan)
+        expected = [CAMSFile(dbl) for dbl in FileSystem.find(CAMSFile.regex, self.cams_dir)
+                    if dbl != orphan]
+        cams = CAMSFile.from_directory(self.cams_dir)
+        self.assertEqual(len(cams), self.n_cams)
+        self.assertEqual([(c.dbl, c.hdr) for c in cams], [(c.dbl, c.hdr) for c in expected if c is not None])
+        self.assertEqual([(c.dbl, c.hdr) for c in CAMSFile.from_directory(self.cams_dir, depth=1)],
+                         [(c.dbl, c.hdr) for c in cams])
+        self.assertEqual(CAMSFile.from_directory(os.path.join(self.cams_dir, "not_existing")), [])
+        self.assertEqual(DTMFile.from_directory(self.cams_dir), [])
+        os.rmdir(orphan)
+
+    def test_mnt_from_directory(self):
+        regex = DTMFile.get_specifiable_regex() + r"T31TCH_\d{4}.DBL(.DIR)?$"
+        mnts = DTMFile.from_directory(self.root, regex=regex, depth=1)
+        self.assertEqual([(m.dbl, m.hdr) for m in mnts], [(m.dbl, m.hdr) for m in self.mnt[:1]])
+
 
 if __name__ == '__main__':
     unittest.main()
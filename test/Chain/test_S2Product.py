@@ -167,6 +167,11 @@ class TestS2Product(unittest.TestCase):
             p = MajaProduct.factory(prod)
             self.assertNotIsInstance(p, Sentinel2SSC)
 
+    def test_get_mnt_resolutions(self):
+        for product_class in [Sentinel2Natif, Sentinel2Muscate, Sentinel2SSC]:
+            self.assertEqual(product_class.get_mnt_resolutions((10, -10)), [{"name": "R1", "val": "10 -10"},
+                                                                           {"name": "R2", "val": "20 -20"}])
+
     def test_reg_s2_prd(self):
         tiles = [None]
         dates = ["20161109T171237"]
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2016-2020 Centre National d'Etudes Spatiales (CNES), CSSI, CESBIO  All Rights Reserved
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# -*- coding: utf-8 -*-
+import os
+import time
+import unittest
+import tempfile
+import numpy as np
+from Chain.Product import MajaProduct
+from Chain import SyntheticBands
+from Common import ImageIO, FileSystem
+
+
+class TestSyntheticBands(unittest.TestCase):
+
+    projection = 'PROJCS["WGS 84 / UTM zone 31N",GEOGCS["WGS 84",DATUM["WGS_1984",' \
+                 'SPHEROID["WGS 84",6378137,298.257223563]],PRIMEM["Greenwich",0],' \
+                 'UNIT["degree",0.0174532925199433]],PROJECTION["Transverse_Mercator"],' \
+                 'PARAMETER["latitude_of_origin",0],PARAMETER["central_meridian",3],' \
+                 'PARAMETER["scale_factor",0.9996],PARAMETER["false_easting",500000],' \
+                 'PARAMETER["false_northing",0],UNIT["metre",1],AUTHORITY["EPSG","32631"]]'
+    geotransform = (300000.0, 30, 0, 4900020.0, 0, -30)
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="synthetic_bands_")
+        self.products = []
+        for date in ["20170527", "20170612"]:
+            name = "LC08_L1TP_199029_%s_20170615_01_T1" % date
+            path = os.path.join(self.root, name)
+            FileSystem.create_directory(path)
+            for band, value in [("B3", 100), ("B4", 200), ("B5", 600)]:
+                img = np.full((20, 30), value, dtype=np.uint16)
+                ImageIO.write_geotiff(img, os.path.join(path, "%s_%s.TIF" % (name, band)),
+                                      self.projection, self.geotransform)
+            self.products.append(MajaProduct.factory(path))
+        # No bands at all:
+        path = os.path.join(self.root, "LC08_L1TP_199029_20170628_20170715_01_T1")
+        FileSystem.create_directory(path)
+        self.products.append(MajaProduct.factory(path))
+
+    def tearDown(self):
+        FileSystem.remove_directory(self.root)
+
+    def test_create_synthetic_bands_batch(self):
+        results, failed = SyntheticBands.create_synthetic_bands_batch(self.products, ["ndvi", "mca_sim"],
+                                                                      nprocs=2, n_threads=1)
+        self.assertEqual(failed, [self.products[-1]])
+        self.assertEqual(sorted(results.keys()), sorted(p.fpath for p in self.products[:2]))
+        for outputs, duration in results.values():
+            self.assertEqual(len(outputs), 2)
+            self.assertTrue(all(os.path.exists(o) for o in outputs))
+            self.assertGreaterEqual(duration, 0)
+        ndvi, mca_sim = results[self.products[0].fpath][0]
+        # (red - nir) / (red + nir) == -0.5 scaled from (-1, 1) to (0, 10000):
+        np.testing.assert_equal(ImageIO.tiff_to_array(ndvi), 2500)
+        np.testing.assert_almost_equal(ImageIO.tiff_to_array(mca_sim), 150)
+        # Up to date outputs are skipped:
+        mtime = os.path.getmtime(ndvi)
+        time.sleep(1)
+        SyntheticBands.create_synthetic_bands_batch(self.products[:1], ["ndvi"])
+        self.assertEqual(os.path.getmtime(ndvi), mtime)
+
+
+if __name__ == '__main__':
+    unittest.main()
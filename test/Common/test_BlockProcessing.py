@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2016-2020 Centre National d'Etudes Spatiales (CNES), CSSI, CESBIO  All Rights Reserved
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# -*- coding: utf-8 -*-
+import os
+import unittest
+import numpy as np
+from Common import BlockProcessing, FileSystem
+from Common.GDalDatasetWrapper import GDalDatasetWrapper
+
+
+class TestBlockProcessing(unittest.TestCase):
+
+    def setUp(self):
+        self.coordinates = (652594.9112913811, 10.00887639510383, 0,
+                            5072876.717295351, 0, -9.974893672262251)
+        self.projection = 'PROJCS["WGS 84 / UTM zone 31N",GEOGCS["WGS 84",DATUM["WGS_1984",' \
+                          'SPHEROID["WGS 84",6378137,298.257223563]],PRIMEM["Greenwich",0],' \
+                          'UNIT["degree",0.0174532925199433]],PROJECTION["Transverse_Mercator"],' \
+                          'PARAMETER["latitude_of_origin",0],PARAMETER["central_meridian",3],' \
+                          'PARAMETER["scale_factor",0.9996],PARAMETER["false_easting",500000],' \
+                          'PARAMETER["false_northing",0],UNIT["metre",1],AUTHORITY["EPSG","32631"]]'
+
+    def test_get_block_windows(self):
+        windows = BlockProcessing.get_block_windows(5, 3, 2, 2)
+        self.assertEqual(windows, [(0, 0, 2, 2), (2, 0, 2, 2), (4, 0, 1, 2),
+                                   (0, 2, 2, 1), (2, 2, 2, 1), (4, 2, 1, 1)])
+
+    def test_get_block_size(self):
+        self.assertEqual(BlockProcessing.get_tile_size(), (512, 512))
+        self.assertEqual(BlockProcessing.get_tile_size(["TILED=YES", "BLOCKXSIZE=256", "BLOCKYSIZE=128"]), (256, 128))
+        ds = GDalDatasetWrapper(array=np.ones((1300, 1000), dtype=np.uint8),
+                                projection=self.projection, geotransform=self.coordinates)
+        # Blocks cover the output tiles, a single one being written by each block:
+        self.assertEqual(BlockProcessing.get_block_size(ds), (1000, 512))
+        self.assertEqual(BlockProcessing.get_block_size(ds, (256, 128)), (1000, 128))
+
+    def test_process_blocks_multiple_outputs(self):
+        img_a = np.arange(0, 35 * 23, dtype=np.int16).reshape(35, 23)
+        img_b = np.ones((35, 23), dtype=np.int16) * 3
+        ds_a = GDalDatasetWrapper(array=img_a, projection=self.projection, geotransform=self.coordinates)
+        ds_b = GDalDatasetWrapper(array=img_b, projection=self.projection, geotransform=self.coordinates)
+        calls = []
+        ds_sum, ds_ratio = BlockProcessing.process_blocks(lambda a, b: (a + b, a / b), ds_a, ds_b,
+                                                          dtypes=[np.int16, np.float32],
+                                                          block_size=(10, 7), n_threads=3, max_pending=2,
+                                                          progress=lambda done, total: calls.append((done, total)))
+        np.testing.assert_equal(ds_sum.array, img_a + img_b)
+        np.testing.assert_almost_equal(ds_ratio.array, img_a / 3., decimal=4)
+        self.assertEqual(ds_sum.array.dtype, np.int16)
+        self.assertEqual(ds_ratio.array.dtype, np.float32)
+        self.assertEqual(ds_sum.geotransform, self.coordinates)
+        self.assertEqual(ds_sum.epsg, 32631)
+        self.assertEqual(calls, [(i, 15) for i in range(1, 16)])
+
+    def test_process_blocks_different_sizes(self):
+        ds_a = GDalDatasetWrapper(array=np.ones((3, 3)), projection=self.projection, geotransform=self.coordinates)
+        ds_b = GDalDatasetWrapper(array=np.ones((3, 4)), projection=self.projection, geotransform=self.coordinates)
+        with self.assertRaises(ValueError):
+            BlockProcessing.process_blocks(lambda a, b: a + b, ds_a, ds_b)
+
+    def test_process_blocks_to_file(self):
+        img = np.arange(0, 300 * 200, dtype=np.float32).reshape(300, 200)
+        ds_in = GDalDatasetWrapper(array=img, projection=self.projection, geotransform=self.coordinates)
+        path = os.path.join(os.getcwd(), "test_process_blocks_to_file.tif")
+        ds_out = BlockProcessing.process_blocks(lambda a: a * 2, ds_in, dtypes=[np.float32], dst=[path],
+                                                nodata=-1, options=["COMPRESS=DEFLATE"])[0]
+        self.assertTrue(os.path.exists(path))
+        np.testing.assert_almost_equal(ds_out.array, img * 2)
+        self.assertEqual(ds_out.nodata_value, -1)
+        self.assertEqual(ds_out.geotransform, self.coordinates)
+        FileSystem.remove_file(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -161,6 +161,59 @@ class TestFileSystem(unittest.TestCase):
         calculated = FileSystem.find(path=self.root, pattern=expected)
         self.assertEqual(expected, p.basename(calculated[0]))
 
+    def test_find_depth_ftype(self):
+        self.assertEqual(len(FileSystem.find(path=self.root, pattern="c.xml")), 7)
+        self.assertEqual(FileSystem.find(path=self.root, pattern="c.xml", depth=1), [p.join(self.root, "c.xml")])
+        self.assertEqual(len(FileSystem.find(path=self.root, pattern="c.xml", depth=2)), 3)
+        self.assertEqual(len(FileSystem.find(path=self.root, pattern="subdir", ftype="folder")), 6)
+        self.assertEqual(len(FileSystem.find(path=self.root, pattern="subdir", ftype="folder", depth=1)), 2)
+        with self.assertRaises(ValueError):
+            FileSystem.find(path=self.root, pattern="subdir", ftype="file")
+        with self.assertRaises(ValueError):
+            FileSystem.find(path=self.root, pattern="A.JPG", case_sensitive=True)
+        with self.assertRaises(ValueError):
+            FileSystem.find(path=self.root, pattern="a.jpg", ftype="link")
+
+    def test_find_cache(self):
+        FileSystem.clear_find_cache()
+        self.assertEqual(len(FileSystem.find(path=self.root, pattern="b.jpg", depth=1, cache_ttl=60)), 1)
+        TestFunctions.touch(p.join(self.root, "b2.jpg"))
+        # The listing of the root directory is reused until it expires:
+        self.assertEqual(len(FileSystem.find(path=self.root, pattern="^b", depth=1, cache_ttl=60)), 1)
+        self.assertEqual(len(FileSystem.find(path=self.root, pattern="^b", depth=1)), 2)
+        FileSystem.clear_find_cache()
+        self.assertEqual(len(FileSystem.find(path=self.root, pattern="^b", depth=1, cache_ttl=60)), 2)
+        FileSystem.clear_find_cache()
+
+    def test_find_cache_bounded(self):
+        FileSystem.clear_find_cache()
+        cache_size = FileSystem.listing_cache_size
+        FileSystem.listing_cache_size = 2
+        root = os.path.abspath(self.root)
+        try:
+            # Only the most recent listings are kept, i.e. not the one of the root:
+            FileSystem.find(path=self.root, pattern="b.jpg", cache_ttl=60)
+            self.assertEqual(len(FileSystem._listing_cache), 2)
+            self.assertNotIn(root, FileSystem._listing_cache)
+            # The expired listings are evicted when adding a new one:
+            FileSystem.clear_find_cache()
+            FileSystem._listing_cache["expired"] = (0, ([], [], []))
+            FileSystem.find(path=self.root, pattern="b.jpg", depth=1, cache_ttl=60)
+            self.assertEqual(list(FileSystem._listing_cache.keys()), [root])
+        finally:
+            FileSystem.listing_cache_size = cache_size
+            FileSystem.clear_find_cache()
+
+    def test_walk(self):
+        expected = [(root, sorted(files), sorted(dirs)) for root, dirs, files in os.walk(self.root)]
+        walked = [(root, sorted(files), sorted(dirs)) for root, files, dirs, _ in FileSystem.walk(self.root)]
+        self.assertEqual(sorted(walked), sorted(expected))
+        # Prune all sub-directories:
+        for root, files, dirs, walk_dirs in FileSystem.walk(self.root):
+            self.assertEqual(root, self.root)
+            walk_dirs[:] = []
+        self.assertEqual([root for root, _, _, _ in FileSystem.walk(self.root, depth=1)], [self.root])
+
     def test_make_symlink_file(self):
         origin = os.path.join(self.root, self.file_a1)
         destination = os.path.join(self.root, "symlink1")
@@ -78,6 +78,59 @@ class TestGdalDatasetWrapper(unittest.TestCase):
         # Compare projections by removing all spaces cause of multiline string
         self.assertEqual(ds.projection.replace(" ", ""), self.projection.replace(" ", ""))
 
+    def test_set_array(self):
+        img = np.ones((self.height, self.width), np.int16)
+        ds = GDalDatasetWrapper(array=img, projection=self.projection, geotransform=self.coordinates)
+        img_new = np.arange(50 * 30 * 2, dtype=np.int16).reshape((50, 30, 2))
+        ds.array = img_new
+        self.assertEqual(ds.size, (30, 50))
+        self.assertEqual(ds.ul_lr, (300000.0, 4900020.0, 300300.0, 4899520.0))
+        self.assertEqual(ds.extent, (300000.0, 4899520.0, 300300.0, 4900020.0))
+        np.testing.assert_array_equal(ds.read_window(10, 20, 5, 3), img_new[20:23, 10:15])
+
+    def test_lazy(self):
+        img = np.arange(self.height * self.width * 2, dtype=np.int16).reshape((2, self.height, self.width))
+        path = os.path.join(os.getcwd(), "test_lazy.tif")
+        ImageIO.write_geotiff(np.moveaxis(img, 0, -1), path, self.projection, self.coordinates, nodata=42)
+        ds = GDalDatasetWrapper.from_file(path, lazy=True)
+        self.assertFalse(ds.is_loaded)
+        self.assertEqual(ds.epsg, 32631)
+        self.assertEqual(ds.nodata_value, 42)
+        self.assertEqual(ds.utm_description, "WGS 84 / UTM zone 31N")
+        self.assertEqual(ds.ul_lr, (300000.0, 4900020.0, 301000.0, 4898020.0))
+        np.testing.assert_array_equal(ds.read_window(10, 20, 5, 3), img[:, 20:23, 10:15])
+        self.assertFalse(ds.is_loaded)
+        np.testing.assert_array_equal(ds.array, img)
+        self.assertTrue(ds.is_loaded)
+        np.testing.assert_array_equal(ds.read_window(10, 20, 5, 3), img[:, 20:23, 10:15])
+        np.testing.assert_array_equal(ds.nodata_mask, img != 42)
+        # Bands last:
+        ds_last = GDalDatasetWrapper.from_file(path, lazy=True, bands_last=True)
+        np.testing.assert_array_equal(ds_last.read_window(10, 20, 5, 3), np.moveaxis(img[:, 20:23, 10:15], 0, -1))
+        np.testing.assert_array_equal(ds_last.array, np.moveaxis(img, 0, -1))
+        # Results of the gdal wrappers are lazy:
+        ds_translated = ImageTools.gdal_translate(path)
+        self.assertFalse(ds_translated.is_loaded)
+        np.testing.assert_array_equal(ds_translated.array, np.moveaxis(img, 0, -1))
+        FileSystem.remove_file(path)
+        self.assertFalse(os.path.exists(path))
+
+    def test_get_ds_without_copy(self):
+        img = np.arange(self.height * self.width * 2, dtype=np.int16).reshape((self.height, self.width, 2))
+        ds = GDalDatasetWrapper(array=img, projection=self.projection, geotransform=self.coordinates,
+                                nodata_value=42)
+        gdal_ds = ds.get_ds()
+        self.assertEqual(gdal_ds.GetGeoTransform(), self.coordinates)
+        self.assertEqual(gdal_ds.GetRasterBand(2).GetNoDataValue(), 42)
+        np.testing.assert_array_equal(gdal_ds.ReadAsArray(), np.moveaxis(img, -1, 0))
+        # The dataset points to the array:
+        img[0, 0, 1] = 1234
+        self.assertEqual(gdal_ds.GetRasterBand(2).ReadAsArray(0, 0, 1, 1)[0, 0], 1234)
+        # Chained operations work on the shared buffer:
+        translated = ImageTools.gdal_translate(ds)
+        np.testing.assert_array_equal(translated.array, img)
+        self.assertEqual(translated.epsg, 32631)
+
     def test_write_nodata(self):
         fname = "./test_write_nodata.tif"
         img = np.ones((self.height, self.width), np.int16)
@@ -18,9 +18,10 @@ limitations under the License.
 """
 # -*- coding: utf-8 -*-
 
+import os
 import unittest
 from Common.GDalDatasetWrapper import GDalDatasetWrapper
-from Common import ImageApps
+from Common import ImageApps, ImageTools
 import numpy as np
 
 
@@ -77,8 +78,9 @@ class TestImageTools(unittest.TestCase):
         ds_swir = GDalDatasetWrapper(array=swir, projection=self.projection, geotransform=self.coordinates)
         ds_red = GDalDatasetWrapper(array=red, projection=self.projection, geotransform=self.coordinates)
 
+        # The index of -0.6 is scaled in float32, giving 200 (See ImageTools.normalize_to_dtype):
         expected = np.array([[1000, 500, 333],
-                            [250, 199, 166],
+                            [250, 200, 166],
                             [142, 125, 0]], dtype=np.int16)
 
         calculated = ImageApps.get_ndsi(ds_red, ds_swir, vrange=(0, 1000), dtype=np.int16)
@@ -116,8 +118,9 @@ class TestImageTools(unittest.TestCase):
         nir[-1, -1] = 0
         red[-1, -1] = 0
 
+        # The index of -0.6 is scaled in float32, giving 200 (See ImageTools.normalize_to_dtype):
         expected = np.array([[1000, 500, 333],
-                            [250, 199, 166],
+                            [250, 200, 166],
                             [142, 125, 0]], dtype=np.int16)
 
         calculated = ImageApps.get_ndvi(ds_red, ds_nir, vrange=(0, 1000), dtype=np.int16)
@@ -127,6 +130,44 @@ class TestImageTools(unittest.TestCase):
         self.assertEqual(calculated.extent, ds_red.extent)
         self.assertEqual(calculated.extent, ds_nir.extent)
 
+    def test_get_ndsi_streamed(self):
+        from Common import ImageIO, FileSystem
+        rng = np.random.RandomState(42)
+        swir = rng.randint(1, 10000, (60, 40)).astype(np.int16)
+        green = rng.randint(1, 10000, (120, 80)).astype(np.int16)
+        path = os.path.join(os.getcwd(), "test_get_ndsi_streamed_green.tif")
+        coordinates_green = (self.coordinates[0], 10, 0, self.coordinates[3], 0, -10)
+        coordinates_swir = (self.coordinates[0], 20, 0, self.coordinates[3], 0, -20)
+        ImageIO.write_geotiff(green, path, self.projection, coordinates_green)
+        ds_green = GDalDatasetWrapper.from_file(path, lazy=True)
+        ds_swir = GDalDatasetWrapper(array=swir, projection=self.projection, geotransform=coordinates_swir)
+        calculated = ImageApps.get_ndsi(ds_green, ds_swir, block_size=(40, 16))
+        # The green band is only read block by block:
+        self.assertFalse(ds_green.is_loaded)
+        ds_green_20 = GDalDatasetWrapper(array=ImageTools.downsample(green, (2, 2)), projection=self.projection,
+                                         geotransform=coordinates_swir)
+        expected = ImageApps.get_ndsi(ds_green_20, ds_swir)
+        np.testing.assert_almost_equal(calculated.array, expected.array, decimal=5)
+        ds_green = None
+        FileSystem.remove_file(path)
+
+    def test_get_synthetic_bands(self):
+        red = np.array(np.arange(0, 12).reshape(3, 4), dtype=np.int16)
+        nir = np.array(np.arange(12, 0, -1).reshape(3, 4), dtype=np.int16)
+        green = np.full((3, 4), 5, dtype=np.int16)
+        bands = {name: GDalDatasetWrapper(array=img, projection=self.projection, geotransform=self.coordinates)
+                 for name, img in [("red", red), ("nir", nir), ("green", green)]}
+        calculated = ImageApps.get_synthetic_bands(bands, ["ndvi", "MCA_SIM"], vrange=(0, 1000), dtype=np.int16)
+        self.assertEqual(sorted(calculated.keys()), ["mca_sim", "ndvi"])
+        ndvi = ImageApps.get_ndvi(bands["red"], bands["nir"], vrange=(0, 1000), dtype=np.int16)
+        np.testing.assert_equal(calculated["ndvi"].array, ndvi.array)
+        self.assertEqual(calculated["ndvi"].array.dtype, np.int16)
+        np.testing.assert_almost_equal(calculated["mca_sim"].array, (red + green) / 2.)
+        self.assertEqual(calculated["mca_sim"].array.dtype, np.float32)
+        self.assertEqual(calculated["mca_sim"].extent, bands["red"].extent)
+        with self.assertRaises(ValueError):
+            ImageApps.get_synthetic_bands(bands, ["ndsi"])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -83,6 +83,20 @@ class TestImageIO(unittest.TestCase):
         FileSystem.remove_file(path)
         self.assertFalse(os.path.exists(path))
 
+    def test_get_raster_info(self):
+        img = np.ones((self.height, self.width, 3), np.int16)
+        nodata = 42
+        path = os.path.join(os.getcwd(), "test_get_raster_info.tif")
+        ImageIO.write_geotiff(img, path, self.projection, self.coordinates, nodata=nodata)
+        info = ImageIO.get_raster_info(path)
+        self.assertEqual((info.nx, info.ny, info.n_bands), (self.width, self.height, 3))
+        self.assertEqual(info.geotransform, self.coordinates)
+        self.assertEqual(info.projection.replace(" ", ""), self.projection.replace(" ", ""))
+        self.assertEqual(info.epsg, 32631)
+        self.assertEqual(info.nodata, nodata)
+        FileSystem.remove_file(path)
+        self.assertFalse(os.path.exists(path))
+
     def test_write_read_memory(self):
         img = np.ones((self.height, self.width), np.int16)
         path = "/vsimem/test_write_read_memory.tif"
@@ -96,6 +110,77 @@ class TestImageIO(unittest.TestCase):
         ds = None  # Always remember to dereference :)
         FileSystem.remove_file(path)
 
+    def test_write_read_multiband(self):
+        img = np.arange(self.height * self.width * 3, dtype=np.int16).reshape((self.height, self.width, 3))
+        path = os.path.join(os.getcwd(), "test_write_read_multiband.tif")
+        # Non-contiguous input, e.g. a band subset:
+        ImageIO.write_geotiff(img[:, :, ::-1], path, self.projection, self.coordinates,
+                              options=ImageIO.get_creation_options(img.dtype))
+        arr, ds = ImageIO.tiff_to_array(path, array_only=False)
+        np.testing.assert_array_equal(arr, img[:, :, ::-1])
+        info = gdal.Info(ds, format="json")
+        self.assertEqual(info["metadata"]["IMAGE_STRUCTURE"]["COMPRESSION"], "DEFLATE")
+        self.assertEqual(info["bands"][0]["block"], [512, 512])
+        ds = None
+        FileSystem.remove_file(path)
+
+    def test_tiff_to_array_mmap(self):
+        img = np.arange(self.height * self.width * 3, dtype=np.int16).reshape((self.height, self.width, 3))
+        path = os.path.join(os.getcwd(), "test_tiff_to_array_mmap.tif")
+        for options in [[], ["INTERLEAVE=BAND"]]:
+            ImageIO.write_geotiff(img, path, self.projection, self.coordinates, options=options)
+            arr = ImageIO.tiff_to_array(path, mmap=True)
+            self.assertIsInstance(arr, np.memmap)
+            self.assertFalse(arr.flags.writeable)
+            np.testing.assert_array_equal(arr, img)
+            np.testing.assert_array_equal(ImageIO.tiff_to_array(path, mmap=True, bands_last=False),
+                                          np.moveaxis(img, -1, 0))
+            np.testing.assert_array_equal(ImageIO.tiff_to_array(path, 2, 3, mmap=True), img[3:, 2:])
+            arr = None
+        # Compressed and tiled files are read as usual:
+        for options in [["COMPRESS=DEFLATE"], ["TILED=YES"]]:
+            ImageIO.write_geotiff(img[:, :, 0], path, self.projection, self.coordinates, options=options)
+            arr = ImageIO.tiff_to_array(path, mmap=True)
+            self.assertNotIsInstance(arr, np.memmap)
+            np.testing.assert_array_equal(arr, img[:, :, 0])
+        FileSystem.remove_file(path)
+
+    def test_get_creation_options(self):
+        self.assertEqual(ImageIO.get_creation_options(np.int16),
+                         ["BIGTIFF=IF_SAFER", "TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512",
+                          "COMPRESS=DEFLATE", "NUM_THREADS=ALL_CPUS", "PREDICTOR=2"])
+        self.assertIn("PREDICTOR=3", ImageIO.get_creation_options(np.float32, compress="ZSTD"))
+        self.assertIn("COMPRESS=ZSTD", ImageIO.get_creation_options(np.float32, compress="ZSTD"))
+        self.assertNotIn("PREDICTOR=2", ImageIO.get_creation_options(np.uint8))
+        self.assertEqual(ImageIO.get_creation_options(np.uint16, compress=None, tiled=False), ["BIGTIFF=IF_SAFER"])
+
+    def test_merge_creation_options(self):
+        options = ImageIO.get_creation_options(np.int16)
+        merged = ImageIO.merge_creation_options(options, ["compress=LZW", "SPARSE_OK=TRUE"])
+        self.assertEqual(len(merged), len(options) + 1)
+        self.assertIn("compress=LZW", merged)
+        self.assertNotIn("COMPRESS=DEFLATE", merged)
+        self.assertEqual(merged[-1], "SPARSE_OK=TRUE")
+        self.assertEqual(ImageIO.merge_creation_options(options, None), options)
+
+    def test_write_cog(self):
+        img = np.arange(1200 * 1100, dtype=np.int16).reshape((1200, 1100))
+        path = os.path.join(os.getcwd(), "test_write_cog.tif")
+        self.assertEqual(ImageIO.write_cog(img, path, self.projection, self.coordinates, nodata=42), 0)
+        arr, ds = ImageIO.tiff_to_array(path, array_only=False)
+        np.testing.assert_array_equal(arr, img)
+        band = ds.GetRasterBand(1)
+        self.assertGreaterEqual(band.GetOverviewCount(), 1)
+        self.assertEqual(band.GetNoDataValue(), 42)
+        self.assertEqual(gdal.Info(ds, format="json")["metadata"]["IMAGE_STRUCTURE"]["COMPRESSION"], "DEFLATE")
+        band, ds = None, None
+        # The given creation options override the default ones:
+        self.assertEqual(ImageIO.write_cog(img, path, self.projection, self.coordinates, options=["COMPRESS=LZW"]), 0)
+        ds = gdal.Open(path)
+        self.assertEqual(gdal.Info(ds, format="json")["metadata"]["IMAGE_STRUCTURE"]["COMPRESSION"], "LZW")
+        ds = None
+        FileSystem.remove_file(path)
+
     def test_faulty_geotransform_projection(self):
         coordinates = (652594.9112913811, 10.00887639510383, 0,
                        5072876.717295351, 0)  # Missing one value
@@ -116,6 +201,19 @@ class TestImageIO(unittest.TestCase):
         lon_lat_calc = ImageIO.transform_point(center, old_epsg=32631, new_epsg=4326)
         np.testing.assert_almost_equal(lon_lat_calc, lon_lat_expected)
 
+    def test_transform_points(self):
+        points = [(653095.355, 5071879.228), (600000, 5000000), (699960, 5090220)]
+        expected = [ImageIO.transform_point(pt, old_epsg=32631, new_epsg=4326) for pt in points]
+        lon_lat_calc = ImageIO.transform_points(points, old_epsg=32631, new_epsg=4326)
+        self.assertEqual(lon_lat_calc.shape, (3, 2))
+        np.testing.assert_almost_equal(lon_lat_calc, expected)
+        np.testing.assert_almost_equal(lon_lat_calc[0], (4.9694934619557145, 45.78349724618419))
+        self.assertEqual(ImageIO.transform_points([], old_epsg=32631).shape, (0, 2))
+
+    def test_get_transformation_cached(self):
+        self.assertIs(ImageIO.get_transformation(32631, 4326), ImageIO.get_transformation("32631", 4326))
+        self.assertIsNot(ImageIO.get_transformation(32631, 4326), ImageIO.get_transformation(4326, 32631))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -20,8 +20,10 @@ limitations under the License.
 
 import unittest
 import os
+import gc
 from Common import ImageTools, ImageIO, FileSystem
 from Common.GDalDatasetWrapper import GDalDatasetWrapper
+from Common.GDal import vsimem, retile
 import numpy as np
 
 
@@ -84,6 +86,50 @@ class TestImageTools(unittest.TestCase):
         calculated = ImageTools.extract_class(mask, class_to_extract, value_type)
         np.testing.assert_array_almost_equal(expected, calculated)
 
+    def test_extract_values_bits_lut(self):
+        for dtype in [np.uint8, np.uint16, np.int16]:
+            mask = np.array(np.random.randint(0, 256, (50, 40)), dtype=dtype)
+            values, bits = [0, 3, 17, 255], [0, 5, 7]
+            expected_values = np.bitwise_or.reduce([mask == val for val in values])
+            expected_bits = np.bitwise_or.reduce([np.bitwise_and(mask, 2 ** bit) > 0 for bit in bits])
+            np.testing.assert_equal(ImageTools.extract_values(mask, values), expected_values)
+            np.testing.assert_equal(ImageTools.extract_bits(mask, bits), expected_bits)
+            self.assertEqual(ImageTools.extract_values(mask, values).dtype, bool)
+
+    def test_extract_classes(self):
+        mask = np.array(np.arange(0, 9).reshape(3, 3), dtype=np.uint8)
+        classes = [[7, 8, 11], [0], [2, 4]]
+        calculated = ImageTools.extract_classes(mask, classes, "value")
+        self.assertEqual(len(calculated), 3)
+        for items, calc in zip(classes, calculated):
+            np.testing.assert_equal(calc, ImageTools.extract_class(mask, items, "value"))
+        calculated = ImageTools.extract_classes(mask, [[3], [0, 1]], "Bit")
+        np.testing.assert_equal(calculated[0], mask >= 8)
+        np.testing.assert_equal(calculated[1], np.bitwise_and(mask, 3) > 0)
+        many = [[i] for i in range(20)]
+        for i, calc in enumerate(ImageTools.extract_classes(mask, many, "value")):
+            np.testing.assert_equal(calc, mask == i)
+
+    def test_extract_class_blocks(self):
+        mask = np.array(np.random.randint(0, 256, (37, 23)), dtype=np.uint8)
+        ds_mask = GDalDatasetWrapper(array=mask, projection=self.projection, geotransform=self.coordinates)
+        for class_to_extract, value_type in [([3, 17, 255], "value"), ([0, 5], "bit"), (100, "threshold")]:
+            calculated = ImageTools.extract_class(ds_mask, class_to_extract, value_type,
+                                                  block_size=(10, 7), n_threads=3)
+            self.assertEqual(calculated.array.dtype, np.uint8)
+            self.assertEqual(calculated.geotransform, self.coordinates)
+            np.testing.assert_equal(calculated.array, ImageTools.extract_class(mask, class_to_extract, value_type))
+
+    def test_normalize_blocks(self):
+        img = np.array(np.random.randint(-12000, 12000, (37, 23)), dtype=np.int16)
+        ds_img = GDalDatasetWrapper(array=img, projection=self.projection, geotransform=self.coordinates)
+        calculated = ImageTools.normalize(ds_img, value_range_out=(0, 1000), value_range_in=(-10000, 10000),
+                                          clip=True, dtype=np.float32, block_size=(10, 7), n_threads=3)
+        expected = ImageTools.normalize(img, value_range_out=(0, 1000), value_range_in=(-10000, 10000),
+                                        clip=True, dtype=np.float32)
+        self.assertEqual(calculated.array.dtype, np.float32)
+        np.testing.assert_equal(calculated.array, expected)
+
     def test_normalize(self):
         img = np.arange(0, 9).reshape(3, 3)
         value_range_in = (0, 10)
@@ -121,6 +167,90 @@ class TestImageTools(unittest.TestCase):
                                           value_range_out=value_range_out)
         np.testing.assert_array_almost_equal(expected, calculated)
 
+    def test_normalize_to_dtype(self):
+        img = np.array(np.random.randint(-12000, 12000, (37, 23)), dtype=np.int16)
+        expected = ImageTools.normalize(img, value_range_out=(0, 1000), value_range_in=(-10000, 10000), clip=True)
+        calculated = ImageTools.normalize_to_dtype(img, value_range_out=(0, 1000),
+                                                   value_range_in=(-10000, 10000), clip=True)
+        self.assertEqual(calculated.dtype, np.float32)
+        np.testing.assert_allclose(calculated, expected, atol=1e-3)
+        calculated_int = ImageTools.normalize_to_dtype(img, value_range_out=(0, 1000), value_range_in=(-10000, 10000),
+                                                       clip=True, dtype=np.int16)
+        calculated_blocks = ImageTools.normalize_to_dtype(img, value_range_out=(0, 1000),
+                                                          value_range_in=(-10000, 10000),
+                                                          clip=True, dtype=np.int16, block_lines=5)
+        self.assertEqual(calculated_int.dtype, np.int16)
+        np.testing.assert_equal(calculated_int, calculated_blocks)
+        np.testing.assert_allclose(calculated_int, expected, atol=1)
+        # Integer outputs are truncated from a float32 result, normalize truncates a float64 one:
+        index = np.array([-0.6], dtype=np.float32)
+        np.testing.assert_equal(ImageTools.normalize(index, value_range_out=(0, 1000), value_range_in=(-1, 1),
+                                                     dtype=np.int16), [199])
+        np.testing.assert_equal(ImageTools.normalize_to_dtype(index, value_range_out=(0, 1000), value_range_in=(-1, 1),
+                                                              dtype=np.int16), [200])
+        # In-place:
+        img_float = np.array(img, dtype=np.float32)
+        out = ImageTools.normalize_to_dtype(img_float, value_range_out=(0, 1), value_range_in=(-10000, 10000),
+                                            clip=True, out=img_float)
+        self.assertIs(out, img_float)
+        np.testing.assert_allclose(out, expected / 1000., atol=1e-6)
+
+    def test_downsample(self):
+        img = np.array([[1, 2, 5, 5],
+                        [3, 3, 6, 7],
+                        [0, 0, 9, 8],
+                        [0, 4, 8, 9]], dtype=np.int16)
+        np.testing.assert_almost_equal(ImageTools.downsample(img, (2, 2), "mean"), [[2.25, 5.75], [1, 8.5]])
+        self.assertEqual(ImageTools.downsample(img, (2, 2), "mean").dtype, np.float32)
+        np.testing.assert_equal(ImageTools.downsample(img, (2, 2), "mode"), [[3, 5], [0, 8]])
+        np.testing.assert_equal(ImageTools.downsample(img, (2, 2), "nearest"), [[3, 7], [4, 9]])
+        np.testing.assert_almost_equal(ImageTools.downsample(img, (2, 2), "mean", nodata=0),
+                                       [[2.25, 5.75], [4, 8.5]])
+        np.testing.assert_almost_equal(ImageTools.downsample(img, (1, 4), "mean"), [[3.25], [4.75], [4.25], [5.25]])
+        img_bands = np.stack([img, img * 2], axis=-1)
+        self.assertEqual(ImageTools.downsample(img_bands, (2, 2), "mode").shape, (2, 2, 2))
+        with self.assertRaises(ValueError):
+            ImageTools.downsample(img, (3, 3))
+
+    def test_upsample(self):
+        img = np.array([[1, 2], [3, 4]], dtype=np.uint8)
+        expected = np.array([[1, 1, 2, 2],
+                             [1, 1, 2, 2],
+                             [3, 3, 4, 4],
+                             [3, 3, 4, 4]], dtype=np.uint8)
+        np.testing.assert_equal(ImageTools.upsample(img, (2, 2)), expected)
+        np.testing.assert_equal(ImageTools.downsample(expected, (2, 2), "nearest"), img)
+
+    def test_resample_integer_factor(self):
+        img = np.arange(0, 36, dtype=np.int16).reshape(6, 6)
+        coordinates = (300000.0, 10, 0, 4900020.0, 0, -10)
+        ds = GDalDatasetWrapper(array=img, projection=self.projection, geotransform=coordinates)
+        ds_20 = ImageTools.resample(ds, (20, -20))
+        self.assertEqual(ds_20.resolution, (20, -20))
+        self.assertEqual(ds_20.extent, ds.extent)
+        np.testing.assert_almost_equal(ds_20.array, ImageTools.downsample(img, (2, 2)))
+        ds_60 = ImageTools.resample(ds, (60, -60), method="nearest")
+        np.testing.assert_equal(ds_60.array, [[img[3, 3]]])
+        ds_5 = ImageTools.resample(ds, (5, -5))
+        self.assertEqual(ds_5.array.shape, (12, 12))
+        self.assertEqual(ds_5.extent, ds.extent)
+        self.assertIs(ImageTools.resample(ds, (10, -10)), ds)
+
+    def test_resample_lazy(self):
+        img = np.arange(0, 12 * 18, dtype=np.int16).reshape(12, 18)
+        coordinates = (300000.0, 10, 0, 4900020.0, 0, -10)
+        ds = GDalDatasetWrapper(array=img, projection=self.projection, geotransform=coordinates, nodata_value=0)
+        for resolution in [(20, -20), (60, -60), (5, -5), (30, -30)]:
+            expected = ImageTools.resample(ds, resolution)
+            lazy = ImageTools.resample(ds, resolution, lazy=True)
+            self.assertIsInstance(lazy, ImageTools.ResampledDataset)
+            self.assertEqual(lazy.size, expected.size)
+            self.assertEqual(lazy.geotransform, expected.geotransform)
+            width, height = lazy.size
+            # Windows which are not aligned to the factors:
+            for x, y, w, h in [(0, 0, width, height), (1, 1, 2, 3), (width - 3, height - 1, 3, 1)]:
+                np.testing.assert_almost_equal(lazy.read_window(x, y, w, h), expected.array[y:y + h, x:x + w])
+
     def test_gdal_buildvrt(self):
         path = os.path.join(os.getcwd(), "test_gdal_buildvrt.tif")
         vrt = os.path.join(os.getcwd(), "test_vrt.vrt")
@@ -150,6 +280,28 @@ class TestImageTools(unittest.TestCase):
         FileSystem.remove_file(path)
         FileSystem.remove_file(scaled)
 
+    def test_vsimem_released(self):
+        img = np.ones((self.height, self.width), np.int16)
+        path = os.path.join(os.getcwd(), "test_vsimem_released.tif")
+        ImageIO.write_geotiff(img, path, self.projection, self.coordinates)
+        n_files_before, _ = vsimem.log_usage()
+        ds = ImageTools.gdal_translate(path, scale="0 1 0 255")
+        vrt = ImageTools.gdal_buildvrt(ds)
+        self.assertEqual(len(vsimem.get_usage()), n_files_before + 2)
+        del ds
+        gc.collect()
+        # The VRT keeps its in-memory source alive:
+        np.testing.assert_almost_equal(vrt.array, 255)
+        self.assertEqual(len(vsimem.get_usage()), n_files_before + 2)
+        del vrt
+        gc.collect()
+        self.assertEqual(len(vsimem.get_usage()), n_files_before)
+        with vsimem.temporary_path(".tif") as tmp:
+            ImageTools.gdal_translate(path).write(tmp)
+            self.assertIn(tmp, vsimem.get_usage())
+        self.assertNotIn(tmp, vsimem.get_usage())
+        FileSystem.remove_file(path)
+
     def test_gdal_warp(self):
         img = np.ones((self.height, self.width, 2), np.int16)
         img_rescaled = np.ones((int(self.height/2), int(self.width/2), 2), np.int16)
@@ -168,6 +320,26 @@ class TestImageTools(unittest.TestCase):
         FileSystem.remove_file(path)
         FileSystem.remove_file(scaled)
 
+    def test_gdal_lazy_chain(self):
+        img = np.arange(self.height * self.width, dtype=np.int16).reshape((self.height, self.width))
+        path = os.path.join(os.getcwd(), "test_gdal_lazy_chain.tif")
+        out = os.path.join(os.getcwd(), "test_gdal_lazy_chain_out.tif")
+        ImageIO.write_geotiff(img, path, self.projection, self.coordinates)
+        vrt = ImageTools.gdal_buildvrt(path, vrtnodata=-1)
+        translated = ImageTools.gdal_translate(vrt, lazy=True, scale="0 20000 0 10000", ot="Int16")
+        warped = ImageTools.gdal_warp(translated, lazy=True, tr="20 -20", r="near", co="COMPRESS=DEFLATE")
+        self.assertEqual(warped.get_ds().GetDriver().ShortName, "VRT")
+        self.assertFalse(warped.is_loaded)
+        # Materialize the whole chain:
+        ds_out = ImageTools.gdal_translate(warped, out)
+        self.assertTrue(os.path.isfile(out))
+        expected = ImageTools.gdal_warp(ImageTools.gdal_translate(path, scale="0 20000 0 10000", ot="Int16"),
+                                        tr="20 -20", r="near")
+        np.testing.assert_array_equal(ds_out.array, expected.array)
+        np.testing.assert_array_equal(warped.array, expected.array)
+        FileSystem.remove_file(path)
+        FileSystem.remove_file(out)
+
     def test_gdal_buildvrt_concatenate(self):
         from Common import FileSystem
         paths = []
@@ -211,6 +383,8 @@ class TestImageTools(unittest.TestCase):
                                        Overlap=1)
         self.assertTrue(os.path.isdir(tile_folder))
         self.assertEqual(len(tiles), 81)
+        self.assertNotIn(path_parasite, tiles)
+        self.assertTrue(all(os.path.exists(tile) for tile in tiles))
         img_read = np.array(ImageIO.tiff_to_array(tiles[-1]))
         expected = np.array([[88, 89],
                              [98, 99]])
@@ -224,6 +398,34 @@ class TestImageTools(unittest.TestCase):
         FileSystem.remove_file(path)
         FileSystem.remove_directory(tile_folder)
 
+    def test_gdal_retile_options(self):
+        img = np.arange(0., 100.).reshape((10, 10))
+        path = os.path.join(os.getcwd(), "test_gdal_retile_options.tif")
+        tile_folder = os.path.join(os.getcwd(), "tiled_options")
+        ImageIO.write_geotiff(img, path, self.projection, self.coordinates)
+        with self.assertRaises(ValueError):
+            ImageTools.gdal_retile(path, tile_folder, TileWidth=5, TileHeight=5, Levels=2)
+        tiles = ImageTools.gdal_retile(path, tile_folder, TileWidth=5, TileHeight=5,
+                                       UseDirForEachRow=True, TileIndexName="index.shp")
+        self.assertEqual([os.path.relpath(tile, tile_folder) for tile in tiles],
+                         [os.path.join("1", "test_gdal_retile_options_1_1.tif"),
+                          os.path.join("1", "test_gdal_retile_options_1_2.tif"),
+                          os.path.join("2", "test_gdal_retile_options_2_1.tif"),
+                          os.path.join("2", "test_gdal_retile_options_2_2.tif")])
+        self.assertTrue(all(os.path.exists(tile) for tile in tiles))
+        self.assertTrue(os.path.exists(os.path.join(tile_folder, "index.shp")))
+        FileSystem.remove_file(path)
+        FileSystem.remove_directory(tile_folder)
+
+    def test_get_tile_windows(self):
+        windows = retile.get_tile_windows(10, 5, 4, 4, overlap=1)
+        expected = [((1, 1), (0, 0, 4, 4)), ((1, 2), (3, 0, 4, 4)), ((1, 3), (6, 0, 4, 4)),
+                    ((2, 1), (0, 3, 4, 2)), ((2, 2), (3, 3, 4, 2)), ((2, 3), (6, 3, 4, 2))]
+        self.assertEqual(windows, expected)
+        self.assertEqual(retile.get_tile_windows(3, 3, 4, 4), [((1, 1), (0, 0, 3, 3))])
+        with self.assertRaises(ValueError):
+            retile.get_tile_windows(10, 10, 2, 2, overlap=2)
+
     def test_merge_then_translate(self):
         datasets = []
         init = np.zeros((2, 2), np.int16)
@@ -313,6 +515,21 @@ class TestImageTools(unittest.TestCase):
         self.assertEqual(ds_optfile.nodata_value, 0)
         self.assertEqual(ds_optfile.epsg, 32631)
 
+    def test_gdal_merge_nodata_priority(self):
+        path = os.path.join(os.getcwd(), "test_gdal_merge_nodata_priority.tif")
+        ImageIO.write_geotiff(np.zeros((4, 4), np.int16), path, self.projection, self.coordinates)
+        ds_in = GDalDatasetWrapper.from_file(path)
+        first = GDalDatasetWrapper(ds=ds_in.get_ds(), array=np.ones((4, 4), np.int16))
+        img = np.full((4, 4), 2, np.int16)
+        img[:, :2] = -32767
+        second = GDalDatasetWrapper(ds=ds_in.get_ds(), array=img)
+        ds_merged = ImageTools.gdal_merge(first, second, n=-32767, a_nodata=0)
+        FileSystem.remove_file(path)
+        expected = np.array([[1, 1, 2, 2]] * 4, dtype=np.int16)
+        np.testing.assert_equal(expected.dtype, ds_merged.array.dtype)
+        np.testing.assert_almost_equal(ds_merged.array, expected)
+        self.assertEqual(ds_merged.nodata_value, 0)
+
 
 if __name__ == '__main__':
     unittest.main()
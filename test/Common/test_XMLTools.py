@@ -44,6 +44,41 @@ class TestXMLTools(unittest.TestCase):
         self.assertEqual(mission_expected, mission_calculated_2)
         FileSystem.remove_file(file_path)
 
+    def test_get_xpath_text(self):
+        from Common import FileSystem
+        file_path = os.path.join(self.root, "dummy_xml_text.xml")
+        xpath = "./Processing_Flags_And_Modes_List/Processing_Flags_And_Modes/Value"
+        with open(file_path, "w") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<ns:JPI xmlns:ns="http://dummy.org/ns">'
+                    '<ns:Processing_Flags_And_Modes_List>'
+                    '<ns:Processing_Flags_And_Modes><ns:Key>A</ns:Key><ns:Value>L2NOTV</ns:Value>'
+                    '</ns:Processing_Flags_And_Modes>'
+                    '<ns:Processing_Flags_And_Modes><ns:Key>B</ns:Key><ns:Value>L2VALD</ns:Value>'
+                    '</ns:Processing_Flags_And_Modes>'
+                    '</ns:Processing_Flags_And_Modes_List>'
+                    '<ns:Value>Other</ns:Value>'
+                    '</ns:JPI>')
+        expected = [el.text for el in XMLTools.get_xpath(file_path, xpath)]
+        self.assertEqual(expected, ["L2NOTV", "L2VALD"])
+        self.assertEqual(list(XMLTools.get_xpath_text(file_path, xpath)), expected)
+        self.assertEqual(XMLTools.get_xpath_text(file_path, xpath, first=True), ("L2NOTV",))
+        self.assertEqual(XMLTools.get_single_xpath(file_path, xpath), "L2NOTV")
+        self.assertEqual(XMLTools.get_xpath_text(file_path, "./*/*/Key"), ("A", "B"))
+        self.assertEqual(XMLTools.get_xpath_text(file_path, "./Value"), ("Other",))
+        self.assertEqual(XMLTools.get_xpath_text(file_path, "./Missing"), ())
+        # Xpaths other than simple paths of child elements:
+        self.assertEqual(XMLTools.get_xpath_text(file_path, ".//Value"), ("L2NOTV", "L2VALD", "Other"))
+        self.assertEqual(XMLTools.get_xpath_text(file_path, "./*/*[Key='B']/Value"), ("L2VALD",))
+        # A modified file is parsed again:
+        with open(file_path, "w") as f:
+            f.write('<JPI><Value>Modified</Value></JPI>')
+        os.utime(file_path, ns=(0, 0))
+        self.assertEqual(XMLTools.get_xpath_text(file_path, "./Value"), ("Modified",))
+        with self.assertRaises(IndexError):
+            XMLTools.get_single_xpath(file_path, xpath)
+        FileSystem.remove_file(file_path)
+
 
 if __name__ == '__main__':
     unittest.main()
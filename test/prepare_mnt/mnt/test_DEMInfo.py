@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2016-2020 Centre National d'Etudes Spatiales (CNES), CSSI, CESBIO  All Rights Reserved
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import unittest
+import numpy as np
+from prepare_mnt.mnt import SiteInfo
+from prepare_mnt.mnt.DEMInfo import DEMInfo
+from Common import ImageIO, FileSystem
+
+
+class TestDEMInfo(unittest.TestCase):
+
+    projection = 'PROJCS["WGS 84 / UTM zone 31N",GEOGCS["WGS 84",DATUM["WGS_1984",' \
+                 'SPHEROID["WGS 84",6378137,298.257223563]],PRIMEM["Greenwich",0],' \
+                 'UNIT["degree",0.0174532925199433]],PROJECTION["Transverse_Mercator"],' \
+                 'PARAMETER["latitude_of_origin",0],PARAMETER["central_meridian",3],' \
+                 'PARAMETER["scale_factor",0.9996],PARAMETER["false_easting",500000],' \
+                 'PARAMETER["false_northing",0],UNIT["metre",1],AUTHORITY["EPSG","32631"]]'
+
+    def test_dem_info(self):
+        arr = np.array(np.random.randint(-50, 3000, (1100, 1098)), dtype=np.int16)
+        geotransform = (300000.0, 100, 0, 4900020.0, 0, -100)
+        path = os.path.join(os.getcwd(), "test_dem_info.tif")
+        ImageIO.write_geotiff(arr, path, self.projection, geotransform, nodata=0)
+        site = SiteInfo.Site("T31TCJ", 32631,
+                             px=1098, py=1100,
+                             ul=(300000.000, 4900020.000),
+                             lr=(409800.000, 4790020.000),
+                             res_x=100, res_y=-100)
+        info = DEMInfo(site, path)
+        self.assertAlmostEqual(info.mean_alt, np.mean(arr), places=6)
+        self.assertAlmostEqual(info.std_dev_alt, np.std(arr), places=6)
+        self.assertEqual(info.short_description, "WGS 84 / UTM zone 31N")
+        self.assertEqual(info.nodata, 0)
+        self.assertEqual(info.dem_subsampling_ratio, "1")
+        self.assertEqual(info.epsg, "EPSG:32631")
+        FileSystem.remove_file(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
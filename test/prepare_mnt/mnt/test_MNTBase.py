@@ -22,10 +22,44 @@ import os
 import tempfile
 import numpy as np
 from prepare_mnt.mnt import MNTBase, SiteInfo
-from Common import FileSystem
+from Common import FileSystem, ImageIO, ImageTools
 from Common.GDalDatasetWrapper import GDalDatasetWrapper
 
 
+class SyntheticMNT(MNTBase.MNT):
+    """
+    MNT using a synthetic DEM and water mask instead of downloaded data.
+    """
+    projection = 'PROJCS["WGS 84 / UTM zone 31N",GEOGCS["WGS 84",DATUM["WGS_1984",' \
+                 'SPHEROID["WGS 84",6378137,298.257223563]],PRIMEM["Greenwich",0],' \
+                 'UNIT["degree",0.0174532925199433]],PROJECTION["Transverse_Mercator"],' \
+                 'PARAMETER["latitude_of_origin",0],PARAMETER["central_meridian",3],' \
+                 'PARAMETER["scale_factor",0.9996],PARAMETER["false_easting",500000],' \
+                 'PARAMETER["false_northing",0],UNIT["metre",1],AUTHORITY["EPSG","32631"]]'
+
+    @property
+    def geotransform(self):
+        return self.site.ul[0], self.site.res_x, 0, self.site.ul[1], 0, self.site.res_y
+
+    @property
+    def shape(self):
+        return (int(round((self.site.lr[1] - self.site.ul[1]) / self.site.res_y)),
+                int(round((self.site.lr[0] - self.site.ul[0]) / self.site.res_x)))
+
+    def prepare_mnt(self):
+        from scipy import ndimage
+        rng = np.random.RandomState(42)
+        mnt_arr = np.array(ndimage.gaussian_filter(rng.normal(0, 300, self.shape), 2) + 500, dtype=np.int16)
+        path = os.path.join(self.wdir, "synthetic_mnt.tif")
+        ImageIO.write_geotiff(mnt_arr, path, self.projection, self.geotransform)
+        return path
+
+    def prepare_water_data(self):
+        rng = np.random.RandomState(43)
+        water = np.array(rng.uniform(size=self.shape) > .8, dtype=np.uint8)
+        ImageIO.write_geotiff(water, self.gsw_dst, self.projection, self.geotransform)
+
+
 class TestMNTBase(unittest.TestCase):
 
     raw_gsw = os.path.join(tempfile.gettempdir(), "raw_gsw")
@@ -119,6 +153,31 @@ class TestMNTBase(unittest.TestCase):
         np.testing.assert_array_almost_equal(slope, expected_slope)
         np.testing.assert_array_almost_equal(aspect, expected_aspect)
 
+    def test_calculate_gradient_float32(self):
+        raw = np.random.randint(0, 3000, (50, 40)).astype(np.int16)
+        grad_y, grad_x = MNTBase.MNT.calc_gradient(raw, 30, -30)
+        grad_y_32, grad_x_32 = MNTBase.MNT.calc_gradient(raw, 30, -30, dtype=np.float32)
+        self.assertEqual(grad_y_32.dtype, np.float32)
+        self.assertEqual(grad_x_32.dtype, np.float32)
+        np.testing.assert_allclose(grad_y_32, grad_y, rtol=1e-6)
+        np.testing.assert_allclose(grad_x_32, grad_x, rtol=1e-6)
+
+    def test_calculate_slope_aspect_matches_reference(self):
+        np.random.seed(42)
+        for scale in [1e-5, 1e-2, 1, 100]:
+            dz_dc = np.random.normal(0, scale, (300, 200))
+            dz_dl = np.random.normal(0, scale, (300, 200))
+            dz_dc[::7, ::3] = 0
+            dz_dl[::5, ::2] = 0
+            dz_dc[::11, ::4] = -0.
+            with np.errstate(divide="ignore", invalid="ignore"):
+                expected_slope, expected_aspect = MNTBase.MNT.calc_slope_aspect_reference(dz_dc, dz_dl)
+                slope, aspect = MNTBase.MNT.calc_slope_aspect(dz_dc, dz_dl)
+            self.assertEqual(slope.dtype, np.int16)
+            self.assertEqual(aspect.dtype, np.int16)
+            np.testing.assert_array_equal(slope, expected_slope)
+            np.testing.assert_array_equal(aspect, expected_aspect)
+
     def test_resample_to_full_resolution(self):
         res_full = (10, 10)
         res_mnt = (40, -40)
@@ -136,6 +195,93 @@ class TestMNTBase(unittest.TestCase):
                              [2, 2, 2, 2, 3, 3, 3, 3]])
         np.testing.assert_array_almost_equal(resampled, expected)
 
+    def test_get_block_windows(self):
+        windows = list(MNTBase.MNT.get_block_windows((10, 12), (90, 108), block_size=50, halo=2))
+        out_windows = [w[0] for w in windows]
+        self.assertEqual(out_windows, [(0, 50, 0, 50), (0, 50, 50, 100), (0, 50, 100, 108),
+                                       (50, 90, 0, 50), (50, 90, 50, 100), (50, 90, 100, 108)])
+        (r0, r1, c0, c1), (y0, y1, x0, x1), (coords_y, coords_x) = windows[-1]
+        self.assertEqual((y0, y1), (3, 10))
+        self.assertEqual(len(coords_y), r1 - r0)
+        self.assertEqual(len(coords_x), c1 - c0)
+        # All coordinates have to lie within the input window:
+        self.assertTrue(coords_y.min() >= 0 and coords_y.max() <= y1 - y0 - 1)
+        self.assertTrue(coords_x.min() >= 0 and coords_x.max() <= x1 - x0 - 1)
+
+    def test_write_slope_aspect_blockwise(self):
+        res_mnt, res_full = (90, -90), (10, -10)
+        projection = 'PROJCS["WGS 84 / UTM zone 31N",GEOGCS["WGS 84",DATUM["WGS_1984",' \
+                     'SPHEROID["WGS 84",6378137,298.257223563]],PRIMEM["Greenwich",0],' \
+                     'UNIT["degree",0.0174532925199433]],PROJECTION["Transverse_Mercator"],' \
+                     'PARAMETER["latitude_of_origin",0],PARAMETER["central_meridian",3],' \
+                     'PARAMETER["scale_factor",0.9996],PARAMETER["false_easting",500000],' \
+                     'PARAMETER["false_northing",0],UNIT["metre",1],AUTHORITY["EPSG","32631"]]'
+        geotransform = (300000.0, res_mnt[0], 0, 4900020.0, 0, res_mnt[1])
+        rng = np.random.RandomState(42)
+        from scipy import ndimage
+        mnt_arr = np.array(ndimage.gaussian_filter(rng.normal(0, 300, (60, 50)), 2) + 500, dtype=np.int16)
+        site = SiteInfo.Site("T31TCJ", 32631,
+                             ul=(300000.000, 4900020.000),
+                             lr=(409800.000, 4790220.000))
+        dem_dir = os.path.join(os.getcwd(), "test_write_slope_aspect_blockwise")
+        mnt = MNTBase.MNT(site, dem_dir=dem_dir, raw_dem=self.raw_dem, raw_gsw=self.raw_gsw,
+                          wdir=dem_dir, block_size=128)
+        path_mnt = os.path.join(dem_dir, "mnt.tif")
+        path_slp = os.path.join(dem_dir, "slp.tif")
+        path_asp = os.path.join(dem_dir, "asp.tif")
+        ImageIO.write_geotiff(mnt_arr, path_mnt, projection, geotransform)
+        mnt.write_slope_aspect(path_mnt, path_slp, path_asp, mnt_resolution=res_mnt, full_resolution=res_full)
+        # Full image calculation:
+        grad_y_mnt, grad_x_mnt = MNTBase.MNT.calc_gradient(mnt_arr, res_mnt[0], res_mnt[1])
+        grad_x = MNTBase.MNT.resample_to_full_resolution(grad_x_mnt, res_mnt, res_full)
+        grad_y = MNTBase.MNT.resample_to_full_resolution(grad_y_mnt, res_mnt, res_full)
+        slope, aspect = MNTBase.MNT.calc_slope_aspect(grad_y, grad_x)
+        ds_slp = GDalDatasetWrapper.from_file(path_slp)
+        ds_asp = GDalDatasetWrapper.from_file(path_asp)
+        self.assertEqual(ds_slp.array.shape, (540, 450))
+        self.assertEqual(ds_slp.resolution, res_full)
+        np.testing.assert_allclose(ds_slp.array, slope, atol=1)
+        np.testing.assert_allclose(ds_asp.array, aspect, atol=1)
+        FileSystem.remove_directory(dem_dir)
+
+    def test_to_maja_format_threads(self):
+        site = SiteInfo.Site("T31TCJ", 32631,
+                             ul=(300000.000, 4900020.000),
+                             lr=(307200.000, 4892820.000),
+                             px=80,
+                             py=80,
+                             res_x=90,
+                             res_y=-90)
+        mnt_resolutions = [{"name": "R1", "val": "30 -30"}, {"name": "R2", "val": "60 -60"}]
+        arrays = []
+        for n_threads in [4, 1]:
+            dem_dir = os.path.join(os.getcwd(), "test_to_maja_format_threads_%s" % n_threads)
+            mnt = SyntheticMNT(site, dem_dir=dem_dir, raw_dem=self.raw_dem, raw_gsw=self.raw_gsw,
+                               wdir=dem_dir, dem_version=1001, n_threads=n_threads)
+            hdr, dbl = mnt.to_maja_format(platform_id="S2_", mission_field="SENTINEL-2_",
+                                          mnt_resolutions=mnt_resolutions, coarse_res=(240, -240))
+            self.assertTrue(os.path.isfile(hdr))
+            base = os.path.join(dbl, os.path.basename(dbl).split(".")[0])
+            rasters = {}
+            for name in ["ALT", "ASP", "SLP"]:
+                for res, size in [("R1", 240), ("R2", 120)]:
+                    rasters[name + "_" + res] = (GDalDatasetWrapper.from_file("%s_%s_%s.TIF" % (base, name, res)),
+                                                 size)
+            for name in ["ALC", "ASC", "SLC", "MSK"]:
+                rasters[name] = (GDalDatasetWrapper.from_file("%s_%s.TIF" % (base, name)), 30)
+            for name, (ds, size) in rasters.items():
+                self.assertEqual(ds.array.shape, (size, size), name)
+            # The coarse rasters are derived from the last full resolution:
+            for coarse, full in [("ALC", "ALT_R2"), ("ASC", "ASP_R2"), ("SLC", "SLP_R2")]:
+                expected = ImageTools.gdal_warp(rasters[full][0], tr="240 -240")
+                np.testing.assert_array_equal(rasters[coarse][0].array, expected.array)
+            arrays.append({name: ds.array for name, (ds, _) in rasters.items()})
+            FileSystem.remove_directory(dem_dir)
+            FileSystem.remove_file(hdr)
+        # The result does not depend on the number of threads:
+        for name in arrays[0]:
+            np.testing.assert_array_equal(arrays[0][name], arrays[1][name], name)
+
     def test_gsw_download(self):
         site = SiteInfo.Site("Ecuador", 32619,
                              ul=(-250000.000, 250000.000),
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2016-2020 Centre National d'Etudes Spatiales (CNES), CSSI, CESBIO  All Rights Reserved
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+import os
+from prepare_mnt.mnt.MosaicCache import MosaicCache
+from Common import FileSystem, TestFunctions
+
+
+class TestMosaicCache(unittest.TestCase):
+
+    root = os.path.join(os.getcwd(), "test_mosaic_cache")
+
+    def setUp(self):
+        FileSystem.create_directory(self.root)
+        self.raw = []
+        for name in ["srtm_37_04.zip", "srtm_36_04.zip"]:
+            path = os.path.join(self.root, name)
+            with open(path, "w") as f:
+                f.write(name)
+            self.raw.append(path)
+        self.n_built = 0
+
+    def tearDown(self):
+        FileSystem.remove_directory(self.root)
+
+    def builder(self, inputs, dst):
+        self.n_built += 1
+        TestFunctions.touch(dst)
+
+    def test_key(self):
+        key = MosaicCache.get_key(self.raw, srcnodata=-32768)
+        # Order of the inputs does not matter:
+        self.assertEqual(key, MosaicCache.get_key(self.raw[::-1], srcnodata=-32768))
+        self.assertNotEqual(key, MosaicCache.get_key(self.raw, srcnodata=0))
+        self.assertNotEqual(key, MosaicCache.get_key(self.raw[:1], srcnodata=-32768))
+        # Content change:
+        with open(self.raw[0], "a") as f:
+            f.write("modified")
+        self.assertNotEqual(key, MosaicCache.get_key(self.raw, srcnodata=-32768))
+
+    def test_get_cached(self):
+        cache = MosaicCache(os.path.join(self.root, "cache"))
+        path = cache.get("srtm", self.raw, self.builder, srcnodata=-32768)
+        self.assertTrue(os.path.isfile(path))
+        self.assertEqual(self.n_built, 1)
+        path_2 = cache.get("srtm", self.raw[::-1], self.builder, srcnodata=-32768)
+        self.assertEqual(path, path_2)
+        self.assertEqual(self.n_built, 1)
+        path_3 = cache.get("srtm", self.raw[:1], self.builder, srcnodata=-32768)
+        self.assertNotEqual(path, path_3)
+        self.assertEqual(self.n_built, 2)
+        self.assertEqual(sorted(os.listdir(cache.cache_dir)),
+                         sorted([os.path.basename(path), os.path.basename(path_3)]))
+
+    def granule_builder(self, raw, dst):
+        self.assertTrue(os.path.isfile(raw))
+        self.builder([raw], dst)
+
+    def test_get_granules(self):
+        cache = MosaicCache(os.path.join(self.root, "cache"))
+        granules = cache.get_granules("srtm", self.raw[:1], self.granule_builder, srcnodata=-32768)
+        self.assertEqual(len(granules), 1)
+        self.assertEqual(self.n_built, 1)
+        # A tile sharing a granule with a previous one only builds its missing granules:
+        granules_2 = cache.get_granules("srtm", self.raw[::-1], self.granule_builder, srcnodata=-32768)
+        self.assertEqual(len(granules_2), 2)
+        self.assertEqual(granules_2[1], granules[0])
+        self.assertEqual(self.n_built, 2)
+        self.assertEqual(sorted(os.listdir(cache.cache_dir)),
+                         sorted([os.path.basename(g) for g in granules_2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2016-2020 Centre National d'Etudes Spatiales (CNES), CSSI, CESBIO  All Rights Reserved
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import unittest
+import tempfile
+from prepare_mnt.mnt import TileGrid
+from Common import FileSystem
+
+
+class TestTileGrid(unittest.TestCase):
+
+    def test_get_s2_tile_origin(self):
+        tiles = {"T31TCJ": (32631, 300000, 4900020),
+                 "31TBE": (32631, 199980, 4500000),
+                 "T30SYJ": (32630, 699960, 4400040),
+                 "T31TGL": (32631, 699960, 5100000),
+                 "T31UFR": (32631, 600000, 5600040)}
+        for tile, expected in tiles.items():
+            self.assertEqual(TileGrid.get_s2_tile_origin(tile), expected)
+
+    def test_get_s2_tile_origin_invalid(self):
+        for tile in ["T31TIJ", "T31TSJ", "T61TCJ", "31TC", "LC08"]:
+            with self.assertRaises(ValueError):
+                TileGrid.get_s2_tile_origin(tile)
+
+    def test_get_s2_site(self):
+        site = TileGrid.get_site("T31TCJ", "sentinel2", (10, -10))
+        self.assertEqual(site.nom, "31TCJ")
+        self.assertEqual(site.epsg, 32631)
+        self.assertEqual(site.ul, (300000, 4900020))
+        self.assertEqual(site.lr, (409800, 4790220))
+        self.assertEqual((site.px, site.py), (10980, 10980))
+        self.assertEqual((site.res_x, site.res_y), (10, -10))
+
+    def test_get_site_from_grid(self):
+        grid_file = tempfile.mktemp(suffix="_grid.csv")
+        with open(grid_file, "w") as f:
+            f.write("name,epsg,ulx,uly,lrx,lry\n")
+            f.write("199029,32631,285285,4924215,523815,4710585\n")
+        grid = TileGrid.read_grid(grid_file)
+        FileSystem.remove_file(grid_file)
+        self.assertEqual(list(grid.keys()), ["199029"])
+        site = TileGrid.get_site("199029", "landsat8", (30, -30), grid)
+        self.assertEqual(site.epsg, 32631)
+        self.assertEqual(site.ul, (285285, 4924215))
+        self.assertEqual(site.lr, (523815, 4710585))
+        self.assertEqual((site.px, site.py), (7951, 7121))
+        with self.assertRaises(ValueError):
+            TileGrid.get_site("198030", "landsat8", (30, -30), grid)
+        self.assertFalse(os.path.exists(grid_file))
+
+
+if __name__ == '__main__':
+    unittest.main()